@@ -0,0 +1,20 @@
+from behave_xray.evidence import from_file, text
+from behave_xray.evidence_store import BudgetPolicy, DedupMode, EvidenceStore
+from benchmarks.generator import write_evidence_file
+
+
+def test_large_file_evidence_encoding(benchmark, tmp_path):
+    evidence = from_file(write_evidence_file(str(tmp_path), 16 * 1024 * 1024), 'application/octet-stream')
+    benchmark(lambda: sum(len(chunk) for chunk in evidence.iter_base64()))
+
+
+def test_evidence_store_with_dedup_and_budget(benchmark):
+    evidences = [text('x' * 64 * 1024, f'log-{index % 10}.txt') for index in range(100)]
+
+    def select():
+        store = EvidenceStore(dedup=DedupMode.reference, max_execution_bytes=2 * 1024 * 1024,
+                              policy=BudgetPolicy.summarize)
+        for index in range(0, 100, 10):
+            store.select(f'JIRA-{index}', evidences[index:index + 10])
+
+    benchmark(select)
@@ -0,0 +1,27 @@
+from behave.model_core import Status
+
+from behave_xray.result import ScenarioResult
+from benchmarks.generator import generate_feature, mark_executed, run_formatter
+
+
+def test_feature_with_many_scenarios(benchmark, make_formatter):
+    feature = generate_feature(scenarios=2000, steps=5)
+    mark_executed(feature)
+    benchmark.pedantic(run_formatter, setup=lambda: ((make_formatter(), feature), {}), rounds=10)
+
+
+def test_wide_scenario_outline(benchmark, make_formatter):
+    feature = generate_feature(scenarios=0, outline_rows=10000, steps=3)
+    mark_executed(feature)
+    benchmark.pedantic(run_formatter, setup=lambda: ((make_formatter(), feature), {}), rounds=10)
+
+
+def test_collect_tests(benchmark, make_formatter):
+    def setup():
+        formatter = make_formatter()
+        for index in range(10000):
+            formatter.testcases[f'JIRA-{index}'] = ScenarioResult(statuses=[Status.passed])
+        formatter.testcases['JIRA-99'] = ScenarioResult(statuses=[Status.passed] * 50000, is_outline=True)
+        return (formatter,), {}
+
+    benchmark.pedantic(lambda formatter: formatter.collect_tests(), setup=setup, rounds=10)
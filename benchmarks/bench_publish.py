@@ -0,0 +1,32 @@
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.serialization import SerializedTestExecution
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+from benchmarks.conftest import jira_environ
+from benchmarks.generator import generate_feature, mark_executed, run_formatter
+
+
+def _test_execution(tests: int) -> _TestExecution:
+    test_execution = _TestExecution(test_plan_key='JIRA-1')
+    for index in range(tests):
+        test_execution.append(_TestCase(test_key=f'JIRA-{index}', status='PASS'))
+    return test_execution
+
+
+def test_publish_to_mock_server(benchmark, mock_server):
+    publisher = XrayPublisher(jira_environ['XRAY_API_BASE_URL'], TEST_EXECUTION_ENDPOINT, ('user', 'password'))
+    payload = SerializedTestExecution.from_dict(_test_execution(5000).as_dict())
+    try:
+        assert benchmark(publisher.publish, payload)
+    finally:
+        publisher.close()
+
+
+def test_formatter_end_to_end(benchmark, mock_server, make_formatter):
+    feature = generate_feature(scenarios=500, steps=5)
+    mark_executed(feature)
+
+    def setup():
+        return (make_formatter(publish=True), feature), {}
+
+    benchmark.pedantic(run_formatter, setup=setup, rounds=10)
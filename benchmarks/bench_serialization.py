@@ -0,0 +1,26 @@
+import pytest
+
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.serialization import dumps
+
+
+@pytest.fixture
+def test_execution():
+    test_execution = _TestExecution(test_plan_key='JIRA-1')
+    for index in range(10000):
+        test_execution.append(_TestCase(test_key=f'JIRA-{index}', status='PASS', comment='x' * 20))
+    return test_execution
+
+
+def test_as_dict(benchmark, test_execution):
+    benchmark(test_execution.as_dict)
+
+
+def test_dumps(benchmark, test_execution):
+    data = test_execution.as_dict()
+    benchmark(dumps, data)
+
+
+def test_iter_json(benchmark, test_execution):
+    benchmark(lambda: ''.join(test_execution.iter_json()))
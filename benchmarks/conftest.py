@@ -0,0 +1,78 @@
+import os
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+
+from behave_xray.formatter import XrayFormatter
+from tests.mock_server import MockServer
+
+
+BENCHMARK_PORT = 5003
+# timings are comparable only with a baseline stored on the same kind of machine
+MACHINE_INFO_KEYS = ('system', 'machine', 'python_implementation', 'python_version')
+CPU_INFO_KEYS = ('brand_raw', 'count')
+
+jira_environ: dict = {
+    'XRAY_API_BASE_URL': f'http://127.0.0.1:{BENCHMARK_PORT}',
+    'XRAY_API_USER': 'jirauser',
+    'XRAY_API_PASSWORD': 'jirapassword'
+}
+
+
+@pytest.fixture(scope='session')
+def mock_server():
+    server = MockServer(BENCHMARK_PORT)
+    server.add_json_response(
+        '/rest/raven/2.0/import/execution',
+        {'testExecIssue': {'key': 'JIRA-1000'}},
+        methods=('POST',)
+    )
+    server.start()
+    yield server
+    server.shutdown_server()
+
+
+@pytest.fixture(autouse=True)
+def environ():
+    with mock.patch.dict(os.environ, jira_environ):
+        yield
+
+
+@pytest.fixture
+def make_formatter():
+    """Return factory of formatters, results are not published unless publish is True."""
+    def _make_formatter(userdata=None, publish=False):
+        config = MagicMock()
+        config.userdata = userdata or {}
+        config.dry_run = False
+        formatter = XrayFormatter(MagicMock(), config)
+        if not publish:
+            formatter.xray_publisher = MagicMock(stream_upload=False)
+        return formatter
+
+    return _make_formatter
+
+
+def pytest_benchmark_compare_machine_info(config, benchmarksession, machine_info, compared_benchmark):
+    """Fail instead of comparing against a baseline stored on another machine."""
+    current = _get_machine(machine_info)
+    saved = _get_machine(compared_benchmark['machine_info'])
+    if current != saved:
+        pytest.exit(f'Benchmark baseline was stored on another machine: {saved}, this machine: {current}. '
+                    'Store a baseline on this machine with tox -e benchmark-save',
+                    returncode=pytest.ExitCode.USAGE_ERROR)
+
+
+def pytest_sessionstart(session):
+    benchmarksession = getattr(session.config, '_benchmarksession', None)
+    if benchmarksession is not None and benchmarksession.compare and not benchmarksession.compared_mapping:
+        pytest.exit(f'No benchmark baseline in {benchmarksession.storage}, '
+                    'store a baseline on this machine with tox -e benchmark-save',
+                    returncode=pytest.ExitCode.USAGE_ERROR)
+
+
+def _get_machine(machine_info):
+    machine = {key: machine_info.get(key) for key in MACHINE_INFO_KEYS}
+    machine.update((key, machine_info.get('cpu', {}).get(key)) for key in CPU_INFO_KEYS)
+    return machine
@@ -0,0 +1,56 @@
+"""Synthetic behave features for benchmarks."""
+import os
+
+from behave.model import Feature
+from behave.model_core import Status
+from behave.parser import parse_feature
+
+
+def generate_feature_text(scenarios: int = 1000, outline_rows: int = 0, steps: int = 5) -> str:
+    """Return feature with plain scenarios and one outline with given number of example rows.
+
+    Every scenario and the outline are tagged with a Jira Xray test key.
+    """
+    lines = ["@jira.test_plan('JIRA-1')", 'Feature: Generated feature', '']
+    for index in range(scenarios):
+        lines.append(f"  @jira.testcase('JIRA-{index + 100}')")
+        lines.append(f'  Scenario: Scenario {index}')
+        lines.extend(f'    Given step {step}' for step in range(steps))
+        lines.append('')
+    if outline_rows:
+        lines.append("  @jira.testcase('JIRA-99')")
+        lines.append('  Scenario Outline: Outline')
+        lines.extend(f'    Given step <value> {step}' for step in range(steps))
+        lines.append('    Examples:')
+        lines.append('      | value |')
+        lines.extend(f'      | {row} |' for row in range(outline_rows))
+    return '\n'.join(lines) + '\n'
+
+
+def generate_feature(scenarios: int = 1000, outline_rows: int = 0, steps: int = 5) -> Feature:
+    return parse_feature(generate_feature_text(scenarios, outline_rows, steps), filename='generated.feature')
+
+
+def mark_executed(feature: Feature, status: Status = Status.passed) -> None:
+    """Set status of all steps, as if the feature was run by behave."""
+    for scenario in feature.walk_scenarios():
+        for step in scenario.steps:
+            step.status = status
+            step.duration = 0.001
+
+
+def run_formatter(formatter, feature: Feature) -> None:
+    """Feed formatter with the feature as behave runner does."""
+    formatter.feature(feature)
+    for scenario in feature.walk_scenarios():
+        formatter.scenario(scenario)
+        for step in scenario.steps:
+            formatter.result(step)
+    formatter.eof()
+
+
+def write_evidence_file(directory: str, size: int) -> str:
+    path = os.path.join(directory, f'evidence-{size}.bin')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
@@ -0,0 +1,46 @@
+"""Per-test overhead of the Xray model classes.
+
+Run with::
+
+    python benchmarks/model_overhead.py [number of tests]
+"""
+import sys
+import time
+import tracemalloc
+
+from behave_xray.model import TestCase, TestExecution
+
+
+DEFAULT_TESTS: int = 100_000
+
+
+def measure(label: str, count: int, func) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<32} {elapsed * 1e6 / count:8.3f} us/test')
+
+
+def main(count: int = DEFAULT_TESTS) -> None:
+    test_execution = TestExecution()
+
+    def create() -> None:
+        for index in range(count):
+            test_case = TestCase(test_key=f'JIRA-{index}', comment='')
+            test_case.status = 'FAIL' if index % 10 == 0 else 'PASS'
+            test_execution.append(test_case)
+
+    measure('create and set status', count, create)
+    tracemalloc.start()
+    test_execution.flush()
+    create()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    measure('as_dict', count, test_execution.as_dict)
+    measure('as_dict (cached test cases)', count, test_execution.as_dict)
+    measure('iter_json', count, lambda: ''.join(test_execution.iter_json()))
+    print(f'{"memory":<32} {memory / count:8.1f} B/test')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TESTS)
@@ -1,6 +1,12 @@
 import pluggy
 
-from .formatter import XrayCloudFormatter, XrayFormatter  # noqa: F401
-
 
 hookimpl = pluggy.HookimplMarker('xray')
+
+
+def __getattr__(name):
+    # formatters import behave, load them only when needed so tools like `behave-xray upload` start quickly
+    if name in ('XrayFormatter', 'XrayCloudFormatter'):
+        from behave_xray import formatter
+        return getattr(formatter, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from requests.auth import AuthBase
+
+from behave_xray.authentication import BearerAuth, PersonalAccessTokenAuth
+from behave_xray.exceptions import XrayError
+from behave_xray.metrics import Metrics
+from behave_xray.model import TestExecution
+from behave_xray.retry import RETRYABLE_STATUS_CODES, CircuitBreaker, RetryPolicy
+from behave_xray.serialization import SerializedTestExecution, dumps
+from behave_xray.session import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from behave_xray.xray_publisher import Payload, XrayPublisher, _get_test_execution_key
+
+
+DEFAULT_CONCURRENCY: int = 8
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncXrayPublisher:
+    """Publishes many test executions concurrently with asyncio.
+
+    Accepts the same authentication as :class:`XrayPublisher`, tokens of
+    :class:`BearerAuth` are requested without blocking the event loop.
+    Requires optional `httpx` package::
+
+        async with AsyncXrayPublisher(base_url, endpoint, auth) as publisher:
+            results = await publisher.publish_many(test_executions, concurrency=8)
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        endpoint: str,
+        auth: Optional[Union[AuthBase, Tuple[str, str]]],
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        max_connections: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        metrics: Optional[Metrics] = None
+    ) -> None:
+        """
+        :param base_url: Jira base URL
+        :param endpoint: Xray import endpoint
+        :param auth: authentication
+        :param retry_policy: policy for repeating failed uploads
+        :param circuit_breaker: stops uploads after consecutive failures
+        :param max_connections: maximum number of connections to Jira
+        :param timeout: seconds to wait for a response
+        :param metrics: records request latency, payload size and retries
+        """
+        try:
+            import httpx
+        except ImportError as exc:
+            raise XrayError('Asynchronous publishing requires httpx, install behave-xray[async]') from exc
+        self._httpx = httpx
+        self.base_url = base_url.rstrip('/')
+        self.endpoint = endpoint
+        self.auth = auth
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.metrics = metrics or Metrics()
+        # all requests go to one host, so the client limits are limits per host
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        # created in the event loop of the first upload, older Pythons bind locks to a loop when created
+        self._auth_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> 'AsyncXrayPublisher':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        await self.client.aclose()
+
+    @property
+    def endpoint_url(self) -> str:
+        return self.base_url + self.endpoint
+
+    async def publish_many(
+        self,
+        test_executions: Iterable[Payload],
+        concurrency: int = DEFAULT_CONCURRENCY
+    ) -> List[bool]:
+        """Publish test executions, at most `concurrency` at a time.
+
+        :return: success of each test execution, in the given order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def publish(test_execution: Payload) -> bool:
+            async with semaphore:
+                return await self.publish(test_execution)
+
+        return list(await asyncio.gather(*(publish(test_execution) for test_execution in test_executions)))
+
+    async def publish(self, test_execution: Payload) -> bool:
+        """Publish test execution and return True if it was imported."""
+        with self.metrics.timer('publish'):
+            try:
+                result = await self._post(self._get_body(test_execution), _get_test_execution_key(test_execution))
+            except XrayError as e:
+                self.metrics.increment('failed_uploads')
+                _logger.error('Could not publish results to Jira XRAY')
+                _logger.error(e.message)
+                return False
+            _logger.debug('Publish returned: %s', result)
+            try:
+                key = result['testExecIssue']['key'] if 'testExecIssue' in result else result['key']
+            except (KeyError, TypeError):
+                self.metrics.increment('failed_uploads')
+                _logger.error('Unexpected response of Jira XRAY: %s', result)
+                return False
+        print('Uploaded results to JIRA XRAY Test Execution:', key)
+        return True
+
+    async def _post(self, body: bytes, test_execution_key: str) -> Dict[str, Any]:
+        url = self.endpoint_url
+        if not self.circuit_breaker.allow_request():
+            raise XrayError(f'Circuit breaker is open after {self.circuit_breaker.failures} failures, '
+                            f'skipping upload to {url}')
+        # importing into an existing test execution can be safely repeated
+        idempotent = bool(test_execution_key)
+        token_refreshed = False
+        attempt = 1
+        while True:
+            self.metrics.increment('requests')
+            try:
+                with self.metrics.timer('request'):
+                    response = await self.client.post(url, content=body, **await self._get_auth_options())
+            except self._httpx.TransportError as e:
+                if attempt < self.retry_policy.max_attempts and self._should_retry_error(e, idempotent):
+                    await self._wait_before_retry(attempt, f'{type(e).__name__}: {e}')
+                    attempt += 1
+                    continue
+                self.circuit_breaker.record_failure()
+                raise XrayError(f'ConnectionError: JIRA service on {self.base_url}') from e
+            if response.status_code == 401 and isinstance(self.auth, BearerAuth) and not token_refreshed:
+                # the token was revoked or expired earlier than announced
+                self.auth.invalidate()
+                token_refreshed = True
+                continue
+            if (attempt < self.retry_policy.max_attempts
+                    and self.retry_policy.should_retry_status(response.status_code, idempotent)
+                    and await self._wait_before_retry(
+                        attempt,
+                        f'response status code {response.status_code}',
+                        response.headers.get('Retry-After')
+                    )):
+                attempt += 1
+                continue
+            break
+        if response.status_code >= 400:
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self.circuit_breaker.record_failure()
+            err_message = (f'HTTPError: Could not post to JIRA service at {url}. '
+                           f'Response status code: {response.status_code}')
+            server_error = XrayPublisher._get_server_error(response)
+            if server_error:
+                err_message += f'\nError message from server: {server_error}'
+            raise XrayError(err_message)
+        self.circuit_breaker.record_success()
+        try:
+            return response.json()
+        except ValueError as e:
+            raise XrayError(f'Invalid response from JIRA service at {url}: {e}') from e
+
+    def _should_retry_error(self, error: Exception, idempotent: bool) -> bool:
+        # nothing was sent when the connection could not be established
+        return idempotent or isinstance(error, (self._httpx.ConnectError, self._httpx.ConnectTimeout))
+
+    async def _wait_before_retry(self, attempt: int, reason: str, retry_after: Optional[str] = None) -> bool:
+        """Wait before the next attempt, return False if the request must not be repeated."""
+        delay = self.retry_policy.get_delay(attempt, retry_after)
+        if delay is None:
+            return False
+        self.metrics.increment('retries')
+        _logger.warning('Upload attempt %d of %d failed (%s), retrying in %.1f seconds',
+                        attempt, self.retry_policy.max_attempts, reason, delay)
+        await asyncio.sleep(delay)
+        return True
+
+    def _get_body(self, data: Payload) -> bytes:
+        if isinstance(data, SerializedTestExecution):
+            body = data.body
+        elif isinstance(data, TestExecution):
+            body = dumps(data.as_dict())
+        else:
+            body = dumps(data)
+        self.metrics.increment('payload_bytes', len(body))
+        return body
+
+    async def _get_auth_options(self) -> Dict[str, Any]:
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+        if isinstance(self.auth, tuple):
+            return dict(headers=headers, auth=self.auth)
+        if isinstance(self.auth, PersonalAccessTokenAuth):
+            headers['Authorization'] = f'Bearer {self.auth.token}'
+        elif isinstance(self.auth, BearerAuth):
+            headers['Authorization'] = f'Bearer {await self._get_token(self.auth)}'
+        elif self.auth is not None:
+            raise XrayError(f'Unsupported authentication for asynchronous publishing: {type(self.auth).__name__}')
+        return dict(headers=headers)
+
+    async def _get_token(self, auth: BearerAuth) -> str:
+        # the token cache is a locked file, it is read in a thread not to block the event loop
+        loop = asyncio.get_running_loop()
+        token = await loop.run_in_executor(None, auth.get_valid_token)
+        if token is not None:
+            return token
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        # concurrent uploads wait for one authentication request
+        async with self._auth_lock:
+            token = await loop.run_in_executor(None, auth.get_valid_token)
+            if token is not None:
+                return token
+            self.metrics.increment('auth_requests')
+            try:
+                with self.metrics.timer('auth'):
+                    response = await self.client.post(
+                        auth.endpoint_url,
+                        json={'client_id': auth.client_id, 'client_secret': auth.client_secret},
+                        headers={'Accept': 'text/plain'}
+                    )
+            except self._httpx.TransportError as exc:
+                raise XrayError(f'ConnectionError: cannot authenticate with {auth.endpoint_url}') from exc
+            if response.status_code >= 400:
+                raise XrayError(f'HTTPError: cannot authenticate with {auth.endpoint_url}. '
+                                f'Response status code: {response.status_code}')
+            token = response.text.strip('"')
+            await loop.run_in_executor(None, auth.set_token, token)
+            return token
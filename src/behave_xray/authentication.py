@@ -1,12 +1,22 @@
 import json
 import logging
+import threading
+import time
+from typing import Optional, Tuple
 
 import requests
 from requests.auth import AuthBase
 
 from behave_xray.exceptions import XrayError
+from behave_xray.metrics import Metrics
+from behave_xray.session import DEFAULT_TIMEOUT
+from behave_xray.token_cache import TokenCache, get_cache_key, get_token_expiry
 
 
+# used when the token is not a JWT with an expiry time
+DEFAULT_TOKEN_LIFETIME: float = 3600.0
+DEFAULT_EXPIRY_MARGIN: float = 60.0
+
 _logger = logging.getLogger(__name__)
 
 
@@ -22,18 +32,111 @@ class PersonalAccessTokenAuth(AuthBase):
 
 
 class BearerAuth(AuthBase):
-    """Bearer authentication with Client Id and a Client Secret."""
+    """Bearer authentication with Client Id and a Client Secret.
+
+    The token is kept until shortly before it expires. With a token cache
+    the token is also shared with other processes on the same host.
+    """
 
-    def __init__(self, base_url: str, client_id: str, client_secret: str) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        session: Optional[requests.Session] = None,
+        token_cache: Optional[TokenCache] = None,
+        expiry_margin: float = DEFAULT_EXPIRY_MARGIN,
+        metrics: Optional[Metrics] = None,
+        timeout: float = DEFAULT_TIMEOUT
+    ) -> None:
+        """
+        :param base_url: Jira base URL
+        :param client_id: Xray client ID
+        :param client_secret: Xray client secret
+        :param session: HTTP session
+        :param token_cache: cache shared between processes
+        :param expiry_margin: seconds before expiry when a token is renewed
+        :param metrics: records authentication latency
+        :param timeout: seconds to wait for the authentication response
+        """
         self.base_url = base_url
         self.client_id = client_id
         self.client_secret = client_secret
+        self.session = session or requests.Session()
+        self.token_cache = token_cache
+        self.expiry_margin = expiry_margin
+        self.metrics = metrics or Metrics()
+        self.timeout = timeout
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._rejected_token: Optional[str] = None
+        self._lock = threading.Lock()
 
     @property
     def endpoint_url(self) -> str:
         return f'{self.base_url}/api/v2/authenticate'
 
+    @property
+    def cache_key(self) -> str:
+        return get_cache_key(self.base_url, self.client_id)
+
     def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+        r.headers['Authorization'] = f'Bearer {self.get_token()}'
+        return r
+
+    def get_token(self) -> str:
+        """Return valid token, authenticate only if the cached one is about to expire."""
+        with self._lock:
+            if self._token is None or not self._is_valid(self._expires_at):
+                if self.token_cache is None:
+                    self._token, self._expires_at = self._authenticate()
+                else:
+                    with self.token_cache.lock():
+                        self._token, self._expires_at = self._get_shared_token(self.token_cache)
+            return self._token
+
+    def get_valid_token(self) -> Optional[str]:
+        """Return the current or cached token if it does not expire soon, never authenticate."""
+        with self._lock:
+            if self._token is not None and self._is_valid(self._expires_at):
+                return self._token
+            if self.token_cache is None:
+                return None
+            with self.token_cache.lock():
+                cached = self.token_cache.get(self.cache_key)
+            if cached is None or not self._is_valid(cached[1]) or cached[0] == self._rejected_token:
+                return None
+            self._token, self._expires_at = cached
+            return self._token
+
+    def set_token(self, token: str) -> None:
+        """Store token received from the authentication endpoint by another client, e.g. an async one."""
+        expires_at = get_token_expiry(token) or time.time() + DEFAULT_TOKEN_LIFETIME
+        with self._lock:
+            self._token, self._expires_at = token, expires_at
+            if self.token_cache is not None:
+                with self.token_cache.lock():
+                    self.token_cache.set(self.cache_key, token, expires_at)
+
+    def invalidate(self) -> None:
+        """Forget the token, e.g. when the server rejected it."""
+        with self._lock:
+            self._rejected_token = self._token
+            self._token = None
+            self._expires_at = 0.0
+
+    def _is_valid(self, expires_at: float) -> bool:
+        return time.time() < expires_at - self.expiry_margin
+
+    def _get_shared_token(self, token_cache: TokenCache) -> Tuple[str, float]:
+        cached = token_cache.get(self.cache_key)
+        if cached is not None and self._is_valid(cached[1]) and cached[0] != self._rejected_token:
+            return cached
+        token, expires_at = self._authenticate()
+        token_cache.set(self.cache_key, token, expires_at)
+        return token, expires_at
+
+    def _authenticate(self) -> Tuple[str, float]:
         headers = {
             'Content-type': 'application/json',
             'Accept': 'text/plain'
@@ -43,17 +146,25 @@ class BearerAuth(AuthBase):
             'client_secret': self.client_secret
         }
 
+        self.metrics.increment('auth_requests')
         try:
-            response = requests.post(
-                self.endpoint_url,
-                data=json.dumps(auth_data),
-                headers=headers
-            )
-        except requests.exceptions.ConnectionError as exc:
-            err_message = f'ConnectionError: cannot authenticate with {self.endpoint_url}'
+            with self.metrics.timer('auth'):
+                response = self.session.post(
+                    self.endpoint_url,
+                    data=json.dumps(auth_data),
+                    headers=headers,
+                    timeout=self.timeout
+                )
+            response.raise_for_status()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            err_message = f'{type(exc).__name__}: cannot authenticate with {self.endpoint_url}'
             _logger.exception(err_message)
             raise XrayError(err_message) from exc
-        else:
-            auth_token = response.text.strip('"')
-            r.headers['Authorization'] = f'Bearer {auth_token}'
-        return r
+        except requests.exceptions.HTTPError as exc:
+            err_message = (f'HTTPError: cannot authenticate with {self.endpoint_url}. '
+                           f'Response status code: {response.status_code}')
+            _logger.exception(err_message)
+            raise XrayError(err_message) from exc
+        auth_token = response.text.strip('"')
+        expires_at = get_token_expiry(auth_token) or time.time() + DEFAULT_TOKEN_LIFETIME
+        return auth_token, expires_at
@@ -0,0 +1,221 @@
+"""Command line tools for test results of behave-xray.
+
+The module must not import behave, so the tools start fast and run where
+behave is not installed. Only the `merge` and `run` commands import it when
+they are run.
+"""
+import argparse
+import json
+import logging
+import os
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from behave_xray.config import get_auth, get_jira_config
+from behave_xray.exceptions import XrayError
+from behave_xray.session import DEFAULT_POOL_SIZE, create_session
+from behave_xray.spool import Spool
+from behave_xray.xray_publisher import (
+    TEST_EXECUTION_ENDPOINT,
+    TEST_EXECUTION_ENDPOINT_CLOUD,
+    XrayPublisher,
+)
+
+
+DEFAULT_WORKERS: int = 4
+# keep in sync with behave_xray.runner, which imports behave
+DEFAULT_DURATIONS_FILE: str = '.behave-xray-durations.json'
+
+_logger = logging.getLogger(__name__)
+
+
+def create_publisher(cloud: bool = False, pool_size: int = DEFAULT_POOL_SIZE) -> XrayPublisher:
+    """Return publisher configured from environment variables."""
+    jira_config = get_jira_config()
+    session = create_session(pool_size=pool_size)
+    return XrayPublisher(
+        base_url=jira_config.jira_url,
+        endpoint=TEST_EXECUTION_ENDPOINT_CLOUD if cloud else TEST_EXECUTION_ENDPOINT,
+        auth=get_auth(jira_config, session=session),
+        session=session
+    )
+
+
+def load_test_executions(path: str) -> List[dict]:
+    """Return test executions from a JSON file.
+
+    A file written by the formatter for several features contains several
+    concatenated JSON documents.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    decoder = json.JSONDecoder()
+    test_executions: List[dict] = []
+    index = 0
+    while True:
+        while index < len(content) and content[index].isspace():
+            index += 1
+        if index == len(content):
+            return test_executions
+        test_execution, index = decoder.raw_decode(content, index)
+        test_executions.append(test_execution)
+
+
+def upload(args: argparse.Namespace) -> int:
+    spool = Spool(args.spool) if args.spool else None
+    paths = list(args.files) + (spool.pending() if spool is not None else [])
+    if not paths:
+        print('Nothing to upload')
+        return 0
+    publisher = create_publisher(cloud=args.cloud, pool_size=max(args.workers, DEFAULT_POOL_SIZE))
+
+    def upload_file(path: str) -> bool:
+        try:
+            test_executions = load_test_executions(path)
+        except (OSError, ValueError) as exc:
+            _logger.error('Cannot read test execution from %s: %s', path, exc)
+            return False
+        success = all([publisher.publish(test_execution) for test_execution in test_executions])
+        if success and spool is not None and spool.is_pending(path):
+            spool.mark_done(path)
+        return success
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(upload_file, paths))
+    finally:
+        publisher.close()
+    for path, success in zip(paths, results):
+        print(f'{"OK" if success else "FAILED"}: {path}')
+    print(f'Uploaded {sum(results)} of {len(paths)} files')
+    return 0 if all(results) else 1
+
+
+def merge(args: argparse.Namespace) -> int:
+    from behave_xray.shard import find_shards, merge_shards, to_test_execution
+
+    shards = find_shards(args.shards)
+    if not shards:
+        print('No shards found')
+        return 1
+    merged = merge_shards(shards)
+    if args.cloud:
+        merged.cloud = True
+    test_execution = to_test_execution(merged)
+    print(f'Merged {len(test_execution.tests)} tests from {len(shards)} shards')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for fragment in test_execution.iter_json():
+                f.write(fragment)
+    if args.no_publish:
+        return 0
+    publisher = create_publisher(cloud=merged.cloud)
+    try:
+        return 0 if publisher.publish(test_execution) else 1
+    finally:
+        publisher.close()
+
+
+def run(args: argparse.Namespace) -> int:
+    from behave_xray.runner import (
+        find_features,
+        iter_results,
+        load_durations,
+        merge_results,
+        save_durations,
+        sort_by_duration,
+    )
+    from behave_xray.shard import to_test_execution
+
+    features = find_features(args.paths)
+    if not features:
+        print('No feature files found')
+        return 1
+    features = sort_by_duration(features, load_durations(args.durations))
+    results = []
+    for result in iter_results(features, args.workers, shlex.split(args.behave_args), cloud=args.cloud):
+        print(f'{"passed" if result.exit_code == 0 else "failed"}: {result.path} ({result.duration:.1f}s)')
+        results.append(result)
+    save_durations(args.durations, results)
+    exit_code = 0 if all(result.exit_code == 0 for result in results) else 1
+
+    merged = merge_results(results)
+    merged.cloud = args.cloud
+    if not merged.results:
+        print('No Xray test results collected')
+        return exit_code
+    test_execution = to_test_execution(merged)
+    print(f'Collected {len(test_execution.tests)} tests from {len(features)} features')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for fragment in test_execution.iter_json():
+                f.write(fragment)
+    if args.no_publish:
+        return exit_code
+    publisher = create_publisher(cloud=args.cloud)
+    try:
+        published = publisher.publish(test_execution)
+    finally:
+        publisher.close()
+    return exit_code if published else 1
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='behave-xray', description='Jira Xray tools for behave results.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    upload_parser = subparsers.add_parser(
+        'upload',
+        help='upload test executions from JSON files or a spool directory'
+    )
+    upload_parser.add_argument('files', nargs='*', help='JSON files written by the formatter')
+    upload_parser.add_argument('--spool', help='upload all pending test executions from the spool directory')
+    upload_parser.add_argument('--cloud', action='store_true', help='upload to Jira Xray Cloud')
+    upload_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                               help=f'number of concurrent uploads (default: {DEFAULT_WORKERS})')
+    upload_parser.set_defaults(func=upload)
+
+    merge_parser = subparsers.add_parser(
+        'merge',
+        help='merge shards written with -D xray.shard_dir and publish them as one test execution'
+    )
+    merge_parser.add_argument('shards', nargs='+', help='shard files or directories with shards')
+    merge_parser.add_argument('--cloud', action='store_true',
+                              help='publish to Jira Xray Cloud (default: as recorded in shards)')
+    merge_parser.add_argument('--output', help='write merged test execution to JSON file')
+    merge_parser.add_argument('--no-publish', action='store_true', help='do not publish merged test execution')
+    merge_parser.set_defaults(func=merge)
+
+    run_parser = subparsers.add_parser(
+        'run',
+        help='run features in parallel with behave and publish results as one test execution'
+    )
+    run_parser.add_argument('paths', nargs='*', default=['features'],
+                            help='feature files or directories (default: features)')
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='number of worker processes (default: number of CPUs)')
+    run_parser.add_argument('--behave-args', default='', help='additional behave options, e.g. "--tags=@smoke"')
+    run_parser.add_argument('--durations', default=DEFAULT_DURATIONS_FILE,
+                            help=f'feature durations used to balance workers (default: {DEFAULT_DURATIONS_FILE})')
+    run_parser.add_argument('--cloud', action='store_true', help='publish to Jira Xray Cloud')
+    run_parser.add_argument('--output', help='write test execution to JSON file')
+    run_parser.add_argument('--no-publish', action='store_true', help='do not publish test execution')
+    run_parser.set_defaults(func=run)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    try:
+        return args.func(args)
+    except XrayError as exc:
+        print(f'Error: {exc.message}', file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from enum import Enum, auto
+from os import environ, getenv
+from typing import Optional, Tuple, Union
+
+import requests
+
+from behave_xray.authentication import AuthBase, BearerAuth, PersonalAccessTokenAuth
+from behave_xray.exceptions import XrayError
+from behave_xray.metrics import Metrics
+from behave_xray.session import DEFAULT_TIMEOUT
+from behave_xray.token_cache import TokenCache
+
+
+class AuthType(Enum):
+    bearer = auto()  # client id & client secret
+    token = auto()
+    basic = auto()
+
+
+@dataclass
+class JiraConfig:
+    jira_url: str
+    user_name: str = ''
+    user_password: str = ''
+    client_id: str = ''
+    client_secret: str = ''
+    token: str = ''
+
+    @property
+    def auth_method(self) -> AuthType:
+        if self.client_id and self.client_id:
+            return AuthType.bearer
+        if self.token:
+            return AuthType.token
+        else:
+            return AuthType.basic
+
+
+def get_jira_config() -> JiraConfig:
+    """Return jira configuration from env variables."""
+    try:
+        jira_url = environ['XRAY_API_BASE_URL']
+    except KeyError:
+        raise XrayError('Environment variable `XRAY_API_BASE_URL` must be set')
+    user_name = getenv('XRAY_API_USER', '')
+    user_password = getenv('XRAY_API_PASSWORD', '')
+    client_id = getenv('XRAY_CLIENT_ID', '')
+    client_secret = getenv('XRAY_CLIENT_SECRET', '')
+    token = getenv('XRAY_TOKEN', '')
+    return JiraConfig(
+        user_name=user_name,
+        user_password=user_password,
+        jira_url=jira_url,
+        client_id=client_id,
+        client_secret=client_secret,
+        token=token
+    )
+
+
+def get_auth(
+    jira_config: JiraConfig,
+    session: Optional[requests.Session] = None,
+    token_cache: Optional[TokenCache] = None,
+    metrics: Optional[Metrics] = None,
+    timeout: float = DEFAULT_TIMEOUT
+) -> Union[Tuple[str, str], AuthBase]:
+    """Return authentication for the Jira configuration."""
+    if jira_config.auth_method == AuthType.bearer:
+        return BearerAuth(
+            base_url=jira_config.jira_url,
+            client_id=jira_config.client_id,
+            client_secret=jira_config.client_secret,
+            session=session,
+            token_cache=token_cache,
+            metrics=metrics,
+            timeout=timeout
+        )
+    elif jira_config.auth_method == AuthType.token:
+        return PersonalAccessTokenAuth(token=jira_config.token)
+    else:  # basic
+        return jira_config.user_name, jira_config.user_password
@@ -1,5 +1,9 @@
 import base64
-from typing import AnyStr, Dict
+import json as _json
+import mmap
+import os
+from collections.abc import Mapping
+from typing import AnyStr, Dict, Iterator, Optional, Union
 
 from behave_xray.exceptions import XrayError
 
@@ -13,6 +17,9 @@ ZIP: str = 'application/zip'
 XML: str = 'application/xml'
 GZIP: str = 'appliaction/gzip'
 
+# multiple of 3, so base64 of chunks can be concatenated
+BASE64_CHUNK_SIZE: int = 3 * 256 * 1024
+
 
 def evidence(data: AnyStr, filename: str, content_type: str) -> Dict[str, str]:
     if isinstance(data, bytes):
@@ -59,3 +66,100 @@ def zip(data: AnyStr, filename: str) -> Dict[str, str]:
 
 def gzip(data: AnyStr, filename: str) -> Dict[str, str]:
     return evidence(data, filename, GZIP)
+
+
+class FileEvidence(Mapping):
+    """Evidence stored in a file, read and encoded only when it is serialized."""
+
+    def __init__(self, path: Union[str, os.PathLike], content_type: str, filename: Optional[str] = None) -> None:
+        self.path = os.fspath(path)
+        if not os.path.isfile(self.path):
+            raise XrayError(f'Evidence file does not exist: {self.path}')
+        self.filename = filename or os.path.basename(self.path)
+        self.content_type = content_type
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path='{self.path}', content_type='{self.content_type}')"
+
+    def __getitem__(self, key: str) -> str:
+        if key == 'data':
+            return ''.join(self.iter_base64())
+        if key == 'filename':
+            return self.filename
+        if key == 'contentType':
+            return self.content_type
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('data', 'filename', 'contentType'))
+
+    def __len__(self) -> int:
+        return 3
+
+    def exists(self) -> bool:
+        """Return True if the file still exists, it may be removed after the evidence was attached."""
+        return os.path.isfile(self.path)
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes."""
+        return os.path.getsize(self.path)
+
+    @property
+    def encoded_size(self) -> int:
+        """Size of base64-encoded file content."""
+        return (self.size + 2) // 3 * 4
+
+    def iter_base64(self, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[str]:
+        """Encode file content to base64 chunk by chunk."""
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                for start in range(0, len(content), chunk_size):
+                    yield base64.b64encode(content[start:start + chunk_size]).decode('utf-8')
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(self)
+
+    def iter_json(self) -> Iterator[str]:
+        """Serialize evidence to JSON fragments without reading the whole file."""
+        yield '{"data": "'
+        yield from self.iter_base64()
+        yield f'", "filename": {_json.dumps(self.filename)}, "contentType": {_json.dumps(self.content_type)}}}'
+
+
+def from_file(path: Union[str, os.PathLike], content_type: str, filename: Optional[str] = None) -> FileEvidence:
+    return FileEvidence(path, content_type, filename)
+
+
+def jpeg_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, IMAGE_JPEG, filename)
+
+
+def png_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, IMAGE_PNG, filename)
+
+
+def text_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, PLAIN_TEXT, filename)
+
+
+def csv_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, CSV, filename)
+
+
+def json_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, JSON, filename)
+
+
+def xml_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, XML, filename)
+
+
+def zip_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, ZIP, filename)
+
+
+def gzip_file(path: Union[str, os.PathLike], filename: Optional[str] = None) -> FileEvidence:
+    return from_file(path, GZIP, filename)
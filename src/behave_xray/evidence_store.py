@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import logging
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from behave_xray.evidence import PLAIN_TEXT, FileEvidence, evidence
+
+
+_logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE: int = 1024 * 1024
+
+
+class DedupMode(Enum):
+    none = 'none'  # every attachment is sent
+    reference = 'reference'  # repeated attachment is replaced by a note pointing to the first one
+
+
+class BudgetPolicy(Enum):
+    drop = 'drop'  # evidence over budget is left out
+    truncate = 'truncate'  # evidence is cut to the remaining budget
+    summarize = 'summarize'  # evidence is replaced by a short note
+
+
+@dataclass
+class _StoredEvidence:
+    test_key: str
+    filename: str
+
+
+class EvidenceStore:
+    """Evidences of one test execution, keyed by a hash of their content.
+
+    Evidences can be de-duplicated across test cases and limited by byte
+    budgets per test case and per test execution. Sizes are sizes of the
+    base64-encoded data.
+    """
+
+    def __init__(
+        self,
+        dedup: DedupMode = DedupMode.none,
+        max_test_bytes: int = 0,
+        max_execution_bytes: int = 0,
+        policy: BudgetPolicy = BudgetPolicy.summarize
+    ) -> None:
+        """
+        :param dedup: handling of evidences attached more than once
+        :param max_test_bytes: budget per test case, 0 means unlimited
+        :param max_execution_bytes: budget per test execution, 0 means unlimited
+        :param policy: handling of evidences which exceed a budget
+        """
+        self.dedup = dedup
+        self.max_test_bytes = max_test_bytes
+        self.max_execution_bytes = max_execution_bytes
+        self.policy = policy
+        self.execution_bytes = 0
+        self._evidences: Dict[str, _StoredEvidence] = {}
+
+    def select(
+        self,
+        test_key: str,
+        evidences: List[Union[Dict[str, Any], FileEvidence]]
+    ) -> List[Union[Dict[str, Any], FileEvidence]]:
+        """Return evidences of the test case which should be sent."""
+        if self.dedup == DedupMode.none and not (self.max_test_bytes or self.max_execution_bytes):
+            return evidences
+        selected: List[Union[Dict[str, Any], FileEvidence]] = []
+        seen_in_test = set()
+        test_bytes = 0
+        for item in evidences:
+            if isinstance(item, FileEvidence) and not item.exists():
+                _logger.warning('Evidence file %s does not exist, evidence skipped', item.path)
+                continue
+            if self.dedup == DedupMode.reference:
+                digest = self._get_digest(item)
+                if digest in seen_in_test:
+                    continue
+                seen_in_test.add(digest)
+                stored = self._evidences.setdefault(digest, _StoredEvidence(test_key, item['filename']))
+                if stored.test_key != test_key:
+                    item = self._get_reference(item, stored)
+            size = _get_size(item)
+            available = self._get_available_bytes(test_bytes)
+            if available is not None and size > available:
+                selected_item = self._apply_policy(item, size, available)
+                if selected_item is None:
+                    continue
+                item = selected_item
+                size = _get_size(item)
+            test_bytes += size
+            self.execution_bytes += size
+            selected.append(item)
+        return selected
+
+    def _get_available_bytes(self, test_bytes: int) -> Optional[int]:
+        limits = []
+        if self.max_test_bytes:
+            limits.append(self.max_test_bytes - test_bytes)
+        if self.max_execution_bytes:
+            limits.append(self.max_execution_bytes - self.execution_bytes)
+        return max(0, min(limits)) if limits else None
+
+    def _apply_policy(self, item: Mapping, size: int, available: int) -> Optional[Dict[str, str]]:
+        _logger.warning('Evidence %s (%d bytes) exceeds the evidence budget, %s', item['filename'], size,
+                        self.policy.value)
+        if self.policy == BudgetPolicy.drop:
+            return None
+        if self.policy == BudgetPolicy.truncate:
+            # 4 base64 characters encode 3 bytes
+            raw_size = available // 4 * 3
+            if raw_size:
+                return evidence(_read_prefix(item, raw_size), item['filename'], item['contentType'])
+        note = (f"Evidence {item['filename']} ({item['contentType']}, {size} bytes encoded) "
+                f'was left out because it exceeds the evidence budget')
+        summary = evidence(note, f"{item['filename']}.omitted.txt", PLAIN_TEXT)
+        return summary if _get_size(summary) <= available else None
+
+    @staticmethod
+    def _get_reference(item: Mapping, stored: _StoredEvidence) -> Dict[str, str]:
+        note = f'Same content as evidence {stored.filename} of test {stored.test_key}'
+        return evidence(note, f"{item['filename']}.ref.txt", PLAIN_TEXT)
+
+    @staticmethod
+    def _get_digest(item: Mapping) -> str:
+        sha = hashlib.sha256()
+        if isinstance(item, FileEvidence):
+            with open(item.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    sha.update(chunk)
+        else:
+            sha.update(base64.b64decode(item['data']))
+        return sha.hexdigest()
+
+
+def _get_size(item: Mapping) -> int:
+    if isinstance(item, FileEvidence):
+        return item.encoded_size
+    return len(item['data'])
+
+
+def _read_prefix(item: Mapping, raw_size: int) -> bytes:
+    if isinstance(item, FileEvidence):
+        with open(item.path, 'rb') as f:
+            return f.read(raw_size)
+    data = item['data']
+    # decode only the base64 characters needed for the prefix
+    prefix = data[:(raw_size + 2) // 3 * 4]
+    return base64.b64decode(prefix)[:raw_size]
@@ -1,28 +1,49 @@
+import datetime as dt
 import importlib
-import json
+import logging
 import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from enum import Enum, auto
-from os import environ, getenv
-from typing import AnyStr, Dict, List, Optional, Tuple, Union
+from enum import Enum
+from typing import Dict, List, Optional, Tuple, Union
 
 import pluggy
+import requests
 from behave.formatter.base import Formatter
 from behave.model import Feature as BehaveFeature
 from behave.model import Scenario as BehaveScenario
 from behave.model import Status
+from behave.model import Step as BehaveStep
 
 from behave_xray import hookspecs
-from behave_xray.authentication import AuthBase, BearerAuth, PersonalAccessTokenAuth
+from behave_xray.authentication import AuthBase
+from behave_xray.config import AuthType, JiraConfig, get_auth  # noqa: F401
+from behave_xray.config import get_jira_config as _get_jira_config
+from behave_xray.evidence_store import BudgetPolicy, DedupMode, EvidenceStore
 from behave_xray.exceptions import XrayError
-from behave_xray.helper import (
-    get_overall_status,
-    get_test_execution_key_from_tag,
-    get_test_plan_key_from_tag,
-    get_testcase_key_from_tag,
-)
+from behave_xray.helper import classify_tag, str_to_bool
+from behave_xray.metrics import Metrics
 from behave_xray.model import TestCase, TestCaseCloud, TestExecution
+from behave_xray.result import ScenarioResult, fill_test_case
+from behave_xray.retry import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_MAX_BACKOFF,
+    DEFAULT_MAX_RETRY_AFTER,
+    CircuitBreaker,
+    RetryPolicy,
+)
+from behave_xray.serialization import SerializedTestExecution, dumps
+from behave_xray.session import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, create_session
+from behave_xray.shard import build_shard, collect_shard, write_shard
+from behave_xray.spool import Spool
+from behave_xray.state_index import StateIndex
+from behave_xray.token_cache import TokenCache
+from behave_xray.tracing import NOOP_SPAN, JsonLinesExporter, Span, Tracer
+from behave_xray.upload_worker import DEFAULT_CLOSE_TIMEOUT, DEFAULT_QUEUE_SIZE, UploadWorker
 from behave_xray.xray_publisher import (
     TEST_EXECUTION_ENDPOINT,
     TEST_EXECUTION_ENDPOINT_CLOUD,
@@ -30,51 +51,34 @@ from behave_xray.xray_publisher import (
 )
 
 
-class AuthType(Enum):
-    bearer = auto()  # client id & client secret
-    token = auto()
-    basic = auto()
+_logger = logging.getLogger(__name__)
 
 
 @dataclass
-class JiraConfig:
-    jira_url: str
-    user_name: str = ''
-    user_password: str = ''
-    client_id: str = ''
-    client_secret: str = ''
-    token: str = ''
-
-    @property
-    def auth_method(self) -> AuthType:
-        if self.client_id and self.client_id:
-            return AuthType.bearer
-        if self.token:
-            return AuthType.token
-        else:
-            return AuthType.basic
-
+class Verdict:
+    status: Status
+    message: str
 
-@dataclass
-class ScenarioResult:
-    """Class stores scenario result."""
 
-    testcase_key: Optional[str] = None
-    statuses: List[Status] = field(default_factory=list)
-    comment: str = ''
-    is_outline: bool = False
-    evidences: List[Dict[str, AnyStr]] = field(default_factory=list)
+class Scope(Enum):
+    feature = 'feature'  # one test execution per feature file
+    run = 'run'  # one test execution for the whole behave run
+    execution = 'execution'  # one test execution per test execution and test plan key
 
 
 @dataclass
-class Verdict:
-    status: Status
-    message: str
+class Bucket:
+    """Results of features published to the same test execution and test plan."""
+
+    start_date: dt.datetime
+    descriptions: List[str] = field(default_factory=list)
+    testcases: Dict[str, ScenarioResult] = field(default_factory=dict)
 
 
 class _XrayFormatterBase(Formatter):
     name = 'xray'
     description = 'Jira XRAY formatter'
+    endpoint: str = ''
 
     STATUS_MAPS: Dict[str, str] = {}
 
@@ -84,9 +88,21 @@ class _XrayFormatterBase(Formatter):
         self.pm = self._get_plugin_manager()
         self._register_user_hook()
         self.xray_publisher = publisher
+        self.metrics: Metrics = publisher.metrics
+        self.tracer: Tracer = self._create_tracer()
+        publisher.tracer = self.tracer
+        self.feature_span: Span = NOOP_SPAN
+        self.scenario_span: Span = NOOP_SPAN
         self.current_feature: Optional[BehaveFeature] = None
         self.current_scenario: Optional[BehaveScenario] = None
         self.current_test_key: Optional[str] = None
+        # behave reports no end of a scenario, the scenario is done after its last step
+        self.last_step: Optional[BehaveStep] = None
+        # run scenario hook after every step as in older versions instead of once per scenario
+        self.hook_per_step: bool = self._get_bool_option('xray.hook_per_step')
+        self.scenario_result_pending: bool = False
+        # Jira Xray test keys of scenario tags in the current feature
+        self.tag_index: Dict[str, Optional[str]] = {}
         self.test_execution: TestExecution = TestExecution(
             summary=self._get_summary(),
             user=self._get_user(),
@@ -95,6 +111,25 @@ class _XrayFormatterBase(Formatter):
         )
         # store Jira Xray test ID with corresponding Behave's scenario
         self.testcases: Dict[str, ScenarioResult] = defaultdict(lambda: ScenarioResult())
+        self.evidence_store: EvidenceStore = self._create_evidence_store()
+        self.shard_dir: str = self.config.userdata.get('xray.shard_dir', '')
+        # results are kept in memory of the process and collected by `behave-xray run`
+        self.collect_only: bool = self._get_bool_option('xray.collect_only')
+        # a shard collects results of the whole run
+        self.scope: Scope = Scope.run if self.shard_dir or self.collect_only else self._get_scope()
+        # results accumulated across features in run scope
+        self.run_testcases: Dict[str, ScenarioResult] = {}
+        self.run_features: List[str] = []
+        # results by test execution and test plan key in execution scope
+        self.buckets: Dict[Tuple[str, str], Bucket] = {}
+        self.bucket_max_tests: int = int(self.config.userdata.get('xray.bucket_max_tests', 0))
+        self.upload_worker: Optional[UploadWorker] = None
+        if self._get_bool_option('xray.async'):
+            self.upload_worker = UploadWorker(
+                publisher=self.xray_publisher,
+                max_queue_size=int(self.config.userdata.get('xray.async_queue_size', DEFAULT_QUEUE_SIZE))
+            )
+            self.upload_worker.start()
 
     def _get_plugin_manager(self):
         pm = pluggy.PluginManager('xray')
@@ -111,18 +146,72 @@ class _XrayFormatterBase(Formatter):
         except ImportError:
             pass
 
+    def _create_tracer(self) -> Tracer:
+        exporter = self.pm.hook.xray_span_exporter(config=self.config)
+        if exporter is None:
+            trace_file = self.config.userdata.get('xray.trace_file', '')
+            exporter = JsonLinesExporter(trace_file) if trace_file else None
+        return Tracer(exporter)
+
+    @classmethod
+    def _create_publisher(cls, config) -> XrayPublisher:
+        if str_to_bool(config.userdata.get('xray.collect_only', False)) or config.userdata.get('xray.shard_dir'):
+            # results are published by the parent process or merged from shards,
+            # workers and shard nodes do not need Jira credentials
+            return XrayPublisher(base_url='', endpoint=cls.endpoint, auth=None)
+        jira_config = _get_jira_config()
+        session = create_session(
+            pool_size=int(config.userdata.get('xray.pool_size', DEFAULT_POOL_SIZE)),
+            keep_alive=str_to_bool(config.userdata.get('xray.keep_alive', True)),
+            http2=str_to_bool(config.userdata.get('xray.http2', False))
+        )
+        token_cache_path = config.userdata.get('xray.token_cache', '')
+        timeout = float(config.userdata.get('xray.request_timeout', DEFAULT_TIMEOUT))
+        metrics = Metrics()
+        auth = cls._get_auth(
+            jira_config=jira_config,
+            session=session,
+            token_cache=TokenCache(token_cache_path) if token_cache_path else None,
+            metrics=metrics,
+            timeout=timeout
+        )
+        retry_policy = RetryPolicy(
+            max_attempts=int(config.userdata.get('xray.max_attempts', DEFAULT_MAX_ATTEMPTS)),
+            backoff_factor=float(config.userdata.get('xray.backoff_factor', DEFAULT_BACKOFF_FACTOR)),
+            max_backoff=float(config.userdata.get('xray.max_backoff', DEFAULT_MAX_BACKOFF)),
+            max_retry_after=float(config.userdata.get('xray.max_retry_after', DEFAULT_MAX_RETRY_AFTER))
+        )
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=int(config.userdata.get('xray.circuit_breaker_threshold', DEFAULT_FAILURE_THRESHOLD))
+        )
+        spool_dir = config.userdata.get('xray.spool_dir', '')
+        state_index_path = config.userdata.get('xray.state_index', '')
+        return XrayPublisher(
+            base_url=jira_config.jira_url,
+            endpoint=cls.endpoint,
+            auth=auth,
+            session=session,
+            retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker,
+            stream_upload=str_to_bool(config.userdata.get('xray.stream_upload', False)),
+            max_payload_size=int(config.userdata.get('xray.max_payload_bytes', 0)),
+            max_workers=int(config.userdata.get('xray.upload_workers', 1)),
+            spool=Spool(spool_dir) if spool_dir else None,
+            metrics=metrics,
+            reuse_test_execution=str_to_bool(config.userdata.get('xray.reuse_test_execution', False)),
+            state_index=StateIndex(state_index_path) if state_index_path else None,
+            timeout=timeout
+        )
+
     @staticmethod
-    def _get_auth(jira_config: JiraConfig) -> Union[Tuple[str, str], AuthBase]:
-        if jira_config.auth_method == AuthType.bearer:
-            return BearerAuth(
-                base_url=jira_config.jira_url,
-                client_id=jira_config.client_id,
-                client_secret=jira_config.client_secret
-            )
-        elif jira_config.auth_method == AuthType.token:
-            return PersonalAccessTokenAuth(token=jira_config.token)
-        else:  # basic
-            return jira_config.user_name, jira_config.user_password
+    def _get_auth(
+        jira_config: JiraConfig,
+        session: Optional[requests.Session] = None,
+        token_cache: Optional[TokenCache] = None,
+        metrics: Optional[Metrics] = None,
+        timeout: float = DEFAULT_TIMEOUT
+    ) -> Union[Tuple[str, str], AuthBase]:
+        return get_auth(jira_config, session=session, token_cache=token_cache, metrics=metrics, timeout=timeout)
 
     def _get_summary(self) -> str:
         return self.config.userdata.get('xray.summary', '')
@@ -136,46 +225,121 @@ class _XrayFormatterBase(Formatter):
     def _get_version(self) -> str:
         return self.config.userdata.get('xray.version', '')
 
+    def _get_scope(self) -> Scope:
+        value = self.config.userdata.get('xray.scope', Scope.feature.value)
+        try:
+            return Scope(value)
+        except ValueError:
+            raise XrayError(f'Invalid value of xray.scope: {value}, '
+                            f'expected one of: {", ".join(scope.value for scope in Scope)}')
+
+    def _create_evidence_store(self) -> EvidenceStore:
+        userdata = self.config.userdata
+        try:
+            return EvidenceStore(
+                dedup=DedupMode(userdata.get('xray.evidence_dedup', DedupMode.none.value)),
+                max_test_bytes=int(userdata.get('xray.max_test_evidence_bytes', 0)),
+                max_execution_bytes=int(userdata.get('xray.max_execution_evidence_bytes', 0)),
+                policy=BudgetPolicy(userdata.get('xray.evidence_budget_policy', BudgetPolicy.summarize.value))
+            )
+        except ValueError as exc:
+            raise XrayError(f'Invalid evidence option: {exc}')
+
+    def _get_bool_option(self, name: str, default: bool = False) -> bool:
+        return str_to_bool(self.config.userdata.get(name, default))
+
+    def _get_async_timeout(self) -> Optional[float]:
+        timeout = self.config.userdata.get('xray.async_timeout', DEFAULT_CLOSE_TIMEOUT)
+        if str(timeout).lower() in ('', 'none'):
+            return None
+        return float(timeout)
+
     def reset(self):
         self.current_feature = None
         self.current_scenario = None
         self.current_test_key = None
-        self.test_execution = TestExecution(
-            summary=self._get_summary(),
-            user=self._get_user(),
-            revision=self._get_revision(),
-            version=self._get_version()
-        )
+        if self.scope != Scope.run:
+            self.test_execution = TestExecution(
+                summary=self._get_summary(),
+                user=self._get_user(),
+                revision=self._get_revision(),
+                version=self._get_version()
+            )
+            self.evidence_store = self._create_evidence_store()
         self.testcases = defaultdict(lambda: ScenarioResult())
 
     def feature(self, feature):
         self.current_feature = feature
+        self.feature_span = self.tracer.start_span(
+            'behave.feature',
+            {'behave.feature.name': feature.name, 'behave.feature.filename': feature.filename}
+        )
 
         # description is a mandatory Xray field, use feature name if it doesn't have a description
         description_text = '\n'.join(feature.description) if feature.description else feature.name
+        if self.scope == Scope.run:
+            self.run_features.append(feature.name)
+            description_text = '\n'.join(self.run_features)
         self.test_execution.description = description_text
         for tag in feature.tags:
-            test_exec_key = get_test_execution_key_from_tag(tag)
-            if test_exec_key:
-                self.test_execution.test_execution_key = test_exec_key
-            test_plan_key = get_test_plan_key_from_tag(tag)
-            if test_plan_key:
-                self.test_execution.test_plan_key = test_plan_key
+            keys = classify_tag(tag)
+            if keys.test_execution:
+                self._set_test_execution_key(keys.test_execution)
+            if keys.test_plan:
+                self._set_test_plan_key(keys.test_plan)
+        self.tag_index = self._build_tag_index(feature)
+
+    @staticmethod
+    def _build_tag_index(feature) -> Dict[str, Optional[str]]:
+        """Return Jira Xray test keys of all scenario tags in the feature, outline rows included."""
+        tag_index: Dict[str, Optional[str]] = {}
+        for scenario in feature.walk_scenarios():
+            for tag in scenario.tags:
+                if tag not in tag_index:
+                    tag_index[tag] = classify_tag(tag).testcase
+        return tag_index
+
+    def _get_testcase_key(self, tag: str) -> Optional[str]:
+        try:
+            return self.tag_index[tag]
+        except KeyError:
+            testcase_key = self.tag_index[tag] = classify_tag(tag).testcase
+            return testcase_key
+
+    def _set_test_execution_key(self, key: str) -> None:
+        current_key = self.test_execution.test_execution_key
+        if self.scope == Scope.run and current_key and current_key != key:
+            _logger.warning('Test execution %s ignored, results are published to %s', key, current_key)
+            return
+        self.test_execution.test_execution_key = key
+
+    def _set_test_plan_key(self, key: str) -> None:
+        current_key = self.test_execution.test_plan_key
+        if self.scope == Scope.run and current_key and current_key != key:
+            _logger.warning('Test plan %s ignored, results are published to %s', key, current_key)
+            return
+        self.test_execution.test_plan_key = key
 
     def is_scenario_outline(self):
         return True if 'Scenario Outline' in self.current_scenario.keyword else False
 
     def scenario(self, scenario):
+        # behave does not report the end of a scenario, the previous one is done when the next one starts
+        self._finish_scenario()
         self.current_scenario = scenario
         self.current_test_key = None
+        steps = list(scenario.all_steps)
+        self.last_step = steps[-1] if steps else None
+        self.scenario_span = self.tracer.start_span('behave.scenario', {'behave.scenario.name': scenario.name})
         if not scenario.tags:
             return
 
         for tag in scenario.tags:
-            testcase_key = get_testcase_key_from_tag(tag)
+            testcase_key = self._get_testcase_key(tag)
             if testcase_key:
                 self.current_test_key = testcase_key
                 self.testcases[testcase_key].is_outline = self.is_scenario_outline()
+                self.scenario_span.set_attribute('xray.test_key', testcase_key)
 
     def _get_xray_status(self, status: str) -> str:
         try:
@@ -195,26 +359,87 @@ class _XrayFormatterBase(Formatter):
 
     @property
     def current_test_case(self) -> Optional[ScenarioResult]:
+        if self.current_test_key is None:
+            return None
         try:
             return self.testcases[self.current_test_key]
         except KeyError:
             return None
 
     def result(self, step):
-        if self.current_scenario.status == Status.untested:
+        span = self._start_step_span(step)
+        try:
+            self._record_result(step, span)
+        finally:
+            self.tracer.end_span(span)
+
+    def _start_step_span(self, step) -> Span:
+        if not self.tracer.enabled:
+            return NOOP_SPAN
+        # the step is reported when it is done, the span covers its run
+        start_time = time.time_ns() - int((step.duration or 0.0) * 1e9)
+        return self.tracer.start_span(
+            'behave.step',
+            {'behave.step.name': step.name, 'behave.step.status': step.status.name},
+            start_time=start_time
+        )
+
+    def _record_result(self, step, span: Span) -> None:
+        scenario = self.current_scenario
+        if scenario is None or scenario.status == Status.untested:
             return
 
-        if self.current_test_key is None:
+        test_case = self.current_test_case
+        if test_case is None:
             return
 
         verdict = self.get_verdict(step)
-        self.current_test_case.statuses.append(verdict.status)
-        self.pm.hook.scenario_xray_result(
-            result=self.current_test_case,
-            scenario=self.current_scenario
-        )
+        span.set_attribute('xray.test_key', self.current_test_key)
+        test_case.append_status(verdict.status)
+        test_case.duration += step.duration or 0.0
+        if self.hook_per_step:
+            self._run_scenario_hook()
+        else:
+            self.scenario_result_pending = True
         if not self.is_scenario_outline():
-            self.current_test_case.comment = verdict.message
+            test_case.comment = verdict.message
+        if self.scenario_result_pending and self._is_last_step(scenario, step):
+            self.scenario_result_pending = False
+            self._run_scenario_hook()
+
+    def _is_last_step(self, scenario: BehaveScenario, step) -> bool:
+        """Return True when behave runs no other step of the scenario after the step."""
+        if step.status != Status.passed:
+            # remaining steps are skipped without being reported
+            return not (scenario.continue_after_failed_step and step.has_failed())
+        return scenario.should_skip or step is self.last_step
+
+    def _finish_scenario(self) -> None:
+        """Run the scenario hook if the last step of the scenario was not reported, end the scenario span."""
+        if self.scenario_result_pending:
+            self.scenario_result_pending = False
+            self._run_scenario_hook()
+        if self.scenario_span is not NOOP_SPAN:
+            if self.current_scenario is not None:
+                self.scenario_span.set_attribute('behave.scenario.status', self.current_scenario.status.name)
+            self.tracer.end_span(self.scenario_span)
+            self.scenario_span = NOOP_SPAN
+
+    def _run_scenario_hook(self) -> None:
+        with self.metrics.timer('scenario_hook'), self.tracer.span('xray.scenario_hook'):
+            self.pm.hook.scenario_xray_result(
+                result=self.current_test_case,
+                scenario=self.current_scenario
+            )
+
+    def _finish_feature(self) -> None:
+        self._finish_scenario()
+        if self.testcases:
+            with self.metrics.timer('feature_hook'), self.tracer.span('xray.feature_hook'):
+                self.pm.hook.feature_xray_results(
+                    results=dict(self.testcases),
+                    feature=self.current_feature
+                )
 
     @staticmethod
     def _get_test_case(test_key) -> TestCase:
@@ -222,30 +447,201 @@ class _XrayFormatterBase(Formatter):
 
     def eof(self) -> None:
         # run when current feature is done
+        self._finish_scenario()
+        if self.feature_span is not NOOP_SPAN and self.current_feature is not None:
+            self.feature_span.set_attribute('behave.feature.status', self.current_feature.status.name)
+        with self.tracer.span('xray.eof'):
+            self._publish_feature()
+        self.tracer.end_span(self.feature_span)
+        self.feature_span = NOOP_SPAN
+
+    def _publish_feature(self) -> None:
         if self.config.dry_run:
             return
 
+        self._finish_feature()
+
+        if self.scope == Scope.run:
+            self.merge_run_results()
+            self.reset()
+            return
+
+        if self.scope == Scope.execution:
+            self.add_to_bucket()
+            self.reset()
+            return
+
         self.collect_tests()
         if self.test_execution.tests:
-            self.xray_publisher.publish(self.test_execution.as_dict())
-            if self.stream != sys.stdout:
-                self.stream.write(json.dumps(self.test_execution.as_dict(), indent=4))
-                self.stream.flush()
-        self.test_execution.flush()
+            self.publish(self.test_execution)
         self.reset()
 
-    def collect_tests(self) -> None:
-        """Update test execution with test cases."""
-        for tc_id, tc_status in self.testcases.items():
-            testcase = self._get_test_case(test_key=tc_id)
-            if tc_status.is_outline:
-                testcase.status = self._get_xray_status(get_overall_status(tc_status.statuses).name)
-                testcase.examples = [self._get_xray_status(s.name) for s in tc_status.statuses]
+    def publish(self, test_execution: TestExecution, name: str = '') -> None:
+        """Publish test execution, in background if asynchronous mode is enabled."""
+        payload = self._encode(test_execution)
+        if self.upload_worker is not None:
+            self.upload_worker.submit(payload, name=name or self._get_upload_name())
+        else:
+            self.xray_publisher.publish(payload)
+        self._write_report(test_execution, payload)
+
+    def _encode(self, test_execution: TestExecution) -> Union[SerializedTestExecution, TestExecution]:
+        # in streaming mode the execution is serialized when it is sent, so it must not be modified later,
+        # otherwise it is serialized once and the same body is uploaded and written to the output file
+        if self.xray_publisher.stream_upload:
+            return test_execution
+        with self.metrics.timer('encode'):
+            return SerializedTestExecution.from_dict(test_execution.as_dict())
+
+    def _write_report(
+        self,
+        test_execution: TestExecution,
+        payload: Union[SerializedTestExecution, TestExecution]
+    ) -> None:
+        if self.stream != sys.stdout:
+            if isinstance(payload, SerializedTestExecution):
+                body = dumps(payload.data, pretty=True) if self._get_bool_option('xray.pretty') else payload.body
+                self.stream.write(body.decode('utf-8'))
             else:
-                testcase.status = self._get_xray_status(tc_status.statuses[0].name)
-                testcase.comment = tc_status.comment
-            testcase.evidences = tc_status.evidences
-            self.test_execution.append(testcase)
+                for fragment in test_execution.iter_json():
+                    self.stream.write(fragment)
+            self.stream.flush()
+
+    def _get_upload_name(self) -> str:
+        if self.current_feature is not None:
+            return str(self.current_feature.filename)
+        return f'{len(self.run_features)} features'
+
+    def merge_run_results(self) -> None:
+        """Merge results of the current feature into results of the whole run."""
+        _merge_results(self.run_testcases, self.testcases)
+
+    def add_to_bucket(self) -> None:
+        """Add results of the current feature to results of its test execution and test plan."""
+        key = (self.test_execution.test_execution_key, self.test_execution.test_plan_key)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(start_date=self.test_execution.start_date)
+        bucket.descriptions.append(self.test_execution.description)
+        _merge_results(bucket.testcases, self.testcases)
+        # publish early to limit memory, later results of the bucket are imported into the same test execution,
+        # a bucket without a test execution key is published once, otherwise each upload would create a new one
+        if self.bucket_max_tests and key[0] and len(bucket.testcases) >= self.bucket_max_tests:
+            self.flush_buckets([key])
+
+    def flush_buckets(self, keys: Optional[List[Tuple[str, str]]] = None) -> None:
+        """Publish buckets, several buckets are uploaded concurrently.
+
+        :param keys: keys of buckets to publish, all buckets by default
+        """
+        keys = list(self.buckets) if keys is None else keys
+        test_executions = [self._build_bucket_execution(key, self.buckets.pop(key)) for key in keys]
+        test_executions = [test_execution for test_execution in test_executions if test_execution.tests]
+        if self.upload_worker is not None or len(test_executions) < 2:
+            for test_execution in test_executions:
+                self.publish(test_execution, name=_get_bucket_name(test_execution))
+            return
+        payloads = [self._encode(test_execution) for test_execution in test_executions]
+        with ThreadPoolExecutor(max_workers=self.xray_publisher.max_workers) as executor:
+            for _ in executor.map(self.xray_publisher.publish, payloads):
+                pass
+        for test_execution, payload in zip(test_executions, payloads):
+            self._write_report(test_execution, payload)
+
+    def _build_bucket_execution(self, key: Tuple[str, str], bucket: Bucket) -> TestExecution:
+        test_execution_key, test_plan_key = key
+        test_execution = TestExecution(
+            test_execution_key=test_execution_key,
+            test_plan_key=test_plan_key,
+            summary=self._get_summary(),
+            user=self._get_user(),
+            revision=self._get_revision(),
+            version=self._get_version(),
+            description='\n'.join(bucket.descriptions)
+        )
+        test_execution.start_date = bucket.start_date
+        self.collect_tests(bucket.testcases, test_execution, self._create_evidence_store())
+        return test_execution
+
+    def close(self) -> None:
+        cloud = self.endpoint == TEST_EXECUTION_ENDPOINT_CLOUD
+        if self.collect_only:
+            collect_shard(build_shard(self.test_execution, self.run_testcases, cloud=cloud))
+        elif self.shard_dir:
+            if self.run_testcases:
+                path = write_shard(self.shard_dir, self.test_execution, self.run_testcases, cloud=cloud)
+                print('Xray results written to shard:', path)
+        elif self.scope == Scope.run and self.run_testcases:
+            self.collect_tests(self.run_testcases)
+            if self.test_execution.tests:
+                self.publish(self.test_execution)
+            self.run_testcases = {}
+        elif self.scope == Scope.execution:
+            self.flush_buckets()
+        uploads_finished = True
+        if self.upload_worker is not None:
+            uploads_finished = self._close_upload_worker(self.upload_worker)
+            self.upload_worker = None
+        if uploads_finished:
+            # the worker still uses the session of a publisher whose uploads did not finish
+            self.xray_publisher.close()
+        metrics_file = self.config.userdata.get('xray.metrics_file', '')
+        if metrics_file:
+            self.metrics.write(metrics_file)
+        self.tracer.shutdown()
+        super().close()
+
+    def _close_upload_worker(self, worker: UploadWorker) -> bool:
+        """Wait for scheduled uploads and report them, return True if all uploads finished."""
+        timeout = self._get_async_timeout()
+        finished = worker.close(timeout=timeout)
+        if not finished:
+            _logger.error('Xray uploads did not finish within %s seconds', timeout)
+        for result in worker.results:
+            status = 'OK' if result.success else 'FAILED'
+            print(f'Xray upload {status}: {result.name} ({result.duration:.2f}s)')
+        for name in worker.pending:
+            print(f'Xray upload NOT FINISHED: {name}')
+        return finished
+
+    def collect_tests(
+        self,
+        testcases: Optional[Dict[str, ScenarioResult]] = None,
+        test_execution: Optional[TestExecution] = None,
+        evidence_store: Optional[EvidenceStore] = None
+    ) -> None:
+        """Update test execution with test cases.
+
+        :param testcases: results to collect, results of the current feature by default
+        :param test_execution: test execution to update, the current one by default
+        :param evidence_store: store limiting evidences of the test execution, the current one by default
+        """
+        if testcases is None:
+            testcases = self.testcases
+        if test_execution is None:
+            test_execution = self.test_execution
+        if evidence_store is None:
+            evidence_store = self.evidence_store
+        for tc_id, tc_status in testcases.items():
+            testcase = self._get_test_case(test_key=tc_id)
+            fill_test_case(testcase, tc_status, self._get_xray_status)
+            testcase.evidences = evidence_store.select(tc_id, tc_status.evidences)
+            test_execution.append(testcase)
+
+
+def _merge_results(target: Dict[str, ScenarioResult], results: Dict[str, ScenarioResult]) -> None:
+    for tc_id, tc_status in results.items():
+        if tc_id in target:
+            target[tc_id].merge(tc_status)
+        else:
+            target[tc_id] = tc_status
+
+
+def _get_bucket_name(test_execution: TestExecution) -> str:
+    test_execution_key = test_execution.test_execution_key or 'new test execution'
+    if test_execution.test_plan_key:
+        return f'{test_execution_key} ({test_execution.test_plan_key})'
+    return test_execution_key
 
 
 class XrayFormatter(_XrayFormatterBase):
@@ -262,9 +658,7 @@ class XrayFormatter(_XrayFormatterBase):
     }
 
     def __init__(self, stream, config):
-        jira_config = _get_jira_config()
-        auth = self._get_auth(jira_config=jira_config)
-        publisher = XrayPublisher(base_url=jira_config.jira_url, endpoint=self.endpoint, auth=auth)
+        publisher = self._create_publisher(config)
         super().__init__(stream, config, publisher)
 
 
@@ -282,32 +676,9 @@ class XrayCloudFormatter(_XrayFormatterBase):
     }
 
     def __init__(self, stream, config):
-        jira_config = _get_jira_config()
-        auth = self._get_auth(jira_config=jira_config)
-        publisher = XrayPublisher(base_url=jira_config.jira_url, endpoint=self.endpoint, auth=auth)
+        publisher = self._create_publisher(config)
         super().__init__(stream, config, publisher)
 
     @staticmethod
     def _get_test_case(test_key):
         return TestCaseCloud(test_key=test_key)
-
-
-def _get_jira_config() -> JiraConfig:
-    """Return jira configuration from env variables."""
-    try:
-        jira_url = environ['XRAY_API_BASE_URL']
-    except KeyError:
-        raise XrayError('Environment variable `XRAY_API_BASE_URL` must be set')
-    user_name = getenv('XRAY_API_USER', '')
-    user_password = getenv('XRAY_API_PASSWORD', '')
-    client_id = getenv('XRAY_CLIENT_ID', '')
-    client_secret = getenv('XRAY_CLIENT_SECRET', '')
-    token = getenv('XRAY_TOKEN', '')
-    return JiraConfig(
-        user_name=user_name,
-        user_password=user_password,
-        jira_url=jira_url,
-        client_id=client_id,
-        client_secret=client_secret,
-        token=token
-    )
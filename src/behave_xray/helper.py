@@ -1,42 +1,74 @@
 import re
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple, Union
 
 from behave.model import Status
 
 
+TAG_CACHE_SIZE: int = 4096
+
+# statuses which do not hide the result of other steps or examples
+_NON_DOMINANT_STATUSES = frozenset((Status.passed, Status.skipped, Status.untested))
+# worst first, statuses unknown to the installed behave version are left out
+_DOMINANT_STATUS_NAMES = (
+    'failed', 'error', 'hook_error', 'cleanup_error', 'executing', 'undefined', 'pending', 'pending_warn',
+    'untested_undefined', 'untested_pending', 'xpassed', 'xfailed'
+)
+# statuses which decide the overall status whenever present, in order of precedence,
+# statuses added by later behave versions rank after the known ones
+DOMINANT_STATUSES: Tuple[Status, ...] = tuple(
+    Status[name] for name in _DOMINANT_STATUS_NAMES if name in Status.__members__
+) + tuple(
+    status for status in Status if status not in _NON_DOMINANT_STATUSES and status.name not in _DOMINANT_STATUS_NAMES
+)
+
+
+class TagKeys(NamedTuple):
+    """Jira Xray keys defined by a tag, a tag defines at most one of them."""
+    testcase: Optional[str] = None
+    test_execution: Optional[str] = None
+    test_plan: Optional[str] = None
+
+
+_TAG_PATTERN = re.compile(
+    r"""^(?:
+        jira\.test_execution\('(?P<test_execution>.+)'\)
+        | jira\.test_plan\('(?P<test_plan>.+)'\)
+        | (?:allure|jira)\.testcase\(['"](?P<testcase>.+)['"]\)
+        | (?:allure|jira)\.testcase(?P<outline_testcase>.+)  # outline scenario
+        | TEST_(?P<cucumber_testcase>.+)  # feature files exported from Jira Xray Cucumber tests
+    )$""",
+    flags=re.IGNORECASE | re.VERBOSE
+)
+_NO_KEYS = TagKeys()
+
+
+@lru_cache(maxsize=TAG_CACHE_SIZE)
+def classify_tag(tag: str) -> TagKeys:
+    """Return Jira Xray keys defined by the tag."""
+    match = _TAG_PATTERN.match(tag)
+    if not match:
+        return _NO_KEYS
+    return TagKeys(
+        testcase=match.group('testcase') or match.group('outline_testcase') or match.group('cucumber_testcase'),
+        test_execution=match.group('test_execution'),
+        test_plan=match.group('test_plan')
+    )
+
+
 def get_test_execution_key_from_tag(tag: str) -> Optional[str]:
     """Return Jira Xray test execution ID or None if not defined."""
-    match = re.match(r"^jira\.test_execution\('(.+)'\)$", tag, flags=re.IGNORECASE)
-    if match:
-        return match.group(1)
-    else:
-        return None
+    return classify_tag(tag).test_execution
 
 
 def get_test_plan_key_from_tag(tag: str) -> Optional[str]:
     """Return Jira Xray test plan ID or None if not defined."""
-    match = re.match(r"^jira\.test_plan\('(.+)'\)$", tag, flags=re.IGNORECASE)
-    if match:
-        return match.group(1)
-    else:
-        return None
+    return classify_tag(tag).test_plan
 
 
 def get_testcase_key_from_tag(tag: str) -> Optional[str]:
     """Return Jira Xray test ID or None if not defined."""
-    match = re.match(r"^(allure|jira)\.testcase\(['\"](.+)['\"]\)$", tag, flags=re.IGNORECASE)
-    if match:
-        return match.group(2)
-    # for outline scenario
-    match = re.match(r'^(allure|jira)\.testcase(.+)$', tag, flags=re.IGNORECASE)
-    if match:
-        return match.group(2)
-    # feature files exported from Jira Xray Cucumber tests
-    match = re.match(r'^TEST_(.+)$', tag, flags=re.IGNORECASE)
-    if match:
-        return match.group(1)
-    else:
-        return None
+    return classify_tag(tag).testcase
 
 
 def get_overall_status(statuses: List[Status]) -> Status:
@@ -46,12 +78,19 @@ def get_overall_status(statuses: List[Status]) -> Status:
     statuses_list = [s.value for s in statuses]
     if len(set(statuses_list)) == 1:
         return statuses[0]
-    if Status.failed in statuses:
-        return Status.failed
-    if Status.executing in statuses:
-        return Status.executing
-    if Status.undefined in statuses:
-        return Status.undefined  # Error
-    else:
-        statuses = [s for s in statuses if s != Status.untested]
-        return get_overall_status(statuses)
+    for status in DOMINANT_STATUSES:
+        if status in statuses:
+            return status
+    # only passed, skipped and untested results are left, untested ones are ignored
+    if Status.passed in statuses:
+        return Status.passed
+    return next(s for s in statuses if s != Status.untested)
+
+
+def str_to_bool(value: Union[str, bool, None]) -> bool:
+    """Return boolean value of a behave userdata option."""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
@@ -7,8 +7,28 @@ hookspec = pluggy.HookspecMarker('xray')
 @hookspec
 def scenario_xray_result(result, scenario):
     """
-    Update Xray result for the scenario.
+    Update Xray result for the scenario, called once when the scenario is done.
 
     :param result: Xray result
     :param scenario: behave scenario
     """
+
+
+@hookspec
+def feature_xray_results(results, feature):
+    """
+    Update Xray results of all scenarios in the feature, called once when the feature is done.
+
+    :param results: Xray results by Jira Xray test key
+    :param feature: behave feature
+    """
+
+
+@hookspec(firstresult=True)
+def xray_span_exporter(config):
+    """
+    Return exporter of tracing spans, the first exporter returned is used.
+
+    :param config: behave configuration
+    :return: instance of behave_xray.tracing.SpanExporter or None
+    """
@@ -0,0 +1,91 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator
+
+
+PROMETHEUS_PREFIX: str = 'behave_xray'
+PROMETHEUS_EXTENSIONS = ('.prom',)
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class Metrics:
+    """Counters and timings of a run, shared by the formatter, publisher and authentication.
+
+    Recording is thread-safe, uploads in background threads record into the
+    same instance.
+    """
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, float] = {}
+        self.timings: Dict[str, Timing] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings.setdefault(name, Timing()).add(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Record duration of the block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                counters=dict(sorted(self.counters.items())),
+                timings={
+                    name: dict(count=timing.count, total_seconds=timing.total, max_seconds=timing.max)
+                    for name, timing in sorted(self.timings.items())
+                }
+            )
+
+    def to_prometheus(self) -> str:
+        """Return metrics in Prometheus text exposition format."""
+        data = self.as_dict()
+        lines = []
+        for name, value in data['counters'].items():
+            metric = f'{PROMETHEUS_PREFIX}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        for name, timing in data['timings'].items():
+            metric = f'{PROMETHEUS_PREFIX}_{name}_seconds'
+            lines.append(f'# TYPE {metric} summary')
+            lines.append(f'{metric}_count {timing["count"]}')
+            lines.append(f'{metric}_sum {timing["total_seconds"]}')
+            lines.append(f'# TYPE {metric}_max gauge')
+            lines.append(f'{metric}_max {timing["max_seconds"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Write metrics to the file, in Prometheus format for ``.prom`` files, JSON otherwise."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith(PROMETHEUS_EXTENSIONS):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.as_dict(), f, indent=4)
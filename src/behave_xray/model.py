@@ -1,15 +1,27 @@
 import datetime as dt
-from typing import Any, AnyStr, Dict, List, Optional, Union
+import json
+import logging
+from typing import Any, AnyStr, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple, Union
+
+from behave_xray.evidence import FileEvidence
 
 
 DATETIME_FORMAT: str = '%Y-%m-%dT%H:%M:%S%z'
 DEFAULT_SUMMARY: str = 'Execution of automated tests'
 
+_logger = logging.getLogger(__name__)
+
 
 class TestCase:
-    """Class represents Test Case."""
+    """Class represents Test Case.
 
-    VALID_STATUSES = (
+    The serialized form is cached until an attribute is assigned, so replace
+    ``examples`` or ``evidences`` instead of changing them in place.
+    """
+
+    __slots__ = ('_test_key', '_status', '_comment', '_examples', '_evidences', 'duration', '_dict')
+
+    VALID_STATUSES: Tuple[str, ...] = (
         'TODO',
         'ABORTED',
         'PASS',
@@ -18,6 +30,12 @@ class TestCase:
         'PENDING',
         'BLOCKED'
     )
+    # statuses of the flavor for fast validation, computed for every subclass
+    _STATUS_SET: FrozenSet[str] = frozenset(VALID_STATUSES)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._STATUS_SET = frozenset(cls.VALID_STATUSES)
 
     def __init__(
         self,
@@ -34,45 +52,141 @@ class TestCase:
         :param examples: Outline tests results
         :param duration: Duration
         """
-        self.test_key = test_key
-        self.status = status
-        self.comment = comment
-        self.examples = examples or []
+        self._validate_status(status)
+        # slots are set directly, setters only invalidate the cached serialized form
+        self._test_key = test_key
+        self._status = status
+        self._comment = comment
+        self._examples = examples or []
+        self._evidences: List[Union[Dict[str, AnyStr], FileEvidence]] = []
         self.duration = duration
-        self.evidences: List[Dict[str, AnyStr]] = []
+        self._dict: Optional[Dict[str, Any]] = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}(test_key='{self.test_key}', status='{self.status}')"
 
     @property
-    def status(self):
+    def test_key(self) -> str:
+        return self._test_key
+
+    @test_key.setter
+    def test_key(self, value: str) -> None:
+        self._test_key = value
+        self._dict = None
+
+    @property
+    def status(self) -> str:
         return self._status
 
     @status.setter
-    def status(self, value: str):
+    def status(self, value: str) -> None:
         self._validate_status(value)
         self._status = value
+        self._dict = None
+
+    @property
+    def comment(self) -> str:
+        return self._comment
+
+    @comment.setter
+    def comment(self, value: str) -> None:
+        self._comment = value
+        self._dict = None
+
+    @property
+    def examples(self) -> List[str]:
+        return self._examples
+
+    @examples.setter
+    def examples(self, value: List[str]) -> None:
+        self._examples = value
+        self._dict = None
+
+    @property
+    def evidences(self) -> List[Union[Dict[str, AnyStr], FileEvidence]]:
+        return self._evidences
+
+    @evidences.setter
+    def evidences(self, value: List[Union[Dict[str, AnyStr], FileEvidence]]) -> None:
+        self._evidences = value
+        self._dict = None
 
     def _validate_status(self, status: str):
-        if status not in self.VALID_STATUSES:
+        if status not in self._STATUS_SET:
             raise ValueError(f'Status must be one of {", ".join(self.VALID_STATUSES)}, but was {status}')
 
+    def invalidate(self) -> None:
+        """Drop cached serialized form, needed after changing ``examples`` or ``evidences`` in place."""
+        self._dict = None
+
     def as_dict(self) -> Dict[str, Any]:
-        """Serialize Test Case."""
+        """Serialize Test Case, the returned dictionary must not be modified."""
+        if self._dict is not None:
+            return self._dict
         data: Dict[str, Any] = dict(
             testKey=self.test_key,
             status=self.status,
             comment=self.comment,
             examples=self.examples
         )
-        if self.evidences:
-            data['evidences'] = self.evidences
+        evidences = _get_existing_evidences(self.evidences)
+        if evidences:
+            data['evidences'] = [
+                evidence.as_dict() if isinstance(evidence, FileEvidence) else evidence
+                for evidence in evidences
+            ]
+            if any(isinstance(evidence, FileEvidence) for evidence in evidences):
+                # encoded files are not kept in memory
+                return data
+        self._dict = data
         return data
 
+    def estimate_size(self) -> int:
+        """Return approximate size of serialized Test Case in bytes, without encoding file evidences."""
+        size = len(json.dumps([self.test_key, self.status, self.comment, self.examples])) + 60
+        for evidence in _get_existing_evidences(self.evidences):
+            if isinstance(evidence, FileEvidence):
+                size += evidence.encoded_size + len(json.dumps([evidence.filename, evidence.content_type])) + 40
+            else:
+                size += len(json.dumps(evidence)) + 2
+        return size
+
+    def iter_json(self) -> Iterator[str]:
+        """Serialize Test Case to JSON fragments, one evidence at a time."""
+        yield (f'{{"testKey": {json.dumps(self.test_key)}, "status": {json.dumps(self.status)}, '
+               f'"comment": {json.dumps(self.comment)}, "examples": {json.dumps(self.examples)}')
+        evidences = _get_existing_evidences(self.evidences)
+        if evidences:
+            yield ', "evidences": ['
+            for index, evidence in enumerate(evidences):
+                if index:
+                    yield ', '
+                if isinstance(evidence, FileEvidence):
+                    yield from evidence.iter_json()
+                else:
+                    yield json.dumps(evidence)
+            yield ']'
+        yield '}'
+
+
+def _get_existing_evidences(
+    evidences: Sequence[Union[Dict[str, Any], FileEvidence]]
+) -> List[Union[Dict[str, Any], FileEvidence]]:
+    """Return evidences without file evidences whose file was removed since it was attached."""
+    existing = []
+    for evidence in evidences:
+        if isinstance(evidence, FileEvidence) and not evidence.exists():
+            _logger.warning('Evidence file %s does not exist, evidence skipped', evidence.path)
+            continue
+        existing.append(evidence)
+    return existing
+
 
 class TestCaseCloud(TestCase):
     """Class represents Test Case."""
 
+    __slots__ = ()
+
     VALID_STATUSES = (
         'TODO',
         'ABORTED',
@@ -87,6 +201,9 @@ class TestCaseCloud(TestCase):
 class TestExecution:
     """Class stores information about test execution and tests."""
 
+    __slots__ = ('test_execution_key', 'test_plan_key', 'user', 'revision', 'version', 'summary', 'description',
+                 'start_date', 'finish_date', 'tests')
+
     def __init__(
         self,
         test_execution_key: str = '',
@@ -116,6 +233,8 @@ class TestExecution:
         self.summary = summary or DEFAULT_SUMMARY
         self.description = description
         self.start_date = dt.datetime.now(tz=dt.timezone.utc)
+        # current time is used if not set
+        self.finish_date: Optional[dt.datetime] = None
         self.tests = tests or []
 
     def __repr__(self):
@@ -133,10 +252,29 @@ class TestExecution:
 
     def as_dict(self) -> Dict[str, Any]:
         """Serialize test execution."""
+        # serialized test cases are cached, the list only collects them
         tests: List[Dict[str, str]] = [test.as_dict() for test in self.tests]
+        data: Dict[str, Any] = dict(info=self._get_info(), tests=tests)
+        if self.test_execution_key:
+            data['testExecutionKey'] = self.test_execution_key
+        return data
+
+    def iter_json(self) -> Iterator[str]:
+        """Serialize test execution to JSON fragments without building the whole document."""
+        yield f'{{"info": {json.dumps(self._get_info())}, "tests": ['
+        for index, test in enumerate(self.tests):
+            if index:
+                yield ', '
+            yield from test.iter_json()
+        yield ']'
+        if self.test_execution_key:
+            yield f', "testExecutionKey": {json.dumps(self.test_execution_key)}'
+        yield '}'
+
+    def _get_info(self) -> Dict[str, str]:
         info: Dict[str, str] = dict(
             startDate=self.start_date.strftime(DATETIME_FORMAT),
-            finishDate=dt.datetime.now(tz=dt.timezone.utc).strftime(DATETIME_FORMAT),
+            finishDate=(self.finish_date or dt.datetime.now(tz=dt.timezone.utc)).strftime(DATETIME_FORMAT),
             summary=self.summary,
             description=self.description
         )
@@ -146,10 +284,6 @@ class TestExecution:
             info['version'] = self.version
         if self.revision:
             info['revision'] = self.revision
-
-        data: Dict[str, Any] = dict(info=info, tests=tests)
         if self.test_plan_key:
             info['testPlanKey'] = self.test_plan_key
-        if self.test_execution_key:
-            data['testExecutionKey'] = self.test_execution_key
-        return data
+        return info
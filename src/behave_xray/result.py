@@ -0,0 +1,223 @@
+import logging
+from array import array
+from collections.abc import MutableSequence
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from behave.model import Status
+
+from behave_xray.evidence import FileEvidence
+from behave_xray.exceptions import XrayError
+from behave_xray.helper import DOMINANT_STATUSES, get_overall_status
+from behave_xray.model import TestCase
+
+
+_logger = logging.getLogger(__name__)
+
+
+class ScenarioResult:
+    """Class stores scenario result.
+
+    Statuses are stored one byte per step or example, the overall status is
+    kept up to date from counts of statuses, so huge outlines stay cheap.
+    """
+
+    # __dict__ keeps custom attributes set by hooks working, it is allocated only when one is set
+    __slots__ = ('testcase_key', 'comment', 'is_outline', 'evidences', 'duration', '_statuses', '_counts',
+                 '_first_tested', '__dict__')
+
+    def __init__(
+        self,
+        testcase_key: Optional[str] = None,
+        statuses: Iterable[Status] = (),
+        comment: str = '',
+        is_outline: bool = False,
+        evidences: Optional[List[Union[Dict[str, Any], FileEvidence]]] = None,
+        duration: float = 0.0
+    ) -> None:
+        self.testcase_key = testcase_key
+        self.comment = comment
+        self.is_outline = is_outline
+        self.evidences: List[Union[Dict[str, Any], FileEvidence]] = evidences if evidences is not None else []
+        self.duration = duration
+        self._set_statuses(statuses)
+
+    def _set_statuses(self, statuses: Iterable[Status]) -> None:
+        self._statuses = array('B')
+        self._counts: Dict[int, int] = {}
+        self._first_tested: Optional[int] = None
+        for status in statuses:
+            self.append_status(status)
+
+    @property
+    def statuses(self) -> 'StatusList':
+        """Statuses in order of execution, changes of the returned list update the result."""
+        return StatusList(self)
+
+    @statuses.setter
+    def statuses(self, statuses: Iterable[Status]) -> None:
+        self._set_statuses(statuses)
+
+    @property
+    def status_values(self) -> array:
+        """Values of statuses in order of execution."""
+        return self._statuses
+
+    @property
+    def status_counts(self) -> Dict[int, int]:
+        """Number of statuses by status value."""
+        return self._counts
+
+    @property
+    def first_status(self) -> Status:
+        return Status(self._statuses[0]) if self._statuses else Status.untested
+
+    @property
+    def overall_status(self) -> Status:
+        """Return overall status, same as :func:`get_overall_status` of all statuses."""
+        counts = self._counts
+        if not counts:
+            return Status.untested
+        if len(counts) == 1:
+            return Status(self._statuses[0])
+        for status in DOMINANT_STATUSES:
+            if status.value in counts:
+                return status
+        if Status.passed.value in counts:
+            return Status.passed
+        # untested statuses are ignored when some are tested
+        return Status(self._first_tested)
+
+    def append_status(self, status: Status) -> None:
+        value = status.value
+        self._statuses.append(value)
+        self._counts[value] = self._counts.get(value, 0) + 1
+        if self._first_tested is None and status != Status.untested:
+            self._first_tested = value
+
+    def merge(self, other: 'ScenarioResult') -> None:
+        """Merge result of the same test case executed in another feature."""
+        if self.is_outline or other.is_outline:
+            # a plain scenario contributes a single example to an outline
+            if not self.is_outline:
+                self._set_statuses(self.statuses[:1])
+            if other.is_outline:
+                for value in other.status_values:
+                    self.append_status(Status(value))
+            elif other.status_values:
+                self.append_status(other.first_status)
+            self.is_outline = True
+        else:
+            self._set_statuses([get_overall_status(self.statuses[:1] + other.statuses[:1])])
+            self.comment = '\n'.join(comment for comment in (self.comment, other.comment) if comment)
+        self.evidences.extend(other.evidences)
+        self.duration += other.duration
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ScenarioResult):
+            return NotImplemented
+        return (self.testcase_key, self._statuses, self.comment, self.is_outline, self.evidences, self.duration) == \
+            (other.testcase_key, other._statuses, other.comment, other.is_outline, other.evidences, other.duration)
+
+    def __repr__(self) -> str:
+        return (f'ScenarioResult(testcase_key={self.testcase_key!r}, statuses={self.statuses!r}, '
+                f'comment={self.comment!r}, is_outline={self.is_outline!r}, duration={self.duration!r})')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize result, file evidences are stored as references to the files."""
+        return dict(
+            statuses=[status.name for status in self.statuses],
+            comment=self.comment,
+            isOutline=self.is_outline,
+            evidences=[
+                dict(path=item.path, filename=item.filename, contentType=item.content_type)
+                if isinstance(item, FileEvidence) else item
+                for item in self.evidences
+            ],
+            duration=self.duration
+        )
+
+    @classmethod
+    def from_dict(cls, test_key: str, data: Dict[str, Any]) -> 'ScenarioResult':
+        return cls(
+            testcase_key=test_key,
+            statuses=[Status[name] for name in data.get('statuses', [])],
+            comment=data.get('comment', ''),
+            is_outline=data.get('isOutline', False),
+            evidences=_load_evidences(data.get('evidences', [])),
+            duration=data.get('duration', 0.0)
+        )
+
+
+class StatusList(MutableSequence):
+    """Mutable view of statuses of a scenario result."""
+
+    __slots__ = ('_result',)
+
+    def __init__(self, result: ScenarioResult) -> None:
+        self._result = result
+
+    def __getitem__(self, index: Any) -> Any:
+        values = self._result.status_values
+        if isinstance(index, slice):
+            return [Status(value) for value in values[index]]
+        return Status(values[index])
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        statuses = list(self)
+        statuses[index] = value
+        self._result.statuses = statuses
+
+    def __delitem__(self, index: Any) -> None:
+        statuses = list(self)
+        del statuses[index]
+        self._result.statuses = statuses
+
+    def __len__(self) -> int:
+        return len(self._result.status_values)
+
+    def insert(self, index: int, value: Status) -> None:
+        statuses = list(self)
+        statuses.insert(index, value)
+        self._result.statuses = statuses
+
+    def append(self, value: Status) -> None:
+        self._result.append_status(value)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, StatusList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _load_evidences(evidences: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], FileEvidence]]:
+    loaded: List[Union[Dict[str, Any], FileEvidence]] = []
+    for item in evidences:
+        if 'path' in item:
+            try:
+                loaded.append(FileEvidence(item['path'], item['contentType'], item['filename']))
+            except XrayError:
+                _logger.warning('Evidence file %s does not exist, evidence skipped', item['path'])
+        else:
+            loaded.append(item)
+    return loaded
+
+
+def fill_test_case(testcase: TestCase, result: ScenarioResult, get_xray_status: Callable[[str], str]) -> None:
+    """Set status, examples and comment of Xray test case from scenario result.
+
+    :param testcase: Xray test case
+    :param result: scenario result
+    :param get_xray_status: maps behave status name to Xray status
+    """
+    if result.is_outline:
+        testcase.status = get_xray_status(result.overall_status.name)
+        # map every distinct status once
+        xray_statuses = {value: get_xray_status(Status(value).name) for value in result.status_counts}
+        testcase.examples = [xray_statuses[value] for value in result.status_values]
+    else:
+        testcase.status = get_xray_status(result.first_status.name)
+        testcase.comment = result.comment
+    testcase.duration = result.duration
@@ -0,0 +1,129 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+
+# the server is overloaded or down, the request may succeed later
+RETRYABLE_STATUS_CODES = frozenset((429, 502, 503, 504))
+# the server rejected the request without processing it, so repeating it cannot create duplicates
+UNPROCESSED_STATUS_CODES = frozenset((429, 503))
+
+DEFAULT_MAX_ATTEMPTS: int = 3
+DEFAULT_BACKOFF_FACTOR: float = 1.0
+DEFAULT_MAX_BACKOFF: float = 30.0
+DEFAULT_MAX_RETRY_AFTER: float = 300.0
+DEFAULT_FAILURE_THRESHOLD: int = 5
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetryPolicy:
+    """Decides if and when a failed upload is repeated.
+
+    Imports which create a new test execution are not idempotent, they are
+    repeated only if the server certainly did not process the request.
+    Delay requested by the server with Retry-After is honoured up to
+    ``max_retry_after``, a longer one stops retrying.
+    """
+
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR
+    max_backoff: float = DEFAULT_MAX_BACKOFF
+    max_retry_after: float = DEFAULT_MAX_RETRY_AFTER
+
+    def should_retry_status(self, status_code: int, idempotent: bool) -> bool:
+        if idempotent:
+            return status_code in RETRYABLE_STATUS_CODES
+        return status_code in UNPROCESSED_STATUS_CODES
+
+    def should_retry_error(self, error: requests.exceptions.RequestException, idempotent: bool) -> bool:
+        return idempotent or _is_connect_error(error)
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """Return seconds to wait before the next attempt, None if the request must not be repeated.
+
+        :param attempt: number of the failed attempt, starting from 1
+        :param retry_after: value of Retry-After response header
+        """
+        delay = _parse_retry_after(retry_after) if retry_after else None
+        if delay is None:
+            # exponential backoff with full jitter
+            return min(random.uniform(0, self.backoff_factor * 2 ** (attempt - 1)), self.max_backoff)
+        if delay > self.max_retry_after:
+            _logger.warning('Server asked to retry after %.1f seconds, longer than %.1f seconds allowed, '
+                            'not retrying', delay, self.max_retry_after)
+            return None
+        if delay > self.max_backoff:
+            _logger.info('Server asked to retry after %.1f seconds, waiting longer than maximum backoff '
+                         '%.1f seconds', delay, self.max_backoff)
+        return delay
+
+
+class CircuitBreaker:
+    """Stops sending requests after a number of consecutive failures.
+
+    Once open, the breaker stays open for the rest of the run unless
+    ``reset_timeout`` is given, then one request is let through after it.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: Optional[float] = None) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.reset_timeout is not None and time.monotonic() - self._opened_at >= self.reset_timeout:
+                # half-open: let one request through, the next failure opens the breaker again
+                self._opened_at = None
+                self.failures = self.failure_threshold - 1
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failure_threshold > 0 and self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _is_connect_error(error: requests.exceptions.RequestException) -> bool:
+    """Return True if the connection could not be established, so nothing was sent."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,112 @@
+"""Parallel run of behave features, used by `behave-xray run`.
+
+Every feature file runs in a fresh worker process with the Xray formatter in
+collect-only mode. Workers send collected results back to the parent process,
+which merges them into one test execution.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from behave_xray.shard import MergedShards, merge_shard_data
+
+
+DEFAULT_DURATIONS_FILE: str = '.behave-xray-durations.json'
+FORMATTER: str = 'behave_xray:XrayFormatter'
+CLOUD_FORMATTER: str = 'behave_xray:XrayCloudFormatter'
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FeatureResult:
+    path: str
+    exit_code: int
+    duration: float
+    shards: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def find_features(paths: Iterable[str]) -> List[str]:
+    """Return feature files, directories are searched recursively."""
+    features: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                features.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.feature'))
+        else:
+            features.append(path)
+    return features
+
+
+def load_durations(path: str) -> Dict[str, float]:
+    """Return durations of features in seconds recorded by previous runs."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            durations = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        _logger.warning('Ignoring unreadable durations file %s', path)
+        return {}
+    return durations if isinstance(durations, dict) else {}
+
+
+def save_durations(path: str, results: Iterable[FeatureResult]) -> None:
+    durations = load_durations(path)
+    durations.update((result.path, round(result.duration, 3)) for result in results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+
+
+def sort_by_duration(features: Sequence[str], durations: Dict[str, float]) -> List[str]:
+    """Return features longest first, so the pool finishes at about the same time.
+
+    Features without a recorded duration are started first.
+    """
+    return sorted(features, key=lambda path: durations.get(path, float('inf')), reverse=True)
+
+
+def run_feature(task: Tuple[str, List[str]]) -> FeatureResult:
+    """Run one feature with behave in the current process and return collected results."""
+    from behave.__main__ import main as behave_main
+
+    from behave_xray.shard import pop_collected_shards
+
+    path, behave_args = task
+    start = time.monotonic()
+    try:
+        exit_code = behave_main([path, '-D', 'xray.collect_only=true'] + behave_args)
+    except SystemExit as exc:
+        exit_code = exc.code if isinstance(exc.code, int) else 1
+    except Exception:
+        _logger.exception('behave failed to run %s', path)
+        exit_code = 1
+    return FeatureResult(path, exit_code, time.monotonic() - start, pop_collected_shards())
+
+
+def iter_results(
+    features: Sequence[str],
+    workers: int,
+    behave_args: Optional[List[str]] = None,
+    cloud: bool = False
+) -> Iterator[FeatureResult]:
+    """Run features in a process pool and yield their results as they finish.
+
+    Each worker process runs one feature only, because behave keeps step
+    definitions in global state.
+    """
+    args = ['-f', CLOUD_FORMATTER if cloud else FORMATTER, '--no-summary'] + list(behave_args or [])
+    with multiprocessing.Pool(processes=workers, maxtasksperchild=1) as pool:
+        yield from pool.imap_unordered(run_feature, [(path, args) for path in features], chunksize=1)
+
+
+def merge_results(results: Iterable[FeatureResult]) -> MergedShards:
+    """Merge results of features in order of their paths."""
+    return merge_shard_data(
+        shard for result in sorted(results, key=lambda result: result.path) for shard in result.shards
+    )
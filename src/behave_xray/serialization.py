@@ -0,0 +1,97 @@
+"""JSON encoding of Xray payloads.
+
+The fastest installed backend is selected at import time: orjson, ujson or
+the standard library json module. Set environment variable
+``BEHAVE_XRAY_JSON_BACKEND`` to one of them to force a backend.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from behave_xray.exceptions import XrayError
+
+
+BACKENDS: List[str] = ['orjson', 'ujson', 'json']
+# orjson supports only this indent, other backends use it too, so the output does not depend on the backend
+INDENT: int = 2
+
+_logger = logging.getLogger(__name__)
+
+
+def _select_backend(name: Optional[str] = None) -> str:
+    if name:
+        if name not in BACKENDS:
+            raise XrayError(f'Unknown JSON backend {name}, use one of {", ".join(BACKENDS)}')
+        candidates = [name]
+    else:
+        candidates = BACKENDS
+    for candidate in candidates:
+        try:
+            __import__(candidate)
+        except ImportError:
+            _logger.debug('JSON backend %s is not installed', candidate)
+            continue
+        return candidate
+    raise XrayError(f'JSON backend {name} is not installed')
+
+
+BACKEND: str = _select_backend(os.environ.get('BEHAVE_XRAY_JSON_BACKEND'))
+
+if BACKEND == 'orjson':
+    import orjson
+
+    def dumps(data: Any, pretty: bool = False) -> bytes:
+        """Return data encoded as UTF-8 JSON, compact unless pretty is requested."""
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Return data decoded from JSON."""
+        return orjson.loads(data)
+elif BACKEND == 'ujson':
+    import ujson
+
+    def dumps(data: Any, pretty: bool = False) -> bytes:
+        """Return data encoded as UTF-8 JSON, compact unless pretty is requested."""
+        return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False,
+                           indent=INDENT if pretty else 0).encode('utf-8')
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Return data decoded from JSON."""
+        return ujson.loads(data)
+else:
+    def dumps(data: Any, pretty: bool = False) -> bytes:
+        """Return data encoded as UTF-8 JSON, compact unless pretty is requested."""
+        if pretty:
+            return json.dumps(data, ensure_ascii=False, indent=INDENT).encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Return data decoded from JSON."""
+        return json.loads(data)
+
+
+@dataclass
+class SerializedTestExecution:
+    """Test execution serialized once, the body is reused for upload, spool and report file.
+
+    Only the body is kept while the upload waits, the data is decoded again
+    from it when needed, e.g. to split the test execution into parts.
+    """
+
+    body: bytes
+    test_execution_key: str = ''
+    test_count: int = 0
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return loads(self.body)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SerializedTestExecution':
+        return cls(
+            body=dumps(data),
+            test_execution_key=data.get('testExecutionKey', ''),
+            test_count=len(data.get('tests', []))
+        )
@@ -0,0 +1,155 @@
+import os
+import ssl
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, select_proxy
+
+from behave_xray.exceptions import XrayError
+
+
+DEFAULT_POOL_SIZE: int = 10
+# seconds to wait for a connection or a response
+DEFAULT_TIMEOUT: float = 60.0
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keep_alive: bool = True,
+    http2: bool = False
+) -> requests.Session:
+    """Return HTTP session with a pool of persistent connections.
+
+    :param pool_size: maximum number of connections kept open per host
+    :param keep_alive: reuse connections between requests
+    :param http2: use HTTP/2, requires optional `httpx` package
+    """
+    session = requests.Session()
+    adapter: BaseAdapter
+    if http2:
+        adapter = Http2Adapter(pool_size=pool_size)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+class Http2Adapter(BaseAdapter):
+    """Transport adapter sending requests over HTTP/2 with httpx.
+
+    httpx configures TLS and proxies per client, so a client is created for every
+    combination of ``verify``, ``cert`` and proxy the requests are sent with.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        super().__init__()
+        try:
+            import httpx
+        except ImportError as exc:
+            raise XrayError('HTTP/2 support requires httpx, install behave-xray[http2]') from exc
+        self._httpx = httpx
+        self.pool_size = pool_size
+        self.clients: Dict[Tuple[Any, Any, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Any = None
+    ) -> requests.Response:
+        url = request.url or ''
+        client = self._get_client(verify, cert, select_proxy(url, proxies or {}))
+        try:
+            response = client.request(
+                method=request.method or 'GET',
+                url=url,
+                headers=dict(request.headers),
+                content=request.body,
+                timeout=self._get_timeout(timeout)
+            )
+        except self._httpx.ConnectTimeout as exc:
+            raise requests.exceptions.ConnectTimeout(exc, request=request) from exc
+        except self._httpx.TimeoutException as exc:
+            raise requests.exceptions.ReadTimeout(exc, request=request) from exc
+        except self._httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc, request=request) from exc
+        # the body is always read, a streamed response is served from memory
+        return self._build_response(request, response)
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+    @property
+    def client(self) -> Any:
+        """Client for requests with default TLS settings and without a proxy."""
+        return self._get_client(True, None, None)
+
+    def _get_client(self, verify: Any, cert: Any, proxy: Optional[str]) -> Any:
+        key = (verify, tuple(cert) if isinstance(cert, list) else cert, proxy)
+        with self._lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = self.clients[key] = self._httpx.Client(
+                    http2=True,
+                    verify=_get_ssl_context(verify, cert),
+                    proxy=proxy,
+                    # requests already applied environment settings to verify and proxies
+                    trust_env=False,
+                    limits=self._httpx.Limits(max_connections=self.pool_size,
+                                              max_keepalive_connections=self.pool_size)
+                )
+            return client
+
+    def _get_timeout(self, timeout: Any) -> Optional[Any]:
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self._httpx.Timeout(read, connect=connect)
+        return self._httpx.Timeout(timeout)
+
+    @staticmethod
+    def _build_response(request: requests.PreparedRequest, response: Any) -> requests.Response:
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.headers = CaseInsensitiveDict(response.headers)
+        result.reason = response.reason_phrase
+        result.url = str(response.url)
+        result.encoding = response.encoding
+        result.request = request
+        result._content = response.content
+        # the content is already read, so iter_content() serves it without the raw stream
+        result._content_consumed = True
+        return result
+
+
+def _get_ssl_context(verify: Any, cert: Any) -> Union[bool, ssl.SSLContext]:
+    """Return TLS configuration of httpx for ``verify`` and ``cert`` arguments of requests."""
+    if verify is True and not cert:
+        return True
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str) and os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    elif isinstance(verify, str):
+        context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+    if isinstance(cert, (tuple, list)):
+        context.load_cert_chain(cert[0], cert[1])
+    elif cert:
+        context.load_cert_chain(cert)
+    return context
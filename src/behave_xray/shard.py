@@ -0,0 +1,192 @@
+"""Partial results of behave runs split across several machines.
+
+Each run writes a shard with results of its scenarios instead of publishing
+them. Shards are merged with the same rules as results of several features
+in a single run, and published as one test execution.
+"""
+import contextlib
+import datetime as dt
+import json
+import logging
+import os
+import socket
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from behave_xray.exceptions import XrayError
+from behave_xray.model import DATETIME_FORMAT, TestCase, TestCaseCloud, TestExecution
+from behave_xray.result import ScenarioResult, fill_test_case
+
+
+SHARD_VERSION: int = 1
+
+_logger = logging.getLogger(__name__)
+
+# execution fields where the first non-empty value is used
+_KEY_FIELDS = ('testExecutionKey', 'testPlanKey', 'summary', 'user', 'version', 'revision')
+
+_collected_shards: List[Dict[str, Any]] = []
+
+
+@dataclass
+class MergedShards:
+    """Results merged from shards."""
+
+    info: Dict[str, str] = field(default_factory=dict)
+    results: Dict[str, ScenarioResult] = field(default_factory=dict)
+    cloud: bool = False
+
+
+def build_shard(
+    test_execution: TestExecution,
+    results: Dict[str, ScenarioResult],
+    cloud: bool = False
+) -> Dict[str, Any]:
+    """Return shard with results and test execution information."""
+    info = dict(
+        testExecutionKey=test_execution.test_execution_key,
+        testPlanKey=test_execution.test_plan_key,
+        summary=test_execution.summary,
+        user=test_execution.user,
+        version=test_execution.version,
+        revision=test_execution.revision,
+        description=test_execution.description,
+        startDate=test_execution.start_date.strftime(DATETIME_FORMAT),
+        finishDate=dt.datetime.now(tz=dt.timezone.utc).strftime(DATETIME_FORMAT)
+    )
+    return dict(
+        version=SHARD_VERSION,
+        cloud=cloud,
+        info=info,
+        results={test_key: result.to_dict() for test_key, result in results.items()}
+    )
+
+
+def write_shard(
+    directory: str,
+    test_execution: TestExecution,
+    results: Dict[str, ScenarioResult],
+    cloud: bool = False
+) -> str:
+    """Write results to a new shard file in the directory and return its path."""
+    os.makedirs(directory, exist_ok=True)
+    shard = build_shard(test_execution, results, cloud)
+    path = os.path.join(directory, f'shard-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(shard, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def collect_shard(shard: Dict[str, Any]) -> None:
+    """Keep shard in memory of the current process, used by `behave-xray run` workers."""
+    _collected_shards.append(shard)
+
+
+def pop_collected_shards() -> List[Dict[str, Any]]:
+    """Return and forget shards collected in the current process."""
+    shards = list(_collected_shards)
+    _collected_shards.clear()
+    return shards
+
+
+def find_shards(paths: Iterable[str]) -> List[str]:
+    """Return shard files, directories are searched for JSON files."""
+    shards: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            shards.extend(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith('.json') and not name.startswith('.')
+            )
+        else:
+            shards.append(path)
+    return sorted(shards)
+
+
+def load_shard(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_shards(paths: Iterable[str]) -> MergedShards:
+    """Merge results of all shard files, shards are merged in order of their paths."""
+    return merge_shard_data(load_shard(path) for path in find_shards(paths))
+
+
+def merge_shard_data(shards: Iterable[Dict[str, Any]]) -> MergedShards:
+    """Merge results of shards in the given order."""
+    merged = MergedShards()
+    descriptions: Dict[str, None] = {}
+    cloud_flags = set()
+    for shard in shards:
+        if shard.get('version') != SHARD_VERSION:
+            raise XrayError(f'Unsupported shard version: {shard.get("version")}')
+        cloud_flags.add(bool(shard.get('cloud')))
+        info = shard.get('info', {})
+        _merge_info(merged.info, info)
+        for line in info.get('description', '').splitlines():
+            descriptions.setdefault(line)
+        for test_key, data in shard.get('results', {}).items():
+            result = ScenarioResult.from_dict(test_key, data)
+            if test_key in merged.results:
+                merged.results[test_key].merge(result)
+            else:
+                merged.results[test_key] = result
+    if len(cloud_flags) > 1:
+        raise XrayError('Cannot merge shards of Jira Xray Server and Xray Cloud formatters')
+    merged.cloud = cloud_flags.pop() if cloud_flags else False
+    merged.info['description'] = '\n'.join(descriptions)
+    return merged
+
+
+def _merge_info(merged: Dict[str, str], info: Dict[str, str]) -> None:
+    for name in _KEY_FIELDS:
+        value = info.get(name, '')
+        if not value:
+            continue
+        if not merged.get(name):
+            merged[name] = value
+        elif merged[name] != value and name in ('testExecutionKey', 'testPlanKey'):
+            _logger.warning('%s %s ignored, results are published to %s', name, value, merged[name])
+    # dates have fixed format, so they can be compared as text
+    if info.get('startDate') and (not merged.get('startDate') or info['startDate'] < merged['startDate']):
+        merged['startDate'] = info['startDate']
+    if info.get('finishDate') and info['finishDate'] > merged.get('finishDate', ''):
+        merged['finishDate'] = info['finishDate']
+
+
+def to_test_execution(merged: MergedShards) -> TestExecution:
+    """Return test execution with merged results."""
+    from behave_xray.formatter import XrayCloudFormatter, XrayFormatter
+
+    status_maps = XrayCloudFormatter.STATUS_MAPS if merged.cloud else XrayFormatter.STATUS_MAPS
+    test_case_class = TestCaseCloud if merged.cloud else TestCase
+    info = merged.info
+    test_execution = TestExecution(
+        test_execution_key=info.get('testExecutionKey', ''),
+        test_plan_key=info.get('testPlanKey', ''),
+        user=info.get('user', ''),
+        revision=info.get('revision', ''),
+        version=info.get('version', ''),
+        summary=info.get('summary', ''),
+        description=info.get('description', '')
+    )
+    if info.get('startDate'):
+        test_execution.start_date = dt.datetime.strptime(info['startDate'], DATETIME_FORMAT)
+    if info.get('finishDate'):
+        test_execution.finish_date = dt.datetime.strptime(info['finishDate'], DATETIME_FORMAT)
+    for test_key, result in merged.results.items():
+        testcase = test_case_class(test_key=test_key)
+        fill_test_case(testcase, result, lambda name: status_maps.get(name, 'TODO'))
+        testcase.evidences = result.evidences
+        test_execution.append(testcase)
+    return test_execution
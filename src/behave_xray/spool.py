@@ -0,0 +1,70 @@
+import contextlib
+import os
+import tempfile
+import time
+import uuid
+from typing import List, Union
+
+from behave_xray.model import TestExecution
+from behave_xray.serialization import SerializedTestExecution, dumps
+
+
+class Spool:
+    """Directory journaling test executions until they are uploaded.
+
+    Every payload is written to ``pending`` before upload and moved to ``done``
+    when the upload succeeds, so results survive Jira outages and can be
+    uploaded later with ``behave-xray upload --spool``.
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike]) -> None:
+        self.directory = os.path.abspath(os.fspath(directory))
+        self.pending_dir = os.path.join(self.directory, 'pending')
+        self.done_dir = os.path.join(self.directory, 'done')
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+
+    def write(self, test_execution: Union[dict, SerializedTestExecution, TestExecution]) -> str:
+        """Atomically store test execution in pending directory and return its path."""
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex}.json'
+        path = os.path.join(self.pending_dir, name)
+        self._write(path, test_execution)
+        return path
+
+    def rewrite(self, path: str, test_execution: Union[dict, SerializedTestExecution, TestExecution]) -> None:
+        """Atomically replace pending test execution, e.g. with the key of the test execution created for it."""
+        self._write(path, test_execution)
+
+    def _write(self, path: str, test_execution: Union[dict, SerializedTestExecution, TestExecution]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.pending_dir, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if isinstance(test_execution, SerializedTestExecution):
+                    f.write(test_execution.body)
+                elif isinstance(test_execution, dict):
+                    f.write(dumps(test_execution))
+                else:
+                    for fragment in test_execution.iter_json():
+                        f.write(fragment.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    def mark_done(self, path: str) -> None:
+        """Move uploaded test execution to done directory."""
+        os.replace(path, os.path.join(self.done_dir, os.path.basename(path)))
+
+    def is_pending(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) == self.pending_dir
+
+    def pending(self) -> List[str]:
+        """Return paths of test executions waiting for upload, oldest first."""
+        return sorted(
+            os.path.join(self.pending_dir, name)
+            for name in os.listdir(self.pending_dir)
+            if name.endswith('.json') and not name.startswith('.')
+        )
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Set, Union
+
+from behave_xray.evidence import FileEvidence
+from behave_xray.model import TestCase, _get_existing_evidences
+from behave_xray.serialization import dumps
+
+
+DEFAULT_TIMEOUT: float = 30.0
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS uploaded_tests (
+    test_execution_key TEXT NOT NULL,
+    test_key TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (test_execution_key, test_key)
+)
+'''
+
+
+def get_digest(test: Union[Dict[str, Any], TestCase]) -> str:
+    """Return digest of a test result, the same for a test case and its serialized form.
+
+    Evidence content is hashed chunk by chunk, file evidences are never encoded as a whole.
+    """
+    if isinstance(test, TestCase):
+        fields = dict(testKey=test.test_key, status=test.status, comment=test.comment, examples=test.examples)
+        evidences: Iterable[Any] = _get_existing_evidences(test.evidences)
+    else:
+        fields = {key: value for key, value in test.items() if key != 'evidences'}
+        evidences = test.get('evidences', [])
+    digest = hashlib.sha256(dumps(fields))
+    for evidence in evidences:
+        digest.update(b'\0' + dumps([evidence['filename'], evidence['contentType']]))
+        chunks = evidence.iter_base64() if isinstance(evidence, FileEvidence) else [evidence['data']]
+        for chunk in chunks:
+            digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class StateIndex:
+    """Digests of test results already uploaded to test executions, stored in SQLite.
+
+    Reruns import into an existing test execution only results which changed
+    since the last successful upload. The database can be shared by processes.
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT) -> None:
+        """
+        :param path: database file, created if it does not exist
+        :param timeout: seconds to wait while another process writes to the database
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # the publisher uploads from background threads, access is serialized by the lock
+        self._connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def changed(self, test_execution_key: str, digests: Dict[str, str]) -> Set[str]:
+        """Return keys of tests whose digest differs from the last upload to the test execution."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT test_key, digest FROM uploaded_tests WHERE test_execution_key = ?',
+                (test_execution_key,)
+            ).fetchall()
+        uploaded = dict(rows)
+        return {test_key for test_key, digest in digests.items() if uploaded.get(test_key) != digest}
+
+    def record(self, test_execution_key: str, digests: Dict[str, str]) -> None:
+        """Store digests of tests uploaded to the test execution."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO uploaded_tests (test_execution_key, test_key, digest) VALUES (?, ?, ?)',
+                [(test_execution_key, test_key, digest) for test_key, digest in digests.items()]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,101 @@
+import base64
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+_logger = logging.getLogger(__name__)
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """Return expiry time (UNIX timestamp) of JWT token or None if it cannot be read."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+
+def get_cache_key(base_url: str, client_id: str) -> str:
+    """Return cache key of the token for the client on the server."""
+    return hashlib.sha256(f'{base_url}\n{client_id}'.encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    """Authentication tokens stored in a file shared by processes on the same host.
+
+    The file is readable only by its owner. Use :meth:`lock` around reading the
+    cache and authenticating, so only one process requests a new token.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(os.path.expanduser(path))
+
+    @property
+    def lock_path(self) -> str:
+        return self.path + '.lock'
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        """Exclusive lock of the cache across processes."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return token and its expiry time or None if the token is not cached."""
+        entry = self._read().get(key)
+        if not entry:
+            return None
+        try:
+            return entry['token'], float(entry['expires_at'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        """Store token, drop tokens which already expired."""
+        now = time.time()
+        entries = {k: v for k, v in self._read().items() if float(v.get('expires_at', 0)) > now}
+        entries[key] = {'token': token, 'expires_at': expires_at}
+        self._write(entries)
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            _logger.warning('Ignoring unreadable token cache %s', self.path)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, entries: Dict[str, Dict]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.xray-token-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
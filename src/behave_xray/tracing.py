@@ -0,0 +1,181 @@
+"""Tracing spans of a behave run.
+
+Spans follow the OpenTelemetry data model: all spans of a run share one trace ID,
+a span started while another one is open in the same thread becomes its child.
+Finished spans are handed over to an exporter, the built-in one writes them as
+JSON lines to a local file, so no collector is needed.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+STATUS_UNSET: str = 'UNSET'
+STATUS_OK: str = 'OK'
+STATUS_ERROR: str = 'ERROR'
+
+
+@dataclass(eq=False)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    start_time: int = 0  # nanoseconds since epoch
+    end_time: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = STATUS_UNSET
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return (self.end_time - self.start_time) / 1e9
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            name=self.name,
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_span_id=self.parent_span_id,
+            start_time_unix_nano=self.start_time,
+            end_time_unix_nano=self.end_time,
+            attributes=self.attributes,
+            status=self.status
+        )
+
+
+class _NoopSpan(Span):
+    """Span returned by disabled tracer, it is shared so it ignores all changes."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    @property
+    def status(self) -> str:
+        return STATUS_UNSET
+
+    @status.setter
+    def status(self, value: str) -> None:
+        pass
+
+
+NOOP_SPAN: Span = _NoopSpan(name='', trace_id='', span_id='')
+
+
+class SpanExporter:
+    """Receives finished spans, subclass it to send spans to a collector."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        """Flush and release resources, called when the run is done."""
+
+
+class JsonLinesExporter(SpanExporter):
+    """Append spans to a file, one JSON document per line."""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.as_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Create spans of one trace, disabled when there is no exporter."""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None) -> None:
+        self.exporter = exporter
+        self.trace_id = secrets.token_hex(16)
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @property
+    def _stack(self) -> List[Span]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def start_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time: Optional[int] = None
+    ) -> Span:
+        """Start a span, it is a parent of spans started in this thread until it ends.
+
+        :param name: span name
+        :param attributes: initial attributes
+        :param start_time: nanoseconds since epoch, now by default
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        stack = self._stack
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=secrets.token_hex(8),
+            parent_span_id=stack[-1].span_id if stack else None,
+            start_time=time.time_ns() if start_time is None else start_time,
+            attributes=dict(attributes or {})
+        )
+        stack.append(span)
+        return span
+
+    def end_span(self, span: Span, status: Optional[str] = None) -> None:
+        if span is NOOP_SPAN or self.exporter is None:
+            return
+        span.end_time = time.time_ns()
+        if status is not None:
+            span.status = status
+        stack = self._stack
+        if span in stack:
+            # children left open are ended with the parent
+            while stack:
+                child = stack.pop()
+                if child is span:
+                    break
+                child.end_time = span.end_time
+                self.exporter.export(child)
+        self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        """Span of the block, its status is set to error when the block raises."""
+        span = self.start_span(name, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_attribute('error.type', type(e).__name__)
+            self.end_span(span, STATUS_ERROR)
+            raise
+        self.end_span(span)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
@@ -0,0 +1,95 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from behave_xray.xray_publisher import XrayPublisher
+
+
+DEFAULT_QUEUE_SIZE: int = 16
+DEFAULT_CLOSE_TIMEOUT: float = 300.0
+
+_logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class UploadResult:
+    """Outcome of a single background upload."""
+
+    name: str
+    success: bool
+    duration: float = 0.0
+
+
+class UploadWorker(threading.Thread):
+    """Publishes test executions to Jira Xray in a background thread.
+
+    Executions are handed over through a bounded queue, so a slow Jira
+    applies back pressure to the producer instead of piling up in memory.
+    """
+
+    def __init__(self, publisher: XrayPublisher, max_queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        super().__init__(name='xray-upload-worker', daemon=True)
+        self.publisher = publisher
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.results: List[UploadResult] = []
+        self._submitted: List[str] = []
+
+    def submit(self, test_execution: Any, name: str = '') -> None:
+        """Schedule test execution for upload, block while the queue is full.
+
+        The test execution is stored in the spool of the publisher first,
+        so queued results survive when the process ends before they are uploaded.
+        """
+        name = name or f'upload-{len(self._submitted) + 1}'
+        test_execution = self.publisher.with_reused_test_execution(test_execution)
+        spool_path = self.publisher.journal(test_execution)
+        self._submitted.append(name)
+        self.queue.put((name, test_execution, spool_path))
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                name, test_execution, spool_path = item
+                start = time.monotonic()
+                try:
+                    success = self.publisher.publish(test_execution, spool_path=spool_path)
+                except Exception:  # never let the worker die with work still queued
+                    _logger.exception('Unexpected error while uploading %s', name)
+                    success = False
+                self.results.append(UploadResult(name, bool(success), time.monotonic() - start))
+            finally:
+                self.queue.task_done()
+
+    def close(self, timeout: Optional[float] = DEFAULT_CLOSE_TIMEOUT) -> bool:
+        """Wait until all scheduled uploads are done.
+
+        :param timeout: deadline in seconds, ``None`` waits forever
+        :return: True if the queue was drained before the deadline
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.queue.put(_STOP, timeout=self._remaining(deadline))
+        except queue.Full:
+            return False
+        self.join(self._remaining(deadline))
+        return not self.is_alive()
+
+    @property
+    def pending(self) -> List[str]:
+        """Names of uploads which have not finished yet."""
+        done = {result.name for result in self.results}
+        return [name for name in self._submitted if name not in done]
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
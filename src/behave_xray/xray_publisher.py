@@ -1,70 +1,415 @@
+import copy
 import logging
-from typing import Tuple, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
 from requests.auth import AuthBase
 
+from behave_xray.authentication import BearerAuth
 from behave_xray.exceptions import XrayError
+from behave_xray.metrics import Metrics
+from behave_xray.model import TestCase, TestExecution
+from behave_xray.retry import RETRYABLE_STATUS_CODES, CircuitBreaker, RetryPolicy
+from behave_xray.serialization import SerializedTestExecution, dumps
+from behave_xray.session import DEFAULT_TIMEOUT, create_session
+from behave_xray.spool import Spool
+from behave_xray.state_index import StateIndex, get_digest
+from behave_xray.tracing import STATUS_ERROR, STATUS_OK, Span, Tracer
 
 
 TEST_EXECUTION_ENDPOINT = '/rest/raven/2.0/import/execution'
 TEST_EXECUTION_ENDPOINT_CLOUD = '/api/v2/import/execution'
 
+# size of chunks sent with chunked transfer encoding
+STREAM_CHUNK_SIZE = 64 * 1024
+# room reserved for the key of a created test execution when splitting it into parts
+MAX_TEST_EXECUTION_KEY_LENGTH = 32
+
 _logger = logging.getLogger(__name__)
 
+Payload = Union[dict, SerializedTestExecution, TestExecution]
+
 
 class XrayPublisher:
     """Sends Xray report to the Jira server."""
 
-    def __init__(self, base_url: str, endpoint: str, auth: Union[AuthBase, Tuple[str, str]]) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        endpoint: str,
+        auth: Optional[Union[AuthBase, Tuple[str, str]]],
+        session: Optional[requests.Session] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        stream_upload: bool = False,
+        max_payload_size: int = 0,
+        max_workers: int = 1,
+        spool: Optional[Spool] = None,
+        metrics: Optional[Metrics] = None,
+        tracer: Optional[Tracer] = None,
+        reuse_test_execution: bool = False,
+        state_index: Optional[StateIndex] = None,
+        timeout: float = DEFAULT_TIMEOUT
+    ) -> None:
+        """
+        :param base_url: Jira base URL
+        :param endpoint: Xray import endpoint
+        :param auth: authentication
+        :param session: HTTP session, a session with a connection pool is created by default
+        :param retry_policy: policy for repeating failed uploads
+        :param circuit_breaker: stops uploads after consecutive failures
+        :param stream_upload: send test executions as a stream of chunks instead of one JSON document
+        :param max_payload_size: split test executions larger than given bytes, 0 disables splitting
+        :param max_workers: number of parts of a split test execution uploaded concurrently
+        :param spool: journal of test executions, they are stored before upload
+        :param metrics: records request latency, payload size and retries
+        :param tracer: creates spans of uploads and requests
+        :param reuse_test_execution: import later test executions without a key into the one created first
+        :param state_index: digests of uploaded results, unchanged results are not imported again
+        :param timeout: seconds to wait for a connection or a response
+        """
         if base_url.endswith('/'):
             base_url = base_url[:-1]
         self.base_url = base_url
         self.endpoint = endpoint
         self.auth = auth
+        self.session = session or create_session()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.stream_upload = stream_upload
+        self.max_payload_size = max_payload_size
+        self.max_workers = max_workers
+        self.spool = spool
+        self.metrics = metrics or Metrics()
+        self.tracer = tracer or Tracer()
+        self.reuse_test_execution = reuse_test_execution
+        # key of the test execution created by the first upload, set only when it is reused
+        self.test_execution_key: Optional[str] = None
+        self.state_index = state_index
+        self.timeout = timeout
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+        if self.state_index is not None:
+            self.state_index.close()
 
     @property
     def endpoint_url(self) -> str:
         return self.base_url + self.endpoint
 
-    def publish_xray_results(self, url: str, auth: Union[AuthBase, Tuple[str, str]], data: dict) -> dict:
+    def publish_xray_results(
+        self,
+        url: str,
+        auth: Optional[Union[AuthBase, Tuple[str, str]]],
+        data: Payload
+    ) -> dict:
         headers = {
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
+        if not self.circuit_breaker.allow_request():
+            raise XrayError(f'Circuit breaker is open after {self.circuit_breaker.failures} failures, '
+                            f'skipping upload to {url}')
+        response = self._send_with_retries(url, auth, headers, data)
         try:
-            response = requests.request(method='POST', url=url, headers=headers, json=data, auth=auth)
-        except requests.exceptions.ConnectionError as e:
-            message = f'ConnectionError: JIRA service on {self.base_url}'
-            _logger.exception(message)
-            raise XrayError(message) from e
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            self.metrics.increment('failed_uploads')
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self.circuit_breaker.record_failure()
+            err_message = (f'HTTPError: Could not post to JIRA service at {url}. '
+                           f'Response status code: {response.status_code}')
+            _logger.exception(err_message)
+            server_error = self._get_server_error(response)
+            if server_error:
+                server_return_error = f'Error message from server: {server_error}'
+                err_message += '\n' + server_return_error
+                _logger.error(server_return_error)
+            raise XrayError(err_message) from e
         else:
+            self.circuit_breaker.record_success()
+            return response.json()
+
+    def _send_with_retries(
+        self,
+        url: str,
+        auth: Optional[Union[AuthBase, Tuple[str, str]]],
+        headers: dict,
+        data: Payload
+    ) -> requests.Response:
+        # importing into an existing test execution can be safely repeated
+        idempotent = bool(_get_test_execution_key(data))
+        token_refreshed = False
+        attempt = 1
+        while True:
+            self.metrics.increment('requests')
+            body = self._get_body(data)
+            span = self.tracer.start_span('xray.request', {'http.url': url, 'xray.attempt': attempt})
+            if isinstance(body['data'], bytes):
+                span.set_attribute('http.request.body.size', len(body['data']))
             try:
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as e:
-                err_message = (f'HTTPError: Could not post to JIRA service at {url}. '
-                               f'Response status code: {response.status_code}')
-                _logger.exception(err_message)
-                if 'error' in response.json():
-                    server_return_error = f"Error message from server: {response.json()['error']}"
-                    err_message += '\n' + server_return_error
-                    _logger.error(server_return_error)
-                raise XrayError(err_message) from e
-            else:
-                return response.json()
-
-    def publish(self, test_execution: dict) -> bool:
+                with self.metrics.timer('request'):
+                    response = self.session.request(method='POST', url=url, headers=headers, auth=auth,
+                                                    timeout=self.timeout, **body)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                span.set_attribute('error.type', type(e).__name__)
+                self.tracer.end_span(span, STATUS_ERROR)
+                if attempt < self.retry_policy.max_attempts and self.retry_policy.should_retry_error(e, idempotent):
+                    self._wait_before_retry(attempt, f'{type(e).__name__}: {e}')
+                    attempt += 1
+                    continue
+                self.circuit_breaker.record_failure()
+                self.metrics.increment('failed_uploads')
+                message = f'{type(e).__name__}: JIRA service on {self.base_url}'
+                _logger.exception(message)
+                raise XrayError(message) from e
+            span.set_attribute('http.status_code', response.status_code)
+            self.tracer.end_span(span, STATUS_ERROR if response.status_code >= 400 else STATUS_OK)
+            if response.status_code == 401 and isinstance(auth, BearerAuth) and not token_refreshed:
+                # the token was revoked or expired earlier than announced
+                auth.invalidate()
+                token_refreshed = True
+                continue
+            if (attempt < self.retry_policy.max_attempts
+                    and self.retry_policy.should_retry_status(response.status_code, idempotent)
+                    and self._wait_before_retry(
+                        attempt,
+                        f'response status code {response.status_code}',
+                        response.headers.get('Retry-After')
+                    )):
+                attempt += 1
+                continue
+            return response
+
+    def _get_body(self, data: Payload) -> Dict[str, Any]:
+        if self.stream_upload and isinstance(data, TestExecution):
+            # a generator body is sent with chunked transfer encoding
+            return {'data': self._count_bytes(_iter_chunks(fragment.encode('utf-8') for fragment in data.iter_json()))}
+        if isinstance(data, SerializedTestExecution):
+            body = data.body
+        elif isinstance(data, dict):
+            body = dumps(data)
+        else:
+            body = dumps(data.as_dict())
+        self.metrics.increment('payload_bytes', len(body))
+        return {'data': body}
+
+    def _count_bytes(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.metrics.increment('payload_bytes', len(chunk))
+            yield chunk
+
+    def _wait_before_retry(self, attempt: int, reason: str, retry_after: Optional[str] = None) -> bool:
+        """Wait before the next attempt, return False if the request must not be repeated."""
+        delay = self.retry_policy.get_delay(attempt, retry_after)
+        if delay is None:
+            return False
+        self.metrics.increment('retries')
+        _logger.warning('Upload attempt %d of %d failed (%s), retrying in %.1f seconds',
+                        attempt, self.retry_policy.max_attempts, reason, delay)
+        time.sleep(delay)
+        return True
+
+    @staticmethod
+    def _get_server_error(response: Any) -> Optional[str]:
+        """Return error message of a response of requests or httpx."""
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict) and 'error' in body:
+            return str(body['error'])
+        return None
+
+    def publish(self, test_execution: Payload, spool_path: Optional[str] = None) -> bool:
+        """Publish test execution, split into several imports if it is too large.
+
+        :param test_execution: test execution to publish
+        :param spool_path: spool entry of the test execution written by :meth:`journal`,
+            it is written before upload by default
+        """
+        with self.metrics.timer('publish'), self.tracer.span('xray.publish') as span:
+            span.set_attribute('xray.tests', _count_tests(test_execution))
+            success = self._publish(test_execution, span, spool_path)
+            span.status = STATUS_OK if success else STATUS_ERROR
+            return success
+
+    def journal(self, test_execution: Payload) -> Optional[str]:
+        """Store test execution in the spool and return its path, None if there is no spool."""
+        return self.spool.write(test_execution) if self.spool is not None else None
+
+    def with_reused_test_execution(self, test_execution: Payload) -> Payload:
+        """Return test execution with the key of the reused test execution if it has no key yet."""
+        if self.reuse_test_execution and self.test_execution_key and not _get_test_execution_key(test_execution):
+            return _with_test_execution_key(test_execution, self.test_execution_key)
+        return test_execution
+
+    def _publish(self, test_execution: Payload, span: Span, spool_path: Optional[str] = None) -> bool:
+        reused = self.with_reused_test_execution(test_execution)
+        if reused is not test_execution:
+            test_execution = reused
+            if spool_path is not None and self.spool is not None:
+                # the entry was journaled before the reused test execution was created,
+                # uploading it later must not create another test execution
+                self.spool.rewrite(spool_path, test_execution)
+        creates_test_execution = not _get_test_execution_key(test_execution)
+        digests: Dict[str, str] = {}
+        if self.state_index is not None:
+            digests = _get_digests(test_execution)
+            if not creates_test_execution:
+                test_execution = _remove_unchanged(self.state_index, test_execution, digests)
+                if not _get_tests(test_execution):
+                    print('No changed results for JIRA XRAY Test Execution:', _get_test_execution_key(test_execution))
+                    self._mark_done(spool_path)
+                    return True
+        if spool_path is None:
+            spool_path = self.journal(test_execution)
+        parts = self.split(test_execution)
+        span.set_attribute('xray.parts', len(parts))
+        key = self._publish_part(parts[0])
+        if key is None:
+            return False
+        span.set_attribute('xray.test_execution_key', key)
+        if creates_test_execution and self.reuse_test_execution:
+            _logger.info('Results of the following uploads are imported into test execution %s', key)
+            self.test_execution_key = key
+        success = True
+        if len(parts) > 1:
+            _logger.info('Test execution is uploaded in %d parts', len(parts))
+            if creates_test_execution and spool_path is not None and self.spool is not None:
+                # uploading the spool entry later must not create another test execution
+                self.spool.rewrite(spool_path, _with_test_execution_key(test_execution, key))
+            parts = [_with_test_execution_key(part, key) for part in parts[1:]]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                success = all(part_key is not None for part_key in executor.map(self._publish_part, parts))
+        if success:
+            print('Uploaded results to JIRA XRAY Test Execution:', key)
+            if self.state_index is not None:
+                self.state_index.record(key, digests)
+            self._mark_done(spool_path)
+        return success
+
+    def _mark_done(self, spool_path: Optional[str]) -> None:
+        if spool_path is not None and self.spool is not None:
+            self.spool.mark_done(spool_path)
+
+    def split(self, test_execution: Payload) -> List[Payload]:
+        """Split test execution into parts not exceeding maximum payload size."""
+        if not self.max_payload_size or _count_tests(test_execution) < 2:
+            return [test_execution]
+        if isinstance(test_execution, SerializedTestExecution) and len(test_execution.body) <= self.max_payload_size:
+            return [test_execution]
+        tests = _get_tests(test_execution)
+        # info and the key of the test execution are sent with every part
+        max_tests_size = self.max_payload_size - _get_envelope_size(test_execution)
+        chunks: List[list] = [[]]
+        chunk_size = 0
+        for test in tests:
+            # with separator from the previous test
+            test_size = (test.estimate_size() if isinstance(test, TestCase) else len(dumps(test))) + 2
+            if chunks[-1] and chunk_size + test_size > max_tests_size:
+                chunks.append([])
+                chunk_size = 0
+            chunks[-1].append(test)
+            chunk_size += test_size
+        return [_with_tests(test_execution, chunk) for chunk in chunks]
+
+    def _publish_part(self, test_execution: Payload) -> Optional[str]:
+        """Publish test execution and return its key, or None if it failed."""
         try:
             result = self.publish_xray_results(self.endpoint_url, self.auth, test_execution)
         except XrayError as e:
             _logger.error('Could not publish results to Jira XRAY')
             _logger.error(e.message)
-            return False
+            return None
         else:
             _logger.debug('Publish returned: %s', result)
             # XRAY Server+DC returns test execution information nested under 'testExecIssue'
             # XRAY Cloud returns it directly
             # Refer to XRAY API documentation for more details.
-            key = result['testExecIssue']['key'] if 'testExecIssue' in result else result['key']
-            print('Uploaded results to JIRA XRAY Test Execution:', key)
-            return True
+            return result['testExecIssue']['key'] if 'testExecIssue' in result else result['key']
+
+
+def _get_test_execution_key(data: Payload) -> str:
+    if isinstance(data, dict):
+        return data.get('testExecutionKey', '')
+    return data.test_execution_key
+
+
+def _get_tests(data: Payload) -> list:
+    if isinstance(data, SerializedTestExecution):
+        data = data.data
+    if isinstance(data, dict):
+        return data.get('tests', [])
+    return data.tests
+
+
+def _count_tests(data: Payload) -> int:
+    if isinstance(data, SerializedTestExecution):
+        return data.test_count
+    return len(_get_tests(data))
+
+
+def _get_test_key(test: Union[dict, TestCase]) -> str:
+    return test['testKey'] if isinstance(test, dict) else test.test_key
+
+
+def _get_digests(data: Payload) -> Dict[str, str]:
+    return {_get_test_key(test): get_digest(test) for test in _get_tests(data)}
+
+
+def _remove_unchanged(state_index: StateIndex, data: Payload, digests: Dict[str, str]) -> Payload:
+    """Return test execution with results which changed since they were uploaded to it."""
+    changed = state_index.changed(_get_test_execution_key(data), digests)
+    if len(changed) == len(digests):
+        return data
+    _logger.info('Skipping %d unchanged test results', len(digests) - len(changed))
+    return _with_tests(data, [test for test in _get_tests(data) if _get_test_key(test) in changed])
+
+
+def _get_envelope_size(data: Payload) -> int:
+    """Return size of test execution without tests, with the key added to later parts of a new test execution."""
+    envelope = _with_tests(data, [])
+    if not _get_test_execution_key(envelope):
+        envelope = _with_test_execution_key(envelope, 'X' * MAX_TEST_EXECUTION_KEY_LENGTH)
+    if isinstance(envelope, SerializedTestExecution):
+        return len(envelope.body)
+    if isinstance(envelope, dict):
+        return len(dumps(envelope))
+    # streamed form is larger than the compact one
+    return sum(len(fragment.encode('utf-8')) for fragment in envelope.iter_json())
+
+
+def _with_tests(data: Payload, tests: list) -> Payload:
+    if isinstance(data, SerializedTestExecution):
+        return SerializedTestExecution.from_dict(dict(data.data, tests=tests))
+    if isinstance(data, dict):
+        return dict(data, tests=tests)
+    part = copy.copy(data)
+    part.tests = tests
+    return part
+
+
+def _with_test_execution_key(data: Payload, key: str) -> Payload:
+    if isinstance(data, SerializedTestExecution):
+        return SerializedTestExecution.from_dict(dict(data.data, testExecutionKey=key))
+    if isinstance(data, dict):
+        return dict(data, testExecutionKey=key)
+    part = copy.copy(data)
+    part.test_execution_key = key
+    return part
+
+
+def _iter_chunks(fragments: Iterable[bytes], size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Join small fragments into chunks of at least given size."""
+    buffer = bytearray()
+    for fragment in fragments:
+        buffer += fragment
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
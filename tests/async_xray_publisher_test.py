@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from unittest import mock
+
+import httpx
+import pytest
+
+from behave_xray.async_xray_publisher import AsyncXrayPublisher
+from behave_xray.authentication import BearerAuth
+from behave_xray.metrics import Metrics
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.retry import RetryPolicy
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, TEST_EXECUTION_ENDPOINT_CLOUD
+from tests.xray_emulator import CLOUD_AUTHENTICATE_ENDPOINT, CLOUD_IMPORT_ENDPOINT, fixed
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('behave_xray.async_xray_publisher.asyncio.sleep', new=mock.AsyncMock()) as sleep:
+        yield sleep
+
+
+def _test_executions(count):
+    return [_TestExecution(tests=[_TestCase(f'JIRA-{i}', 'PASS')]) for i in range(count)]
+
+
+async def _publish_many(publisher, test_executions, concurrency):
+    async with publisher:
+        return await publisher.publish_many(test_executions, concurrency=concurrency)
+
+
+def test_publish_many_limits_concurrency(xray_emulator):
+    xray_emulator.faults.latency = fixed(0.05)
+    publisher = AsyncXrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'))
+
+    results = asyncio.run(_publish_many(publisher, _test_executions(12), concurrency=4))
+
+    assert results == [True] * 12
+    stats = xray_emulator.stats()
+    assert stats['test_executions'] == 12
+    assert 1 < stats['max_in_flight'] <= 4
+
+
+def test_publish_many_authenticates_once_for_concurrent_uploads(xray_emulator):
+    metrics = Metrics()
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret')
+    publisher = AsyncXrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth, metrics=metrics)
+
+    assert asyncio.run(_publish_many(publisher, _test_executions(5), concurrency=5)) == [True] * 5
+
+    assert xray_emulator.stats()['by_endpoint'][CLOUD_AUTHENTICATE_ENDPOINT] == 1
+    assert metrics.as_dict()['counters']['auth_requests'] == 1
+
+
+def test_publisher_refreshes_rejected_token(xray_emulator):
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret')
+    auth.set_token('revoked-token')
+    publisher = AsyncXrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth)
+
+    assert asyncio.run(_publish_many(publisher, _test_executions(1), concurrency=1)) == [True]
+
+    assert xray_emulator.stats()['by_endpoint'] == {CLOUD_IMPORT_ENDPOINT: 2, CLOUD_AUTHENTICATE_ENDPOINT: 1}
+
+
+def test_publisher_retries_rejected_upload(xray_emulator, no_sleep):
+    xray_emulator.faults.retry_after = '3'
+    xray_emulator.fail_next(429)
+    xray_emulator.fail_next(502)
+    publisher = AsyncXrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'),
+                                   retry_policy=RetryPolicy(max_attempts=3))
+
+    # a new test execution is not imported again after a gateway error
+    assert asyncio.run(_publish_many(publisher, _test_executions(1), concurrency=1)) == [False]
+
+    assert xray_emulator.stats()['by_status'] == {429: 1, 502: 1}
+    no_sleep.assert_awaited_once_with(3.0)
+
+
+@pytest.mark.parametrize('content', [b'<html>Bad gateway</html>', b'{"id": "10000"}', b'[]'])
+def test_publisher_rejects_unexpected_response(content):
+    publisher = AsyncXrayPublisher('http://localhost', TEST_EXECUTION_ENDPOINT, ('user', 'password'))
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=content))
+    publisher.client = httpx.AsyncClient(transport=transport)
+
+    assert asyncio.run(_publish_many(publisher, _test_executions(1), concurrency=1)) == [False]
+    assert publisher.metrics.as_dict()['counters']['failed_uploads'] == 1
+
+
+def test_publisher_reads_token_outside_event_loop(xray_emulator):
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret')
+    threads = []
+    get_valid_token = auth.get_valid_token
+
+    def record_thread():
+        threads.append(threading.current_thread())
+        return get_valid_token()
+
+    auth.get_valid_token = record_thread
+    publisher = AsyncXrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth)
+
+    assert asyncio.run(_publish_many(publisher, _test_executions(1), concurrency=1)) == [True]
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,108 @@
+import base64
+import json
+import os
+import stat
+import time
+from typing import Union
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from behave_xray.authentication import BearerAuth
+from behave_xray.exceptions import XrayError
+from behave_xray.token_cache import TokenCache, get_token_expiry
+
+
+def _jwt(expires_at: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': expires_at}).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+
+def _session(*tokens: str) -> MagicMock:
+    session = MagicMock()
+    session.post.side_effect = [MagicMock(text=f'"{token}"') for token in tokens]
+    return session
+
+
+def _sign(auth: BearerAuth) -> Union[str, bytes]:
+    return auth(requests.Request('POST', 'http://localhost').prepare()).headers['Authorization']
+
+
+def test_get_token_expiry_reads_jwt_payload():
+    assert get_token_expiry(_jwt(1700000000)) == 1700000000
+    assert get_token_expiry('not-a-jwt') is None
+
+
+def test_bearer_auth_reuses_token_until_it_expires():
+    token = _jwt(time.time() + 3600)
+    session = _session(token)
+    auth = BearerAuth('http://localhost', 'client_id', 'secret', session=session)
+
+    assert _sign(auth) == f'Bearer {token}'
+    assert _sign(auth) == f'Bearer {token}'
+    assert session.post.call_count == 1
+
+
+def test_bearer_auth_renews_token_close_to_expiry():
+    session = _session(_jwt(time.time() + 30), _jwt(time.time() + 3600))
+    auth = BearerAuth('http://localhost', 'client_id', 'secret', session=session, expiry_margin=60)
+
+    _sign(auth)
+    _sign(auth)
+    assert session.post.call_count == 2
+
+
+def test_bearer_auth_raises_error_when_authentication_fails():
+    session = MagicMock()
+    session.post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    auth = BearerAuth('http://localhost', 'client_id', 'secret', session=session)
+    with pytest.raises(XrayError):
+        _sign(auth)
+
+
+def test_bearer_auth_raises_error_when_authentication_times_out():
+    session = MagicMock()
+    session.post.side_effect = requests.exceptions.ReadTimeout()
+    auth = BearerAuth('http://localhost', 'client_id', 'secret', session=session, timeout=5.0)
+    with pytest.raises(XrayError, match='ReadTimeout'):
+        _sign(auth)
+    assert session.post.call_args.kwargs['timeout'] == 5.0
+
+
+def test_token_cache_is_shared_between_instances(tmp_path):
+    token = _jwt(time.time() + 3600)
+    cache_path = str(tmp_path / 'tokens.json')
+    first_session = _session(token)
+    second_session = _session()
+
+    first = BearerAuth('http://localhost', 'client_id', 'secret', session=first_session,
+                       token_cache=TokenCache(cache_path))
+    second = BearerAuth('http://localhost', 'client_id', 'secret', session=second_session,
+                        token_cache=TokenCache(cache_path))
+
+    assert _sign(first) == _sign(second) == f'Bearer {token}'
+    assert second_session.post.call_count == 0
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+
+
+def test_token_cache_is_keyed_by_client_id(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    first = BearerAuth('http://localhost', 'client_1', 'secret', session=_session(_jwt(time.time() + 3600)),
+                       token_cache=cache)
+    second_session = _session(_jwt(time.time() + 7200))
+    second = BearerAuth('http://localhost', 'client_2', 'secret', session=second_session, token_cache=cache)
+
+    assert _sign(first) != _sign(second)
+    assert second_session.post.call_count == 1
+
+
+def test_rejected_token_is_not_taken_from_cache(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    session = _session(_jwt(time.time() + 3600), _jwt(time.time() + 7200))
+    auth = BearerAuth('http://localhost', 'client_id', 'secret', session=session, token_cache=cache)
+
+    first = _sign(auth)
+    auth.invalidate()
+    assert _sign(auth) != first
+    assert session.post.call_count == 2
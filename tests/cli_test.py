@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+from behave_xray.cli import load_test_executions, main
+from behave_xray.spool import Spool
+from tests.conftest import basic_auth
+
+
+@pytest.fixture(autouse=True)
+def jira_environ():
+    with mock.patch.dict(os.environ, basic_auth):
+        yield
+
+
+def test_cli_does_not_import_behave():
+    code = 'import sys, behave_xray.cli; assert "behave" not in sys.modules'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_load_concatenated_test_executions(tmp_path):
+    path = tmp_path / 'xray.json'
+    path.write_text(json.dumps({'tests': [1]}, indent=4) + json.dumps({'tests': [2]}) + '\n')
+    assert load_test_executions(str(path)) == [{'tests': [1]}, {'tests': [2]}]
+
+
+def test_upload_json_files(tmp_path, capsys):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'xray-{index}.json'
+        path.write_text(json.dumps({'info': {}, 'tests': [{'testKey': f'JIRA-{index}', 'status': 'PASS'}]}))
+        paths.append(str(path))
+
+    assert main(['upload', '--workers', '2'] + paths) == 0
+    assert 'Uploaded 3 of 3 files' in capsys.readouterr().out
+
+
+def test_upload_pending_test_executions_from_spool(tmp_path):
+    spool = Spool(tmp_path)
+    spool.write({'info': {}, 'tests': []})
+    spool.write({'info': {}, 'tests': []})
+
+    assert main(['upload', '--spool', str(tmp_path)]) == 0
+    assert spool.pending() == []
+    assert len(os.listdir(spool.done_dir)) == 2
+
+
+def test_upload_reports_unreadable_file(tmp_path, capsys):
+    path = tmp_path / 'broken.json'
+    path.write_text('{')
+    assert main(['upload', str(path)]) == 1
+    assert f'FAILED: {path}' in capsys.readouterr().out
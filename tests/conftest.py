@@ -1,6 +1,7 @@
 import pytest
 
 from tests.mock_server import MockServer
+from tests.xray_emulator import XrayEmulator
 
 
 BASE_API_URL = 'http://127.0.0.1:5002'
@@ -57,3 +58,12 @@ def http_server():
     server.start()
     yield
     server.shutdown_server()
+
+
+@pytest.fixture
+def xray_emulator():
+    """Jira Xray emulator with fault injection, listening on a free port."""
+    emulator = XrayEmulator(seed=0)
+    emulator.start()
+    yield emulator
+    emulator.shutdown_server()
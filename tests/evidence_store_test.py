@@ -0,0 +1,61 @@
+import base64
+
+import pytest
+
+from behave_xray import evidence
+from behave_xray.evidence_store import BudgetPolicy, DedupMode, EvidenceStore
+
+
+def _decode(item):
+    return base64.b64decode(item['data']).decode()
+
+
+def test_evidences_are_passed_through_by_default():
+    evidences = [evidence.text('log', 'log.txt'), evidence.text('log', 'log.txt')]
+    assert EvidenceStore().select('JIRA-1', evidences) is evidences
+
+
+def test_repeated_evidence_is_replaced_by_reference():
+    store = EvidenceStore(dedup=DedupMode.reference)
+    dump = evidence.text('environment dump', 'env.txt')
+
+    assert store.select('JIRA-1', [dump, dict(dump)]) == [dump]
+    reference = store.select('JIRA-2', [dict(dump)])
+    assert len(reference) == 1
+    assert reference[0]['filename'] == 'env.txt.ref.txt'
+    assert _decode(reference[0]) == 'Same content as evidence env.txt of test JIRA-1'
+
+
+def test_file_evidence_is_deduplicated_with_in_memory_evidence(tmp_path):
+    path = tmp_path / 'screenshot.png'
+    path.write_bytes(b'\x89PNG')
+    store = EvidenceStore(dedup=DedupMode.reference)
+
+    store.select('JIRA-1', [evidence.png_file(path)])
+    selected = store.select('JIRA-2', [evidence.png(b'\x89PNG', 'copy.png')])
+    assert selected[0]['filename'] == 'copy.png.ref.txt'
+
+
+@pytest.mark.parametrize('policy, expected', [
+    (BudgetPolicy.drop, []),
+    (BudgetPolicy.truncate, ['012345678901']),
+])
+def test_evidence_over_test_budget(policy, expected):
+    store = EvidenceStore(max_test_bytes=16, policy=policy)
+    selected = store.select('JIRA-1', [evidence.text('0123456789' * 10, 'log.txt')])
+    assert [_decode(item) for item in selected] == expected
+
+
+def test_evidence_over_budget_is_summarized():
+    store = EvidenceStore(max_test_bytes=1000, policy=BudgetPolicy.summarize)
+    selected = store.select('JIRA-1', [evidence.text('x' * 1000, 'log.txt')])
+    assert selected[0]['filename'] == 'log.txt.omitted.txt'
+    assert 'exceeds the evidence budget' in _decode(selected[0])
+
+
+def test_execution_budget_is_shared_by_test_cases():
+    store = EvidenceStore(max_execution_bytes=24, policy=BudgetPolicy.drop)
+    item = evidence.text('0123456789', 'log.txt')  # 16 bytes encoded
+    assert store.select('JIRA-1', [item]) == [item]
+    assert store.select('JIRA-2', [item]) == []
+    assert store.execution_bytes == 16
@@ -0,0 +1,72 @@
+import base64
+import json
+
+import pytest
+
+from behave_xray import evidence
+from behave_xray.evidence_store import DedupMode, EvidenceStore
+from behave_xray.exceptions import XrayError
+from behave_xray.model import TestCase as _TestCase
+
+
+@pytest.fixture
+def screenshot(tmp_path):
+    path = tmp_path / 'screenshot.png'
+    path.write_bytes(bytes(range(256)) * 100)
+    return path
+
+
+def test_evidence_encodes_string_data():
+    assert evidence.text('data', 'log.txt') == {
+        'data': base64.b64encode(b'data').decode(),
+        'filename': 'log.txt',
+        'contentType': evidence.PLAIN_TEXT
+    }
+
+
+def test_file_evidence_matches_in_memory_evidence(screenshot):
+    file_evidence = evidence.png_file(screenshot)
+    assert file_evidence.as_dict() == evidence.png(screenshot.read_bytes(), 'screenshot.png')
+
+
+def test_file_evidence_is_encoded_in_chunks(screenshot):
+    chunks = list(evidence.from_file(screenshot, evidence.IMAGE_PNG).iter_base64(chunk_size=3 * 1000))
+    assert len(chunks) > 1
+    assert base64.b64decode(''.join(chunks)) == screenshot.read_bytes()
+
+
+def test_file_evidence_of_empty_file(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    assert evidence.text_file(path, filename='log.txt')['data'] == ''
+
+
+def test_file_evidence_requires_existing_file(tmp_path):
+    with pytest.raises(XrayError):
+        evidence.text_file(tmp_path / 'missing.txt')
+
+
+def test_test_case_serializes_file_evidence(screenshot):
+    testcase = _TestCase('JIRA-1', 'PASS')
+    testcase.evidences = [evidence.png_file(screenshot), evidence.text('log', 'log.txt')]
+    assert json.loads(''.join(testcase.iter_json())) == testcase.as_dict()
+    assert testcase.as_dict()['evidences'][0]['filename'] == 'screenshot.png'
+
+
+def test_removed_file_evidence_is_skipped(screenshot, caplog):
+    testcase = _TestCase('JIRA-1', 'PASS')
+    testcase.evidences = [evidence.png_file(screenshot), evidence.text('log', 'log.txt')]
+    size = testcase.estimate_size()
+    screenshot.unlink()
+
+    assert testcase.as_dict()['evidences'] == [evidence.text('log', 'log.txt')]
+    assert json.loads(''.join(testcase.iter_json())) == testcase.as_dict()
+    assert testcase.estimate_size() < size
+    assert 'does not exist, evidence skipped' in caplog.text
+
+
+def test_evidence_store_skips_removed_file_evidence(screenshot):
+    store = EvidenceStore(dedup=DedupMode.reference)
+    file_evidence = evidence.png_file(screenshot)
+    screenshot.unlink()
+    assert store.select('JIRA-1', [file_evidence]) == []
@@ -1,11 +1,14 @@
 import datetime as dt
 import os
+import threading
 from unittest import mock
 from unittest.mock import MagicMock
 
 import pytest
 from behave.model_core import Status
+from behave.parser import parse_feature
 
+from behave_xray import hookimpl
 from behave_xray.formatter import (
     AuthType,
     ScenarioResult,
@@ -14,12 +17,15 @@ from behave_xray.formatter import (
     _get_jira_config,
 )
 from behave_xray.helper import (
+    TagKeys,
+    classify_tag,
     get_overall_status,
     get_test_execution_key_from_tag,
     get_test_plan_key_from_tag,
     get_testcase_key_from_tag,
 )
 from behave_xray.model import DEFAULT_SUMMARY
+from behave_xray.upload_worker import UploadWorker
 
 
 @pytest.fixture
@@ -65,6 +71,36 @@ def test_test_execution_tag_parser(tag, jira_id):
     assert get_test_execution_key_from_tag(tag) == jira_id
 
 
+@pytest.mark.parametrize(
+    'tag, keys',
+    [("jira.testcase('JIRA-10')", TagKeys(testcase='JIRA-10')),
+     ("jira.test_execution('JIRA-11')", TagKeys(test_execution='JIRA-11')),
+     ("jira.test_plan('JIRA-12')", TagKeys(test_plan='JIRA-12')),
+     ('smoke', TagKeys())]
+)
+def test_classify_tag(tag, keys):
+    assert classify_tag(tag) == keys
+
+
+def test_tag_index_contains_outline_rows(environ_patched):
+    feature = parse_feature(
+        'Feature: Calculator\n'
+        '  Scenario Outline: Add\n'
+        '    Given <a>\n'
+        '    @TEST_<key>\n'
+        '    Examples:\n'
+        '      | a | key     |\n'
+        '      | 1 | JIRA-1  |\n'
+        '      | 2 | JIRA-2  |\n'
+        '  @smoke\n'
+        '  Scenario: Subtract\n'
+        '    Given 3\n'
+    )
+    formatter = XrayFormatter(MagicMock(), MagicMock(userdata={}))
+    formatter.feature(feature)
+    assert formatter.tag_index == {'TEST_JIRA-1': 'JIRA-1', 'TEST_JIRA-2': 'JIRA-2', 'smoke': None}
+
+
 @pytest.mark.parametrize(
     'statuses, expected_status',
     [
@@ -78,11 +114,49 @@ def test_test_execution_tag_parser(tag, jira_id):
         ([Status.passed, Status.passed, Status.executing], Status.executing),
         ([Status.passed, Status.passed, Status.passed], Status.passed),
         ([Status.passed, Status.passed, Status.undefined], Status.undefined),  # Error in test code
+        ([Status.passed, Status.skipped], Status.passed),
+        ([Status.error, Status.passed], Status.error),
+        ([Status.passed, Status.untested, Status.error], Status.error),
+        ([Status.passed, Status.hook_error], Status.hook_error),
+        ([Status.pending, Status.passed, Status.untested], Status.pending),
+        ([Status.error, Status.failed], Status.failed),
+        ([Status.skipped, Status.untested], Status.skipped),
         ([], Status.untested)
     ]
 )
 def test_overall_status(statuses, expected_status):
     assert get_overall_status(statuses) == expected_status, f'Failed for {statuses}'
+    assert ScenarioResult(statuses=statuses).overall_status == expected_status, f'Failed for {statuses}'
+
+
+def test_scenario_result_stores_one_byte_per_example(environ_patched):
+    result = ScenarioResult(is_outline=True)
+    for index in range(50000):
+        result.append_status(Status.failed if index == 100 else Status.passed)
+    assert result.status_values.itemsize == 1
+    assert result.status_counts == {Status.passed.value: 49999, Status.failed.value: 1}
+    assert result.overall_status == Status.failed
+
+    formatter = XrayFormatter(MagicMock(), MagicMock(userdata={}))
+    formatter.testcases = {'JIRA-1': result}
+    formatter.collect_tests()
+    testcase = formatter.test_execution.tests[0]
+    assert testcase.status == 'FAIL'
+    assert len(testcase.examples) == 50000
+    assert testcase.examples[100] == 'FAIL'
+
+
+def test_scenario_result_statuses_can_be_changed_in_place():
+    result = ScenarioResult(statuses=[Status.passed, Status.passed])
+    result.statuses.append(Status.failed)
+    result.statuses[0] = Status.skipped
+    del result.statuses[1]
+    assert result.statuses == [Status.skipped, Status.failed]
+    assert result.overall_status == Status.failed
+    result.statuses.clear()
+    assert result.overall_status == Status.untested
+    result.screenshot = 'failure.png'
+    assert result.screenshot == 'failure.png'
 
 
 def test_xray_formatter_return_correct_dictionary(environ_patched):
@@ -259,6 +333,117 @@ def test_xray_cloud_formatter_return_correct_dictionary(environ_patched):
         assert formatter.test_execution.as_dict() == expected_output
 
 
+def test_scenario_result_merge_combines_plain_scenarios():
+    result = ScenarioResult(statuses=[Status.passed], comment='')
+    result.merge(ScenarioResult(statuses=[Status.failed], comment='Not equal'))
+    assert result.statuses == [Status.failed]
+    assert result.comment == 'Not equal'
+    assert not result.is_outline
+
+
+def test_scenario_result_merge_appends_outline_examples():
+    result = ScenarioResult(statuses=[Status.passed, Status.passed], is_outline=True)
+    result.merge(ScenarioResult(statuses=[Status.failed], is_outline=True))
+    assert result.statuses == [Status.passed, Status.passed, Status.failed]
+    assert result.is_outline
+
+
+def test_xray_formatter_in_run_scope_publishes_once(environ_patched):
+    mock_config = MagicMock()
+    mock_config.userdata = {'xray.scope': 'run'}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+
+    for name, testcases in (
+        ('first', {'JIRA-1': ScenarioResult(statuses=[Status.passed]),
+                   'JIRA-2': ScenarioResult(statuses=[Status.passed, Status.passed], is_outline=True)}),
+        ('second', {'JIRA-1': ScenarioResult(statuses=[Status.failed], comment='Not equal'),
+                    'JIRA-2': ScenarioResult(statuses=[Status.failed], is_outline=True)}),
+    ):
+        feature = MagicMock(tags=[], description=[])
+        feature.name = name
+        formatter.feature(feature)
+        formatter.testcases.update(testcases)
+        formatter.eof()
+
+    formatter.xray_publisher.publish.assert_not_called()
+    formatter.close()
+
+    formatter.xray_publisher.publish.assert_called_once()
+    data = formatter.xray_publisher.publish.call_args[0][0].data
+    assert data['info']['description'] == 'first\nsecond'
+    assert data['tests'] == [
+        {'testKey': 'JIRA-1', 'status': 'FAIL', 'comment': 'Not equal', 'examples': []},
+        {'testKey': 'JIRA-2', 'status': 'FAIL', 'comment': '', 'examples': ['PASS', 'PASS', 'FAIL']},
+    ]
+
+
+def test_xray_formatter_keeps_publisher_open_while_uploads_are_running(environ_patched):
+    mock_config = MagicMock()
+    mock_config.userdata = {'xray.async_timeout': '0.1'}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    release = threading.Event()
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+    formatter.xray_publisher.publish.side_effect = lambda data, spool_path=None: release.wait(5)
+    formatter.upload_worker = UploadWorker(formatter.xray_publisher)
+    formatter.upload_worker.start()
+    formatter.upload_worker.submit({}, name='slow.feature')
+    worker = formatter.upload_worker
+
+    formatter.close()
+
+    formatter.xray_publisher.close.assert_not_called()
+    release.set()
+    worker.join(5)
+
+
+def _scenario(name, test_key, steps, continue_after_failed_step=False):
+    scenario = MagicMock(tags=[f"jira.testcase('{test_key}')"], keyword='Scenario', status=Status.passed,
+                         all_steps=steps, should_skip=False, continue_after_failed_step=continue_after_failed_step)
+    scenario.name = name
+    return scenario
+
+
+@pytest.mark.parametrize('hook_per_step, expected_calls', [('false', 2), ('true', 5)])
+def test_scenario_hook_runs_once_per_scenario(environ_patched, hook_per_step, expected_calls):
+    class Plugin:
+        def __init__(self):
+            self.scenarios = []
+            self.features = []
+
+        @hookimpl
+        def scenario_xray_result(self, result, scenario):
+            self.scenarios.append((scenario.name, len(result.statuses)))
+
+        @hookimpl
+        def feature_xray_results(self, results, feature):
+            self.features.append((feature.name, sorted(results)))
+
+    mock_config = MagicMock()
+    mock_config.userdata = {'xray.hook_per_step': hook_per_step}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+    plugin = Plugin()
+    formatter.pm.register(plugin)
+
+    feature = MagicMock(tags=[], description=[])
+    feature.name = 'Calculator'
+    formatter.feature(feature)
+    for name, test_key, count in (('Add', 'JIRA-1', 3), ('Subtract', 'JIRA-2', 2)):
+        steps = [MagicMock(status=Status.passed, duration=0.1) for _ in range(count)]
+        formatter.scenario(_scenario(name, test_key, steps))
+        for step in steps:
+            formatter.result(step)
+    formatter.eof()
+
+    assert len(plugin.scenarios) == expected_calls
+    assert plugin.scenarios[-1] == ('Subtract', 2)
+    assert plugin.features == [('Calculator', ['JIRA-1', 'JIRA-2'])]
+
+
 @mock.patch.dict(
     os.environ,
     {
@@ -320,3 +505,95 @@ def test_get_jira_config_returns_bearer_auth():
 def test_get_jira_config_returns_bearer_auth_before_others():
     config = _get_jira_config()
     assert config.auth_method == AuthType.bearer
+
+
+def test_xray_formatter_in_execution_scope_publishes_bucket_per_key(environ_patched):
+    mock_config = MagicMock()
+    mock_config.userdata = {'xray.scope': 'execution'}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    formatter.xray_publisher = MagicMock(stream_upload=False, max_workers=2)
+
+    for name, tags, testcases in (
+        ('first', ["jira.test_execution('JIRA-10')"], {'JIRA-1': ScenarioResult(statuses=[Status.passed])}),
+        ('second', [], {'JIRA-2': ScenarioResult(statuses=[Status.passed])}),
+        ('third', ["jira.test_execution('JIRA-10')"], {'JIRA-1': ScenarioResult(statuses=[Status.failed]),
+                                                       'JIRA-3': ScenarioResult(statuses=[Status.passed])}),
+    ):
+        feature = MagicMock(tags=tags, description=[])
+        feature.name = name
+        formatter.feature(feature)
+        formatter.testcases.update(testcases)
+        formatter.eof()
+
+    formatter.xray_publisher.publish.assert_not_called()
+    formatter.close()
+
+    assert formatter.xray_publisher.publish.call_count == 2
+    payloads = {payload.data.get('testExecutionKey', ''): payload.data
+                for (payload,), _ in formatter.xray_publisher.publish.call_args_list}
+    assert payloads['JIRA-10']['info']['description'] == 'first\nthird'
+    assert [test['testKey'] for test in payloads['JIRA-10']['tests']] == ['JIRA-1', 'JIRA-3']
+    assert payloads['JIRA-10']['tests'][0]['status'] == 'FAIL'
+    assert [test['testKey'] for test in payloads['']['tests']] == ['JIRA-2']
+
+
+@pytest.mark.parametrize('tags, early_uploads, uploads', [
+    (["jira.test_execution('JIRA-10')"], 1, 2),
+    # each upload without a test execution key would create a new test execution
+    ([], 0, 1),
+])
+def test_xray_formatter_flushes_bucket_over_threshold(environ_patched, tags, early_uploads, uploads):
+    mock_config = MagicMock()
+    mock_config.userdata = {'xray.scope': 'execution', 'xray.bucket_max_tests': '2'}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    formatter.xray_publisher = MagicMock(stream_upload=False, max_workers=1)
+
+    for test_key in ('JIRA-1', 'JIRA-2', 'JIRA-3'):
+        feature = MagicMock(tags=tags, description=[])
+        feature.name = test_key
+        formatter.feature(feature)
+        formatter.testcases[test_key] = ScenarioResult(statuses=[Status.passed])
+        formatter.eof()
+
+    assert formatter.xray_publisher.publish.call_count == early_uploads
+    formatter.close()
+    assert formatter.xray_publisher.publish.call_count == uploads
+
+
+@pytest.mark.parametrize('statuses, reported, continue_after_failed_step, expected_calls', [
+    ((Status.passed, Status.passed), 2, False, [[], [2]]),
+    # behave does not report steps skipped after a failed one
+    ((Status.failed, Status.skipped), 1, False, [[1]]),
+    ((Status.failed, Status.passed), 2, True, [[], [2]]),
+])
+def test_scenario_hook_runs_when_last_step_is_reported(environ_patched, statuses, reported, continue_after_failed_step,
+                                                       expected_calls):
+    calls = []
+
+    class Plugin:
+        @hookimpl
+        def scenario_xray_result(self, result, scenario):
+            calls.append(len(result.statuses))
+
+    mock_config = MagicMock()
+    mock_config.userdata = {}
+    mock_config.dry_run = False
+    formatter = XrayFormatter(MagicMock(), mock_config)
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+    formatter.pm.register(Plugin())
+
+    feature = MagicMock(tags=[], description=[])
+    feature.name = 'Calculator'
+    formatter.feature(feature)
+    steps = [MagicMock(status=status, duration=0.1, error_message='Not equal') for status in statuses]
+    formatter.scenario(_scenario('Add', 'JIRA-1', steps, continue_after_failed_step))
+    calls_after_step = []
+    for step in steps[:reported]:
+        formatter.result(step)
+        calls_after_step.append(list(calls))
+    formatter.eof()
+
+    assert calls_after_step == expected_calls
+    assert calls == expected_calls[-1]
@@ -28,6 +28,21 @@ def test_if_xray_formatter_publishes_results(formatter, auth_type, auth):
     assert '4 scenarios passed, 2 failed, 0 skipped' in process.stdout, process.stdout
 
 
+def test_if_xray_formatter_publishes_results_asynchronously(auth):
+    env = dict(os.environ).copy()
+    env.update(auth('basic'))
+
+    process = subprocess.run(
+        ['behave', 'tests', '-f', 'behave_xray:XrayFormatter', '-D', 'xray.async=true'],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    assert not process.stderr
+    assert 'Uploaded results to JIRA XRAY Test Execution: JIRA-1000' in process.stdout, process.stdout
+    assert 'Xray upload OK: tests/features/calculator.feature' in process.stdout, process.stdout
+
+
 def test_if_xray_formatter_results_matches_expected_format(auth, tmp_path):
     report_path = tmp_path / 'xray.json'
     env = dict(os.environ).copy()
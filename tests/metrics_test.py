@@ -0,0 +1,87 @@
+import json
+import os
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+
+from behave_xray.authentication import BearerAuth
+from behave_xray.formatter import TestCase as _TestCase
+from behave_xray.formatter import XrayFormatter
+from behave_xray.metrics import Metrics
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.retry import RetryPolicy
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT_CLOUD, XrayPublisher
+from tests.conftest import basic_auth
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('behave_xray.xray_publisher.time.sleep') as sleep:
+        yield sleep
+
+
+def test_metrics_are_written_as_json(tmp_path):
+    metrics = Metrics()
+    metrics.increment('requests')
+    metrics.increment('payload_bytes', 120)
+    metrics.observe('request', 0.5)
+    metrics.observe('request', 1.5)
+    path = tmp_path / 'stats' / 'metrics.json'
+
+    metrics.write(str(path))
+
+    assert json.loads(path.read_text()) == {
+        'counters': {'payload_bytes': 120, 'requests': 1},
+        'timings': {'request': {'count': 2, 'total_seconds': 2.0, 'max_seconds': 1.5}}
+    }
+
+
+def test_metrics_are_written_in_prometheus_format(tmp_path):
+    metrics = Metrics()
+    metrics.increment('retries', 2)
+    with metrics.timer('encode'):
+        pass
+    path = tmp_path / 'metrics.prom'
+
+    metrics.write(str(path))
+
+    lines = path.read_text().splitlines()
+    assert 'behave_xray_retries_total 2' in lines
+    assert '# TYPE behave_xray_encode_seconds summary' in lines
+    assert 'behave_xray_encode_seconds_count 1' in lines
+
+
+def test_publisher_records_requests_retries_and_authentication(xray_emulator):
+    xray_emulator.fail_next(503)
+    metrics = Metrics()
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret', metrics=metrics)
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth,
+                              retry_policy=RetryPolicy(max_attempts=2), metrics=metrics)
+    test_execution = _TestExecution(tests=[_TestCase('JIRA-1', 'PASS')])
+
+    assert publisher.publish(test_execution)
+
+    data = metrics.as_dict()
+    assert data['counters']['requests'] == 2
+    assert data['counters']['retries'] == 1
+    assert 'failed_uploads' not in data['counters']
+    assert data['counters']['auth_requests'] == 1
+    assert data['counters']['payload_bytes'] == xray_emulator.stats()['payload_bytes']
+    assert data['timings']['request']['count'] == 2
+    assert data['timings']['publish']['count'] == 1
+
+
+def test_formatter_writes_metrics_file_at_close(tmp_path):
+    path = tmp_path / 'metrics.json'
+    config = MagicMock()
+    config.userdata = {'xray.metrics_file': str(path)}
+    with mock.patch.dict(os.environ, basic_auth):
+        formatter = XrayFormatter(MagicMock(), config)
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+    formatter.test_execution.append(_TestCase('JIRA-1', 'PASS'))
+    formatter.publish(formatter.test_execution)
+
+    formatter.close()
+
+    assert json.loads(path.read_text())['timings']['encode']['count'] == 1
@@ -1,4 +1,5 @@
 import datetime as dt
+import json
 from unittest.mock import patch
 
 import pytest
@@ -6,6 +7,7 @@ import pytest
 from behave_xray.formatter import TestCase as _TestCase
 from behave_xray.formatter import TestExecution as _TestExecution
 from behave_xray.model import DEFAULT_SUMMARY
+from behave_xray.model import TestCaseCloud as _TestCaseCloud
 
 
 @pytest.fixture
@@ -119,3 +121,44 @@ def test_test_case_status_validation_for_assigning():
     test_case = _TestCase('Jira-1')
     with pytest.raises(ValueError):
         test_case.status = 'TO-DO'
+
+
+def test_test_case_statuses_are_validated_per_flavor():
+    _TestCaseCloud('Jira-1', status='PASSED')
+    with pytest.raises(ValueError):
+        _TestCaseCloud('Jira-1', status='PASS')
+    with pytest.raises(ValueError):
+        _TestCase('Jira-1', status='PASSED')
+
+
+def test_test_case_serialization_is_cached_until_modified(testcase):
+    assert testcase.as_dict() is testcase.as_dict()
+    testcase.status = 'FAIL'
+    assert testcase.as_dict()['status'] == 'FAIL'
+    testcase.examples = ['FAIL']
+    assert testcase.as_dict()['examples'] == ['FAIL']
+    testcase.examples.append('PASS')
+    testcase.invalidate()
+    assert testcase.as_dict()['examples'] == ['FAIL', 'PASS']
+
+
+def test_model_classes_use_slots(testcase):
+    with pytest.raises(AttributeError):
+        testcase.unknown = 1
+    with pytest.raises(AttributeError):
+        _TestExecution().unknown = 1
+
+
+def test_test_execution_json_stream_matches_dictionary(testcase, outline_testcase):
+    testdt = dt.datetime(2021, 4, 23, 16, 30, 2, 0, tzinfo=dt.timezone.utc)
+    with patch('datetime.datetime') as dt_mock:
+        dt_mock.now.return_value = testdt
+        te = _TestExecution(test_plan_key='Jira-10', test_execution_key='JIRA-20', user='admin')
+        outline_testcase.evidences = [{'data': 'ZGF0YQ==', 'filename': 'a.txt', 'contentType': 'plain/text'}]
+        te.tests = [testcase, outline_testcase]
+        assert json.loads(''.join(te.iter_json())) == te.as_dict()
+
+
+def test_empty_test_execution_json_stream_is_valid_json():
+    te = _TestExecution()
+    assert json.loads(''.join(te.iter_json()))['tests'] == []
@@ -0,0 +1,212 @@
+import json
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.retry import CircuitBreaker, RetryPolicy
+from behave_xray.serialization import SerializedTestExecution
+from behave_xray.xray_publisher import (
+    TEST_EXECUTION_ENDPOINT,
+    XrayPublisher,
+    _with_test_execution_key,
+)
+from tests.conftest import BASE_API_URL
+
+
+def _response(status_code, body=None, headers=None):
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.json.return_value = body if body is not None else {'testExecIssue': {'key': 'JIRA-1000'}}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    return response
+
+
+def _publisher(*responses, **kwargs):
+    session = MagicMock()
+    session.request.side_effect = list(responses)
+    return XrayPublisher('http://localhost', TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('behave_xray.xray_publisher.time.sleep') as sleep:
+        yield sleep
+
+
+def test_publisher_retries_rejected_upload(no_sleep):
+    publisher = _publisher(_response(429, headers={'Retry-After': '7'}), _response(200))
+    assert publisher.publish({'tests': []})
+    assert publisher.session.request.call_count == 2
+    no_sleep.assert_called_once_with(7.0)
+
+
+def test_publisher_does_not_repeat_new_execution_after_bad_gateway():
+    publisher = _publisher(_response(502), _response(200))
+    assert not publisher.publish({'tests': []})
+    assert publisher.session.request.call_count == 1
+
+
+def test_publisher_repeats_import_to_existing_execution_after_bad_gateway():
+    publisher = _publisher(_response(502), _response(200))
+    assert publisher.publish({'testExecutionKey': 'JIRA-1', 'tests': []})
+    assert publisher.session.request.call_count == 2
+
+
+def test_publisher_retries_when_connection_cannot_be_established():
+    error = requests.exceptions.ConnectionError(MagicMock(reason=NewConnectionError(None, 'refused')))
+    publisher = _publisher(error, _response(200))
+    assert publisher.publish({'tests': []})
+
+
+@pytest.mark.parametrize('data, expected_requests, expected_success', [
+    # the server may have created a test execution before the response timed out
+    ({'tests': []}, 1, False),
+    ({'testExecutionKey': 'JIRA-1', 'tests': []}, 2, True),
+])
+def test_publisher_handles_read_timeout(data, expected_requests, expected_success):
+    publisher = _publisher(requests.exceptions.ReadTimeout(), _response(200), timeout=5.0)
+    assert publisher.publish(data) is expected_success
+    assert publisher.session.request.call_count == expected_requests
+    assert publisher.session.request.call_args.kwargs['timeout'] == 5.0
+
+
+def test_publisher_gives_up_after_max_attempts():
+    publisher = _publisher(*[_response(503)] * 3, retry_policy=RetryPolicy(max_attempts=3))
+    assert not publisher.publish({'tests': []})
+    assert publisher.session.request.call_count == 3
+
+
+def test_publisher_stops_uploading_when_circuit_breaker_opens():
+    publisher = _publisher(
+        *[_response(503)] * 2,
+        retry_policy=RetryPolicy(max_attempts=1),
+        circuit_breaker=CircuitBreaker(failure_threshold=2)
+    )
+    assert not publisher.publish({'tests': []})
+    assert not publisher.publish({'tests': []})
+    assert not publisher.publish({'tests': []})
+    assert publisher.session.request.call_count == 2
+    assert publisher.circuit_breaker.is_open
+
+
+def test_circuit_breaker_is_reset_by_success():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize('attempt, upper_bound', [(1, 1.0), (2, 2.0), (3, 4.0), (10, 30.0)])
+def test_retry_delay_grows_exponentially(attempt, upper_bound):
+    policy = RetryPolicy(backoff_factor=1.0, max_backoff=30.0)
+    assert 0 <= policy.get_delay(attempt) <= upper_bound
+
+
+def test_retry_delay_honors_retry_after_up_to_max_retry_after():
+    policy = RetryPolicy(max_backoff=30.0, max_retry_after=300.0)
+    assert policy.get_delay(1, '5') == 5.0
+    assert policy.get_delay(1, '120') == 120.0
+    assert policy.get_delay(1, '600') is None
+
+
+def test_publisher_does_not_retry_when_server_asks_to_wait_too_long(no_sleep):
+    publisher = _publisher(_response(503, headers={'Retry-After': '600'}), _response(200),
+                           retry_policy=RetryPolicy(max_retry_after=300.0))
+    assert not publisher.publish({'testExecutionKey': 'JIRA-1', 'tests': []})
+    assert publisher.session.request.call_count == 1
+    no_sleep.assert_not_called()
+
+
+def test_publisher_streams_test_execution_in_chunks():
+    publisher = _publisher(_response(200), stream_upload=True)
+    test_execution = _TestExecution(tests=[_TestCase('JIRA-1', 'PASS'), _TestCase('JIRA-2', 'FAIL')])
+    assert publisher.publish(test_execution)
+
+    body = publisher.session.request.call_args.kwargs['data']
+    assert json.loads(b''.join(body)) == {**test_execution.as_dict(), 'info': mock.ANY}
+
+
+def test_publisher_streams_test_execution_to_server():
+    publisher = XrayPublisher(BASE_API_URL, TEST_EXECUTION_ENDPOINT, ('user', 'password'), stream_upload=True)
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-1', 'PASS')]))
+
+
+def test_publisher_splits_large_test_execution():
+    publisher = _publisher(_response(200), _response(200), _response(200), max_payload_size=150)
+    data = {'info': {}, 'tests': [{'testKey': f'JIRA-{i}', 'status': 'PASS', 'comment': 'x' * 50} for i in range(3)]}
+    assert publisher.publish(data)
+
+    payloads = [json.loads(call.kwargs['data']) for call in publisher.session.request.call_args_list]
+    assert [[test['testKey'] for test in payload['tests']] for payload in payloads] == [
+        ['JIRA-0'], ['JIRA-1'], ['JIRA-2']
+    ]
+    assert 'testExecutionKey' not in payloads[0]
+    assert payloads[1]['testExecutionKey'] == payloads[2]['testExecutionKey'] == 'JIRA-1000'
+
+
+def test_publisher_splits_test_execution_model():
+    publisher = _publisher(max_payload_size=550)
+    test_execution = _TestExecution(tests=[_TestCase(f'JIRA-{i}', comment='x' * 50) for i in range(4)])
+    parts = publisher.split(test_execution)
+    assert [len(part.tests) for part in parts] == [2, 2]
+    assert len(test_execution.tests) == 4
+
+
+@pytest.mark.parametrize('payload_type', [dict, SerializedTestExecution, _TestExecution])
+@pytest.mark.parametrize('test_execution_key', ['', 'JIRA-100'])
+def test_publisher_splits_test_execution_into_parts_not_exceeding_maximum_size(payload_type, test_execution_key):
+    max_payload_size = 1000
+    publisher = _publisher(max_payload_size=max_payload_size)
+    test_execution = _TestExecution(test_execution_key=test_execution_key, summary='s' * 300,
+                                    description='d' * 200, test_plan_key='JIRA-1')
+    for i in range(20):
+        test_execution.append(_TestCase(f'JIRA-{i}', 'PASS', comment='x' * 50))
+    if payload_type is dict:
+        test_execution = test_execution.as_dict()
+    elif payload_type is SerializedTestExecution:
+        test_execution = SerializedTestExecution.from_dict(test_execution.as_dict())
+
+    parts = publisher.split(test_execution)
+    # later parts of a new test execution are imported into the test execution created by the first one
+    parts = parts[:1] + [_with_test_execution_key(part, 'JIRA-1000') for part in parts[1:]]
+
+    assert len(parts) > 1
+    for part in parts:
+        assert len(publisher._get_body(part)['data']) <= max_payload_size
+        if isinstance(part, _TestExecution):
+            # streamed upload
+            assert len(''.join(part.iter_json()).encode('utf-8')) <= max_payload_size
+
+
+def test_publisher_does_not_upload_remaining_parts_when_first_fails():
+    publisher = _publisher(_response(400, body={'error': 'invalid'}), max_payload_size=10)
+    assert not publisher.publish({'tests': [{'testKey': 'JIRA-1'}, {'testKey': 'JIRA-2'}]})
+    assert publisher.session.request.call_count == 1
+
+
+def test_publisher_reuses_created_test_execution(xray_emulator):
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'),
+                              reuse_test_execution=True)
+
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-1', 'PASS')]))
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-2', 'PASS')]).as_dict())
+    assert publisher.publish(_TestExecution(test_execution_key='JIRA-10', tests=[_TestCase('JIRA-3', 'PASS')]))
+
+    assert publisher.test_execution_key == 'JIRA-1000'
+    assert xray_emulator.executions == {'JIRA-1000': ['JIRA-1', 'JIRA-2'], 'JIRA-10': ['JIRA-3']}
+
+
+def test_publisher_creates_test_execution_for_every_upload_by_default(xray_emulator):
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'))
+
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-1', 'PASS')]))
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-2', 'PASS')]))
+
+    assert publisher.test_execution_key is None
+    assert sorted(xray_emulator.executions) == ['JIRA-1000', 'JIRA-1001']
@@ -0,0 +1,73 @@
+import json
+import os
+from unittest import mock
+
+from behave.model_core import Status
+
+from behave_xray.cli import main
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.result import ScenarioResult
+from behave_xray.runner import (
+    FeatureResult,
+    find_features,
+    load_durations,
+    merge_results,
+    save_durations,
+    sort_by_duration,
+)
+from behave_xray.shard import build_shard
+from tests.conftest import basic_auth
+
+
+def test_find_features_in_directories(tmp_path):
+    (tmp_path / 'b').mkdir()
+    (tmp_path / 'b' / 'second.feature').write_text('')
+    (tmp_path / 'first.feature').write_text('')
+    (tmp_path / 'steps.py').write_text('')
+    assert find_features([str(tmp_path)]) == [
+        str(tmp_path / 'first.feature'),
+        str(tmp_path / 'b' / 'second.feature'),
+    ]
+
+
+def test_longest_and_unknown_features_run_first():
+    durations = {'short.feature': 1.0, 'long.feature': 10.0}
+    features = ['short.feature', 'long.feature', 'new.feature']
+    assert sort_by_duration(features, durations) == ['new.feature', 'long.feature', 'short.feature']
+
+
+def test_durations_are_updated(tmp_path):
+    path = str(tmp_path / 'durations.json')
+    assert load_durations(path) == {}
+    save_durations(path, [FeatureResult('a.feature', 0, 1.5)])
+    save_durations(path, [FeatureResult('b.feature', 0, 2.0)])
+    assert load_durations(path) == {'a.feature': 1.5, 'b.feature': 2.0}
+
+
+def test_results_are_merged_in_order_of_features():
+    first = build_shard(_TestExecution(description='first'), {
+        'JIRA-1': ScenarioResult(statuses=[Status.passed], is_outline=True)
+    })
+    second = build_shard(_TestExecution(description='second'), {
+        'JIRA-1': ScenarioResult(statuses=[Status.failed], is_outline=True)
+    })
+    merged = merge_results([FeatureResult('b.feature', 1, 1.0, [second]), FeatureResult('a.feature', 0, 1.0, [first])])
+    assert merged.info['description'] == 'first\nsecond'
+    assert merged.results['JIRA-1'].statuses == [Status.passed, Status.failed]
+
+
+def test_features_run_in_parallel_and_publish_one_execution(tmp_path, capsys):
+    output = tmp_path / 'xray.json'
+    durations = tmp_path / 'durations.json'
+    with mock.patch.dict(os.environ, basic_auth):
+        exit_code = main(['run', 'tests/features', '--workers', '2', '--durations', str(durations),
+                          '--output', str(output)])
+
+    out = capsys.readouterr().out
+    assert exit_code == 1  # the feature contains failing scenarios
+    assert 'failed: tests/features/calculator.feature' in out
+    assert 'Uploaded results to JIRA XRAY Test Execution: JIRA-1000' in out
+    test_execution = json.loads(output.read_text())
+    assert test_execution['info']['testPlanKey'] == 'JIRA-1'
+    assert sorted(test['status'] for test in test_execution['tests']) == ['FAIL', 'FAIL', 'PASS', 'PASS']
+    assert 'tests/features/calculator.feature' in load_durations(str(durations))
@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import subprocess
+import sys
+from dataclasses import fields
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+
+from behave_xray.exceptions import XrayError
+from behave_xray.formatter import TestCase as _TestCase
+from behave_xray.formatter import XrayFormatter
+from behave_xray.serialization import (
+    BACKEND,
+    BACKENDS,
+    SerializedTestExecution,
+    _select_backend,
+    dumps,
+    loads,
+)
+from tests.conftest import basic_auth
+
+
+def test_dumps_is_compact_by_default():
+    data = {'testKey': 'JIRA-1', 'comment': 'žluťoučký'}
+    body = dumps(data)
+    assert body == '{"testKey":"JIRA-1","comment":"žluťoučký"}'.encode('utf-8')
+    assert loads(body) == data
+    assert json.loads(dumps(data, pretty=True)) == data
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_encode_same_json(backend):
+    pytest.importorskip(backend)
+    data = {'testExecutionKey': 'JIRA-1000', 'info': {'summary': 'žluťoučký', 'testPlanKey': 'JIRA-1'},
+            'tests': [{'testKey': 'JIRA-1', 'status': 'PASS', 'comment': 'https://example.org/a/b'}]}
+    code = ('import sys; from behave_xray.serialization import dumps; '
+            f'sys.stdout.buffer.write(dumps({data!r}) + bytes(1) + dumps({data!r}, pretty=True))')
+    output = subprocess.run([sys.executable, '-c', code], env=dict(os.environ, BEHAVE_XRAY_JSON_BACKEND=backend),
+                            stdout=subprocess.PIPE, check=True).stdout
+    compact, pretty = output.split(bytes(1))
+    assert compact == json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assert pretty == json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def test_serialized_test_execution_keeps_only_body():
+    data = {'testExecutionKey': 'JIRA-1000', 'tests': [{'testKey': 'JIRA-1', 'status': 'PASS'}]}
+    payload = SerializedTestExecution.from_dict(data)
+    assert [field.name for field in fields(payload)] == ['body', 'test_execution_key', 'test_count']
+    assert (payload.test_execution_key, payload.test_count) == ('JIRA-1000', 1)
+    assert payload.data == data
+
+
+def test_backend_can_be_forced():
+    assert _select_backend('json') == 'json'
+    assert BACKEND in ('orjson', 'ujson', 'json')
+    with pytest.raises(XrayError):
+        _select_backend('simplejson')
+
+
+@pytest.mark.parametrize('pretty', ['false', 'true'])
+def test_formatter_serializes_test_execution_once(pretty):
+    stream = io.StringIO()
+    config = MagicMock()
+    config.userdata = {'xray.pretty': pretty}
+    with mock.patch.dict(os.environ, basic_auth):
+        formatter = XrayFormatter(MagicMock(), config)
+    formatter.stream = stream
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+    formatter.test_execution.append(_TestCase('JIRA-1', 'PASS'))
+
+    formatter.publish(formatter.test_execution)
+
+    payload = formatter.xray_publisher.publish.call_args[0][0]
+    assert isinstance(payload, SerializedTestExecution)
+    if pretty == 'true':
+        assert json.loads(stream.getvalue()) == payload.data
+        assert '\n' in stream.getvalue()
+    else:
+        assert stream.getvalue().encode('utf-8') == payload.body
@@ -0,0 +1,76 @@
+import ssl
+
+import pytest
+import requests
+
+from behave_xray.authentication import BearerAuth
+from behave_xray.session import Http2Adapter, _get_ssl_context, create_session
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+from tests.conftest import BASE_API_URL
+
+
+def test_session_has_connection_pool_of_given_size():
+    session = create_session(pool_size=3)
+    adapter = session.get_adapter('https://jira.example.com')
+    assert isinstance(adapter, requests.adapters.HTTPAdapter)
+    assert adapter._pool_maxsize == 3
+    assert 'Connection' not in session.headers or session.headers['Connection'] != 'close'
+
+
+def test_session_without_keep_alive_closes_connections():
+    session = create_session(keep_alive=False)
+    assert session.headers['Connection'] == 'close'
+
+
+def test_publisher_reuses_session_for_uploads():
+    session = create_session()
+    publisher = XrayPublisher(BASE_API_URL, TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session)
+    assert publisher.publish({'tests': []})
+    assert publisher.publish({'tests': []})
+    pools = session.get_adapter(BASE_API_URL).poolmanager.pools
+    assert len(pools) == 1
+    assert pools[next(iter(pools.keys()))].num_connections == 1
+    publisher.close()
+
+
+def test_bearer_auth_uses_shared_session():
+    session = create_session()
+    auth = BearerAuth(BASE_API_URL, 'client_id', 'client_secret', session=session)
+    request = requests.Request('POST', BASE_API_URL).prepare()
+    assert auth(request).headers['Authorization'] == 'Bearer token'
+
+
+def test_http2_session_publishes_results():
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    session = create_session(http2=True)
+    publisher = XrayPublisher(BASE_API_URL, TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session)
+    assert publisher.publish({'tests': []})
+    publisher.close()
+
+
+def test_http2_adapter_creates_client_per_tls_and_proxy_settings():
+    httpx = pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    adapter = Http2Adapter()
+    request = requests.Request('POST', 'http://jira.example.com/rest', data=b'{}').prepare()
+    proxies = {'http': 'http://proxy.example.com:3128'}
+    adapter.clients[(True, None, proxies['http'])] = httpx.Client(
+        transport=httpx.MockTransport(lambda r: httpx.Response(200, content=b'{"key": "JIRA-1"}'))
+    )
+
+    response = adapter.send(request, stream=True, proxies=proxies)
+
+    assert b''.join(response.iter_content(4)) == b'{"key": "JIRA-1"}'
+    assert adapter.client is not adapter._get_client(False, None, None)
+    assert adapter.client is adapter._get_client(True, None, None)
+    assert len(adapter.clients) == 3
+    adapter.close()
+    assert adapter.clients == {}
+
+
+def test_http2_adapter_disables_certificate_verification():
+    context = _get_ssl_context(False, None)
+    assert context.verify_mode == ssl.CERT_NONE
+    assert not context.check_hostname
+    assert _get_ssl_context(True, None) is True
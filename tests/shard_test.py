@@ -0,0 +1,98 @@
+import json
+import os
+from unittest import mock
+from unittest.mock import MagicMock
+
+from behave.model_core import Status
+
+from behave_xray.cli import main
+from behave_xray.evidence import text_file
+from behave_xray.formatter import XrayFormatter
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.result import ScenarioResult
+from behave_xray.shard import merge_shards, to_test_execution, write_shard
+from tests.conftest import basic_auth
+
+
+def test_shards_are_merged_like_features(tmp_path):
+    write_shard(str(tmp_path), _TestExecution(test_plan_key='JIRA-100', description='first'), {
+        'JIRA-1': ScenarioResult(statuses=[Status.passed]),
+        'JIRA-2': ScenarioResult(statuses=[Status.passed, Status.passed], is_outline=True),
+    })
+    write_shard(str(tmp_path), _TestExecution(description='second'), {
+        'JIRA-1': ScenarioResult(statuses=[Status.failed], comment='Not equal'),
+        'JIRA-2': ScenarioResult(statuses=[Status.failed], is_outline=True),
+        'JIRA-3': ScenarioResult(statuses=[Status.skipped]),
+    })
+
+    merged = merge_shards([str(tmp_path)])
+    assert merged.info['testPlanKey'] == 'JIRA-100'
+    assert sorted(merged.info['description'].splitlines()) == ['first', 'second']
+    tests = {test['testKey']: test for test in to_test_execution(merged).as_dict()['tests']}
+    assert tests['JIRA-1']['status'] == 'FAIL'
+    assert tests['JIRA-2']['status'] == 'FAIL'
+    assert sorted(tests['JIRA-2']['examples']) == ['FAIL', 'PASS', 'PASS']
+    assert tests['JIRA-3']['status'] == 'ABORTED'
+
+
+def test_file_evidence_is_stored_as_reference(tmp_path):
+    log = tmp_path / 'log.txt'
+    log.write_text('log')
+    result = ScenarioResult(statuses=[Status.passed])
+    result.evidences.append(text_file(log))
+    path = write_shard(str(tmp_path / 'shards'), _TestExecution(), {'JIRA-1': result})
+
+    with open(path) as f:
+        assert json.load(f)['results']['JIRA-1']['evidences'] == [
+            {'path': str(log), 'filename': 'log.txt', 'contentType': 'plain/text'}
+        ]
+    merged = merge_shards([path])
+    assert merged.results['JIRA-1'].evidences[0]['data'] == 'bG9n'
+
+
+def test_formatter_writes_shard_instead_of_publishing(tmp_path):
+    config = MagicMock()
+    config.userdata = {'xray.shard_dir': str(tmp_path)}
+    config.dry_run = False
+    with mock.patch.dict(os.environ, basic_auth):
+        formatter = XrayFormatter(MagicMock(), config)
+    formatter.xray_publisher = MagicMock()
+    feature = MagicMock(tags=[], description=[])
+    feature.name = 'Calculator'
+    formatter.feature(feature)
+    formatter.testcases['JIRA-1'] = ScenarioResult(statuses=[Status.passed])
+    formatter.eof()
+    formatter.close()
+
+    formatter.xray_publisher.publish.assert_not_called()
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_formatter_writes_shard_without_jira_configuration(tmp_path):
+    config = MagicMock()
+    config.userdata = {'xray.shard_dir': str(tmp_path)}
+    config.dry_run = False
+    with mock.patch.dict(os.environ, {}, clear=True):
+        formatter = XrayFormatter(MagicMock(), config)
+    feature = MagicMock(tags=[], description=[])
+    feature.name = 'Calculator'
+    formatter.feature(feature)
+    formatter.testcases['JIRA-1'] = ScenarioResult(statuses=[Status.passed])
+    formatter.eof()
+    formatter.close()
+
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_merge_command_publishes_single_execution(tmp_path, capsys):
+    for index in range(3):
+        write_shard(str(tmp_path), _TestExecution(), {f'JIRA-{index}': ScenarioResult(statuses=[Status.passed])})
+    output = tmp_path / 'merged' / 'xray.json'
+    output.parent.mkdir()
+
+    with mock.patch.dict(os.environ, basic_auth):
+        assert main(['merge', str(tmp_path), '--output', str(output)]) == 0
+    out = capsys.readouterr().out
+    assert 'Merged 3 tests from 3 shards' in out
+    assert 'Uploaded results to JIRA XRAY Test Execution: JIRA-1000' in out
+    assert len(json.loads(output.read_text())['tests']) == 3
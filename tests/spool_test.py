@@ -0,0 +1,61 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+import requests
+
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.spool import Spool
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+
+
+def _publisher(spool, status_code=200):
+    response = MagicMock(status_code=status_code, headers={})
+    response.json.return_value = {'testExecIssue': {'key': 'JIRA-1000'}}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    session = MagicMock()
+    session.request.return_value = response
+    return XrayPublisher('http://localhost', TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session,
+                         spool=spool)
+
+
+def test_spool_stores_test_execution_model(tmp_path):
+    spool = Spool(tmp_path)
+    test_execution = _TestExecution(tests=[_TestCase('JIRA-1', 'PASS')])
+    path = spool.write(test_execution)
+    with open(path) as f:
+        assert json.load(f)['tests'] == [test_execution.tests[0].as_dict()]
+    assert spool.pending() == [path]
+
+
+def test_uploaded_test_execution_is_marked_done(tmp_path):
+    spool = Spool(tmp_path)
+    assert _publisher(spool).publish({'tests': []})
+    assert spool.pending() == []
+    assert len(os.listdir(spool.done_dir)) == 1
+
+
+def test_failed_upload_stays_pending(tmp_path):
+    spool = Spool(tmp_path)
+    assert not _publisher(spool, status_code=500).publish({'tests': []})
+    assert len(spool.pending()) == 1
+
+
+def test_spooled_test_execution_gets_key_of_first_part(tmp_path):
+    spool = Spool(tmp_path)
+    publisher = _publisher(spool)
+    publisher.max_payload_size = 100
+    failed = MagicMock(status_code=500, headers={})
+    failed.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    publisher.session.request.side_effect = [publisher.session.request.return_value, failed]
+    test_execution = _TestExecution(tests=[_TestCase('JIRA-1', 'PASS'), _TestCase('JIRA-2', 'FAIL')])
+
+    assert not publisher.publish(test_execution)
+
+    [path] = spool.pending()
+    with open(path) as f:
+        data = json.load(f)
+    assert data['testExecutionKey'] == 'JIRA-1000'
+    assert [test['testKey'] for test in data['tests']] == ['JIRA-1', 'JIRA-2']
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from behave_xray.evidence import FileEvidence, from_file, text
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.serialization import SerializedTestExecution
+from behave_xray.state_index import StateIndex, get_digest
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+
+
+def _test_execution(statuses, key=''):
+    tests = [_TestCase(f'JIRA-{i}', status) for i, status in enumerate(statuses, start=1)]
+    return _TestExecution(test_execution_key=key, tests=tests)
+
+
+def test_state_index_returns_changed_tests(tmp_path):
+    path = str(tmp_path / 'state' / 'xray.db')
+    index = StateIndex(path)
+    index.record('JIRA-10', {'JIRA-1': 'a', 'JIRA-2': 'b'})
+    index.close()
+
+    index = StateIndex(path)
+    assert index.changed('JIRA-10', {'JIRA-1': 'a', 'JIRA-2': 'c', 'JIRA-3': 'd'}) == {'JIRA-2', 'JIRA-3'}
+    assert index.changed('JIRA-11', {'JIRA-1': 'a'}) == {'JIRA-1'}
+    index.close()
+
+
+def test_digest_of_test_case_does_not_encode_file_evidences(tmp_path):
+    path = tmp_path / 'screenshot.png'
+    path.write_bytes(bytes(range(256)) * 10)
+    test = _TestCase('JIRA-1', 'PASS')
+    test.evidences = [text('log', 'log.txt'), from_file(path, 'image/png')]
+    expected = get_digest(test.as_dict())
+    get_item = FileEvidence.__getitem__
+
+    def get_metadata(evidence, key):
+        assert key != 'data', 'file evidence encoded as a whole'
+        return get_item(evidence, key)
+
+    with mock.patch.object(FileEvidence, '__getitem__', get_metadata):
+        assert get_digest(test) == expected
+    path.write_bytes(b'changed')
+    assert get_digest(test) != expected
+
+
+def test_publisher_imports_only_changed_results(xray_emulator, tmp_path):
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'),
+                              state_index=StateIndex(str(tmp_path / 'xray.db')))
+
+    assert publisher.publish(_test_execution(['PASS', 'FAIL', 'FAIL'], key='JIRA-10'))
+    payload = SerializedTestExecution.from_dict(_test_execution(['PASS', 'PASS', 'FAIL'], key='JIRA-10').as_dict())
+    assert publisher.publish(payload)
+    assert publisher.publish(_test_execution(['PASS', 'PASS', 'FAIL'], key='JIRA-10'))
+    publisher.close()
+
+    assert xray_emulator.executions == {'JIRA-10': ['JIRA-1', 'JIRA-2', 'JIRA-3', 'JIRA-2']}
+    assert xray_emulator.stats()['requests'] == 2
+
+
+def test_publisher_records_results_of_created_test_execution(xray_emulator, tmp_path):
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'),
+                              state_index=StateIndex(str(tmp_path / 'xray.db')))
+
+    assert publisher.publish(_test_execution(['PASS', 'FAIL']))
+    assert publisher.publish(_test_execution(['PASS', 'FAIL']))
+    assert publisher.publish(_test_execution(['PASS', 'PASS'], key='JIRA-1000'))
+    publisher.close()
+
+    assert xray_emulator.executions == {'JIRA-1000': ['JIRA-1', 'JIRA-2', 'JIRA-2'], 'JIRA-1001': ['JIRA-1', 'JIRA-2']}
@@ -0,0 +1,147 @@
+import json
+import os
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+from behave.model_core import Status
+
+from behave_xray import hookimpl
+from behave_xray.formatter import XrayFormatter
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.retry import RetryPolicy
+from behave_xray.tracing import (
+    NOOP_SPAN,
+    STATUS_ERROR,
+    STATUS_OK,
+    STATUS_UNSET,
+    JsonLinesExporter,
+    SpanExporter,
+    Tracer,
+)
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+from tests.conftest import basic_auth
+
+
+class ListExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('behave_xray.xray_publisher.time.sleep') as sleep:
+        yield sleep
+
+
+def test_spans_are_nested():
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+    with tracer.span('parent') as parent:
+        child = tracer.start_span('child', {'xray.test_key': 'JIRA-1'})
+        tracer.end_span(child)
+        left_open = tracer.start_span('left open')
+    with pytest.raises(ValueError):
+        with tracer.span('failed'):
+            raise ValueError()
+
+    assert [span.name for span in exporter.spans] == ['child', 'left open', 'parent', 'failed']
+    assert child.parent_span_id == parent.span_id
+    assert left_open.end_time == parent.end_time
+    assert exporter.spans[-1].parent_span_id is None
+    assert exporter.spans[-1].status == STATUS_ERROR
+    assert {span.trace_id for span in exporter.spans} == {tracer.trace_id}
+
+
+def test_disabled_tracer_does_not_create_spans():
+    tracer = Tracer()
+    with tracer.span('feature') as span:
+        span.set_attribute('key', 'value')
+    assert span is NOOP_SPAN
+    assert NOOP_SPAN.attributes == {}
+
+
+def test_disabled_publisher_does_not_change_noop_span(xray_emulator):
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'))
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-1', 'PASS')]))
+    assert NOOP_SPAN.status == STATUS_UNSET
+    assert NOOP_SPAN.as_dict()['status'] == STATUS_UNSET
+
+
+def test_json_lines_exporter_writes_span_per_line(tmp_path):
+    path = tmp_path / 'traces' / 'spans.jsonl'
+    tracer = Tracer(JsonLinesExporter(str(path)))
+    with tracer.span('behave.feature', {'behave.feature.name': 'Calculator'}):
+        with tracer.span('behave.scenario'):
+            pass
+    tracer.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span['name'] for span in spans] == ['behave.scenario', 'behave.feature']
+    assert spans[0]['parent_span_id'] == spans[1]['span_id']
+    assert spans[1]['attributes'] == {'behave.feature.name': 'Calculator'}
+    assert spans[1]['end_time_unix_nano'] >= spans[1]['start_time_unix_nano']
+
+
+def test_publisher_creates_request_span_per_attempt(xray_emulator):
+    xray_emulator.fail_next(429)
+    exporter = ListExporter()
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'),
+                              retry_policy=RetryPolicy(max_attempts=2), tracer=Tracer(exporter))
+
+    assert publisher.publish(_TestExecution(tests=[_TestCase('JIRA-1', 'PASS')]))
+
+    first, second, publish = exporter.spans
+    assert (first.attributes['http.status_code'], first.status) == (429, STATUS_ERROR)
+    assert (second.attributes['http.status_code'], second.status) == (200, STATUS_OK)
+    assert second.attributes['xray.attempt'] == 2
+    assert second.attributes['http.request.body.size'] > 0
+    assert second.parent_span_id == publish.span_id
+    assert publish.attributes == {'xray.tests': 1, 'xray.parts': 1, 'xray.test_execution_key': 'JIRA-1000'}
+
+
+def test_formatter_traces_features_scenarios_and_steps():
+    exporter = ListExporter()
+
+    class Plugin:
+        @hookimpl
+        def xray_span_exporter(self, config):
+            return exporter
+
+    config = MagicMock()
+    config.userdata = {}
+    config.dry_run = False
+    with mock.patch.object(XrayFormatter, '_register_user_hook', lambda formatter: formatter.pm.register(Plugin())):
+        with mock.patch.dict(os.environ, basic_auth):
+            formatter = XrayFormatter(MagicMock(), config)
+    assert formatter.xray_publisher.tracer is formatter.tracer
+    formatter.xray_publisher = MagicMock(stream_upload=False)
+
+    feature = MagicMock(tags=[], description=[], status=Status.passed)
+    feature.name = 'Calculator'
+    formatter.feature(feature)
+    scenario = MagicMock(tags=["jira.testcase('JIRA-1')"], keyword='Scenario', status=Status.failed)
+    scenario.name = 'Add'
+    formatter.scenario(scenario)
+    step = MagicMock(status=Status.failed, duration=0.5, error_message='Not equal')
+    step.name = 'result is 7'
+    formatter.result(step)
+    formatter.eof()
+
+    spans = {span.name: span for span in exporter.spans}
+    assert list(spans) == ['behave.step', 'xray.scenario_hook', 'behave.scenario', 'xray.feature_hook', 'xray.eof',
+                           'behave.feature']
+    assert spans['behave.step'].attributes == {
+        'behave.step.name': 'result is 7',
+        'behave.step.status': 'failed',
+        'xray.test_key': 'JIRA-1'
+    }
+    assert spans['behave.step'].duration >= 0.5
+    assert spans['behave.step'].parent_span_id == spans['behave.scenario'].span_id
+    assert spans['behave.scenario'].attributes['behave.scenario.status'] == 'failed'
+    assert spans['behave.scenario'].parent_span_id == spans['behave.feature'].span_id
+    assert spans['xray.eof'].parent_span_id == spans['behave.feature'].span_id
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from unittest.mock import MagicMock
+
+import requests
+
+from behave_xray.retry import RetryPolicy
+from behave_xray.spool import Spool
+from behave_xray.upload_worker import UploadWorker
+from behave_xray.xray_publisher import TEST_EXECUTION_ENDPOINT, XrayPublisher
+
+
+def _response(status_code=200):
+    response = MagicMock(status_code=status_code, headers={})
+    response.json.return_value = {'testExecIssue': {'key': 'JIRA-1000'}}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    return response
+
+
+def test_upload_worker_publishes_all_submitted_executions():
+    publisher = MagicMock()
+    publisher.publish.side_effect = [True, False]
+    worker = UploadWorker(publisher, max_queue_size=1)
+    worker.start()
+    worker.submit({'tests': [1]}, name='first.feature')
+    worker.submit({'tests': [2]}, name='second.feature')
+
+    assert worker.close(timeout=5)
+    assert [(r.name, r.success) for r in worker.results] == [('first.feature', True), ('second.feature', False)]
+    assert worker.pending == []
+    assert publisher.publish.call_count == 2
+
+
+def test_upload_worker_survives_publisher_exception():
+    publisher = MagicMock()
+    publisher.publish.side_effect = RuntimeError('boom')
+    worker = UploadWorker(publisher)
+    worker.start()
+    worker.submit({}, name='broken.feature')
+
+    assert worker.close(timeout=5)
+    assert worker.results[0].success is False
+
+
+def test_upload_worker_reports_pending_uploads_after_deadline():
+    release = threading.Event()
+    publisher = MagicMock()
+    publisher.publish.side_effect = lambda data, spool_path=None: release.wait(5)
+    worker = UploadWorker(publisher)
+    worker.start()
+    worker.submit({}, name='slow.feature')
+
+    assert not worker.close(timeout=0.1)
+    assert worker.pending == ['slow.feature']
+    release.set()
+    worker.join(5)
+
+
+def test_upload_worker_spools_test_execution_before_it_is_queued(tmp_path):
+    release = threading.Event()
+    session = MagicMock()
+    session.request.side_effect = lambda *args, **kwargs: release.wait(5) and _response()
+    spool = Spool(tmp_path)
+    publisher = XrayPublisher('http://localhost', TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session,
+                              spool=spool)
+    worker = UploadWorker(publisher)
+    worker.start()
+    worker.submit({'tests': []}, name='first.feature')
+    worker.submit({'tests': []}, name='second.feature')
+
+    assert len(spool.pending()) == 2
+    release.set()
+    assert worker.close(timeout=5)
+    assert all(result.success for result in worker.results)
+    assert spool.pending() == []
+    assert len(os.listdir(spool.done_dir)) == 2
+
+
+def test_upload_worker_spools_key_of_reused_test_execution(tmp_path):
+    release = threading.Event()
+    responses = iter([_response(), _response(500), _response(500)])
+
+    def request(*args, **kwargs):
+        release.wait(5)
+        return next(responses)
+
+    session = MagicMock()
+    session.request.side_effect = request
+    spool = Spool(tmp_path)
+    publisher = XrayPublisher('http://localhost', TEST_EXECUTION_ENDPOINT, ('user', 'password'), session=session,
+                              spool=spool, reuse_test_execution=True, retry_policy=RetryPolicy(max_attempts=1))
+    worker = UploadWorker(publisher)
+    worker.start()
+    worker.submit({'tests': []}, name='first.feature')
+    # queued before the reused test execution is created
+    worker.submit({'tests': []}, name='second.feature')
+    release.set()
+    assert worker.close(timeout=5)
+    # queued after the reused test execution is created
+    worker = UploadWorker(publisher)
+    worker.start()
+    worker.submit({'tests': []}, name='third.feature')
+    assert worker.close(timeout=5)
+
+    pending = spool.pending()
+    assert len(pending) == 2
+    for path in pending:
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)['testExecutionKey'] == 'JIRA-1000'
@@ -0,0 +1,293 @@
+"""Local Jira Xray Server and Cloud emulator for load and fault testing.
+
+The emulator accepts imports of test executions and cloud authentication,
+delays responses by a configurable latency distribution, injects 429 and 5xx
+errors, rejects payloads above a size limit and counts all requests.
+
+Run it from the command line::
+
+    python -m tests.xray_emulator --port 5005 --latency lognormal:0.05,0.5 --error-rate 0.1
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from time import sleep
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+
+HOST = '127.0.0.1'
+
+SERVER_IMPORT_ENDPOINT = '/rest/raven/2.0/import/execution'
+SERVER_TESTS_ENDPOINT = '/rest/raven/2.0/api/testexec/<key>/test'
+CLOUD_AUTHENTICATE_ENDPOINT = '/api/v2/authenticate'
+CLOUD_IMPORT_ENDPOINT = '/api/v2/import/execution'
+
+CLOUD_TOKEN = 'emulator-token'
+DEFAULT_ERROR_CODES: Tuple[int, ...] = (429, 502, 503, 504)
+
+Latency = Callable[[random.Random], float]
+
+
+def fixed(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    return lambda rng: rng.uniform(low, high)
+
+
+def exponential(mean: float) -> Latency:
+    return lambda rng: rng.expovariate(1 / mean) if mean else 0.0
+
+
+def lognormal(median: float, sigma: float) -> Latency:
+    """Long-tailed latency typical for loaded servers."""
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+LATENCY_DISTRIBUTIONS: Dict[str, Callable[..., Latency]] = {
+    'fixed': fixed,
+    'uniform': uniform,
+    'exponential': exponential,
+    'lognormal': lognormal,
+}
+
+
+def parse_latency(value: str) -> Latency:
+    """Return latency distribution from text like ``uniform:0.01,0.2``."""
+    name, _, args = value.partition(':')
+    try:
+        distribution = LATENCY_DISTRIBUTIONS[name]
+    except KeyError:
+        raise ValueError(f'Unknown latency distribution {name}, use one of {", ".join(LATENCY_DISTRIBUTIONS)}')
+    return distribution(*(float(arg) for arg in args.split(',') if arg))
+
+
+@dataclass
+class Faults:
+    """Faults injected into responses of import endpoints."""
+
+    latency: Latency = field(default=fixed(0.0))
+    error_rate: float = 0.0  # probability of an error response
+    error_codes: Tuple[int, ...] = DEFAULT_ERROR_CODES
+    retry_after: Optional[str] = None  # Retry-After header of 429 and 503 responses
+    max_payload_bytes: int = 0  # larger payloads are rejected with 413, 0 means unlimited
+
+
+@dataclass
+class RequestRecord:
+    endpoint: str
+    status_code: int
+    payload_bytes: int
+    duration: float
+    tests: int = 0
+
+
+class XrayEmulator(threading.Thread):
+    """Jira Xray Server and Cloud running in a background thread."""
+
+    def __init__(self, port: int = 0, faults: Optional[Faults] = None, seed: Optional[int] = None) -> None:
+        """
+        :param port: port to listen on, a free port is used by default
+        :param faults: faults injected into import responses
+        :param seed: seed of random latencies and errors
+        """
+        super().__init__(daemon=True)
+        self.faults = faults or Faults()
+        self.random = random.Random(seed)
+        self.records: List[RequestRecord] = []
+        # test executions by key with keys of imported tests
+        self.executions: Dict[str, List[str]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._scripted: Deque[int] = deque()
+        self._keys = itertools.count(1000)
+        self._lock = threading.Lock()
+        self.app = self._create_app()
+        self.server = make_server(HOST, port, self.app, threaded=True)
+        self.port = self.server.server_port
+        self.url = f'http://{HOST}:{self.port}'
+
+    def run(self) -> None:
+        self.server.serve_forever()
+
+    def shutdown_server(self) -> None:
+        self.server.shutdown()
+        self.join()
+
+    def fail_next(self, status_code: int, count: int = 1) -> None:
+        """Respond to the next imports with the status code, before random faults are applied."""
+        with self._lock:
+            self._scripted.extend([status_code] * count)
+
+    def reset(self) -> None:
+        """Forget recorded requests, test executions and scripted faults."""
+        with self._lock:
+            self.records.clear()
+            self.executions.clear()
+            self._scripted.clear()
+            self.max_in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request accounting."""
+        with self._lock:
+            records = list(self.records)
+        durations = sorted(record.duration for record in records)
+        return dict(
+            requests=len(records),
+            by_status=dict(Counter(record.status_code for record in records)),
+            by_endpoint=dict(Counter(record.endpoint for record in records)),
+            payload_bytes=sum(record.payload_bytes for record in records),
+            max_payload_bytes=max((record.payload_bytes for record in records), default=0),
+            tests_imported=sum(record.tests for record in records if record.status_code == 200),
+            test_executions=len(self.executions),
+            max_in_flight=self.max_in_flight,
+            p50_seconds=_percentile(durations, 0.5),
+            p99_seconds=_percentile(durations, 0.99),
+        )
+
+    def _create_app(self) -> Flask:
+        app = Flask(__name__)
+        app.add_url_rule(SERVER_IMPORT_ENDPOINT, 'server_import', self._server_import, methods=['POST'])
+        app.add_url_rule(SERVER_TESTS_ENDPOINT, 'server_tests', self._server_tests, methods=['GET'])
+        app.add_url_rule(CLOUD_AUTHENTICATE_ENDPOINT, 'cloud_authenticate', self._cloud_authenticate,
+                         methods=['POST'])
+        app.add_url_rule(CLOUD_IMPORT_ENDPOINT, 'cloud_import', self._cloud_import, methods=['POST'])
+        return app
+
+    def _server_import(self) -> Response:
+        return self._import(SERVER_IMPORT_ENDPOINT, lambda key: {'testExecIssue': self._issue(key)})
+
+    def _cloud_import(self) -> Response:
+        if request.headers.get('Authorization') != f'Bearer {CLOUD_TOKEN}':
+            return self._record(CLOUD_IMPORT_ENDPOINT, _error(401, 'Unauthorized'), 0, time.monotonic())
+        return self._import(CLOUD_IMPORT_ENDPOINT, self._issue)
+
+    def _cloud_authenticate(self) -> Response:
+        start = time.monotonic()
+        body = request.get_json(silent=True) or {}
+        if not body.get('client_id') or not body.get('client_secret'):
+            return self._record(CLOUD_AUTHENTICATE_ENDPOINT, _error(400, 'Missing client credentials'), 0, start)
+        # Xray Cloud returns the token as a JSON string
+        return self._record(CLOUD_AUTHENTICATE_ENDPOINT, Response(f'"{CLOUD_TOKEN}"', mimetype='application/json'),
+                            0, start)
+
+    def _server_tests(self, key: str) -> Response:
+        start = time.monotonic()
+        if key not in self.executions:
+            return self._record(SERVER_TESTS_ENDPOINT, _error(404, f'Test execution {key} not found'), 0, start)
+        tests = [{'key': test_key} for test_key in self.executions[key]]
+        return self._record(SERVER_TESTS_ENDPOINT, jsonify(tests), 0, start)
+
+    def _import(self, endpoint: str, make_body: Callable[[str], Dict[str, Any]]) -> Response:
+        start = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            payload = request.get_data()
+            delay = self.faults.latency(self.random)
+            if delay > 0:
+                # the sleep function is imported, so patching time.sleep in tests does not remove latency
+                sleep(delay)
+            status_code = self._get_fault()
+            if status_code:
+                return self._record(endpoint, self._fault_response(status_code), len(payload), start)
+            if self.faults.max_payload_bytes and len(payload) > self.faults.max_payload_bytes:
+                response = _error(413, f'Payload of {len(payload)} bytes exceeds {self.faults.max_payload_bytes}')
+                return self._record(endpoint, response, len(payload), start)
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                return self._record(endpoint, _error(400, 'Invalid JSON'), len(payload), start)
+            tests = [test['testKey'] for test in data.get('tests', [])]
+            with self._lock:
+                key = data.get('testExecutionKey') or f'JIRA-{next(self._keys)}'
+                self.executions.setdefault(key, []).extend(tests)
+            return self._record(endpoint, jsonify(make_body(key)), len(payload), start, tests=len(tests))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _get_fault(self) -> int:
+        with self._lock:
+            if self._scripted:
+                return self._scripted.popleft()
+            if self.faults.error_rate and self.random.random() < self.faults.error_rate:
+                return self.random.choice(self.faults.error_codes)
+        return 0
+
+    def _fault_response(self, status_code: int) -> Response:
+        response = _error(status_code, 'Injected fault')
+        if self.faults.retry_after is not None and status_code in (429, 503):
+            response.headers['Retry-After'] = self.faults.retry_after
+        return response
+
+    def _issue(self, key: str) -> Dict[str, str]:
+        return {'id': key.rsplit('-', 1)[-1], 'key': key, 'self': f'{self.url}/rest/api/2/issue/{key}'}
+
+    def _record(self, endpoint: str, response: Response, payload_bytes: int, start: float,
+                tests: int = 0) -> Response:
+        with self._lock:
+            self.records.append(
+                RequestRecord(endpoint, response.status_code, payload_bytes, time.monotonic() - start, tests)
+            )
+        return response
+
+
+def _error(status_code: int, message: str) -> Response:
+    response = jsonify({'error': message})
+    response.status_code = status_code
+    return response
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Local Jira Xray Server and Cloud emulator.')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--latency', type=parse_latency, default=fixed(0.0),
+                        help='latency distribution, e.g. fixed:0.1, uniform:0.01,0.2, exponential:0.05 '
+                             'or lognormal:0.05,0.5 (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an injected error')
+    parser.add_argument('--error-codes', default=','.join(map(str, DEFAULT_ERROR_CODES)),
+                        help='status codes of injected errors')
+    parser.add_argument('--retry-after', help='Retry-After header of injected 429 and 503 responses')
+    parser.add_argument('--max-payload-bytes', type=int, default=0, help='reject larger payloads with 413')
+    parser.add_argument('--seed', type=int, help='seed of random latencies and errors')
+    args = parser.parse_args(argv)
+
+    faults = Faults(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_codes=tuple(int(code) for code in args.error_codes.split(',')),
+        retry_after=args.retry_after,
+        max_payload_bytes=args.max_payload_bytes
+    )
+    emulator = XrayEmulator(args.port, faults, seed=args.seed)
+    emulator.start()
+    print(f'Xray emulator listening on {emulator.url}, press Ctrl+C to stop')
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.shutdown_server()
+        print(json.dumps(emulator.stats(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+import requests
+
+from behave_xray.authentication import BearerAuth
+from behave_xray.model import TestCase as _TestCase
+from behave_xray.model import TestExecution as _TestExecution
+from behave_xray.retry import RetryPolicy
+from behave_xray.xray_publisher import (
+    TEST_EXECUTION_ENDPOINT,
+    TEST_EXECUTION_ENDPOINT_CLOUD,
+    XrayPublisher,
+)
+from tests.xray_emulator import (
+    CLOUD_AUTHENTICATE_ENDPOINT,
+    CLOUD_IMPORT_ENDPOINT,
+    Faults,
+    fixed,
+    parse_latency,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('behave_xray.xray_publisher.time.sleep') as sleep:
+        yield sleep
+
+
+def _publisher(emulator, **kwargs):
+    return XrayPublisher(emulator.url, TEST_EXECUTION_ENDPOINT, ('user', 'password'), **kwargs)
+
+
+def _test_execution(tests=3, key=''):
+    return _TestExecution(test_execution_key=key, tests=[_TestCase(f'JIRA-{i}', 'PASS') for i in range(tests)])
+
+
+def test_emulator_imports_test_execution(xray_emulator):
+    assert _publisher(xray_emulator).publish(_test_execution())
+    assert xray_emulator.executions == {'JIRA-1000': ['JIRA-0', 'JIRA-1', 'JIRA-2']}
+    response = requests.get(f'{xray_emulator.url}/rest/raven/2.0/api/testexec/JIRA-1000/test')
+    assert response.json() == [{'key': 'JIRA-0'}, {'key': 'JIRA-1'}, {'key': 'JIRA-2'}]
+
+
+def test_publisher_retries_injected_faults(xray_emulator, no_sleep):
+    xray_emulator.faults.retry_after = '2'
+    xray_emulator.fail_next(429)
+    xray_emulator.fail_next(503)
+    assert _publisher(xray_emulator, retry_policy=RetryPolicy(max_attempts=3)).publish(_test_execution())
+
+    stats = xray_emulator.stats()
+    assert stats['by_status'] == {429: 1, 503: 1, 200: 1}
+    assert stats['test_executions'] == 1
+    assert no_sleep.call_args_list == [mock.call(2.0), mock.call(2.0)]
+
+
+def test_publisher_does_not_repeat_import_after_gateway_error(xray_emulator):
+    xray_emulator.fail_next(502)
+    assert not _publisher(xray_emulator).publish(_test_execution())
+    assert xray_emulator.stats()['requests'] == 1
+
+
+def test_publisher_splits_payload_over_server_limit(xray_emulator):
+    xray_emulator.faults.max_payload_bytes = 600
+    assert not _publisher(xray_emulator).publish(_test_execution(tests=20))
+    assert xray_emulator.stats()['by_status'] == {413: 1}
+
+    xray_emulator.reset()
+    # the limit of the publisher applies to tests, the test execution information is sent in every part
+    assert _publisher(xray_emulator, max_payload_size=300).publish(_test_execution(tests=20))
+    stats = xray_emulator.stats()
+    assert stats['by_status'] == {200: stats['requests']}
+    assert stats['tests_imported'] == 20
+    assert stats['test_executions'] == 1
+
+
+def test_emulator_accounts_concurrent_requests(xray_emulator):
+    xray_emulator.faults.latency = fixed(0.05)
+    publisher = _publisher(xray_emulator)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert all(executor.map(publisher.publish, [_test_execution(key='JIRA-1') for _ in range(8)]))
+
+    stats = xray_emulator.stats()
+    assert stats['requests'] == 8
+    assert stats['max_in_flight'] > 1
+    assert stats['p50_seconds'] >= 0.05
+
+
+def test_cloud_import_requires_token(xray_emulator):
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret')
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth)
+    assert publisher.publish(_test_execution())
+    assert not XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, None).publish(_test_execution())
+    assert xray_emulator.stats()['by_status'] == {200: 2, 401: 1}
+
+
+def test_cloud_import_refreshes_rejected_token(xray_emulator):
+    auth = BearerAuth(xray_emulator.url, 'client_id', 'client_secret')
+    auth.set_token('revoked-token')
+    publisher = XrayPublisher(xray_emulator.url, TEST_EXECUTION_ENDPOINT_CLOUD, auth)
+
+    assert publisher.publish(_test_execution())
+    assert xray_emulator.stats()['by_endpoint'] == {CLOUD_IMPORT_ENDPOINT: 2, CLOUD_AUTHENTICATE_ENDPOINT: 1}
+
+
+@pytest.mark.parametrize('value', ['fixed:0.1', 'uniform:0.05,0.15', 'exponential:0.1', 'lognormal:0.1,0.5'])
+def test_latency_distributions(value):
+    latency = parse_latency(value)
+    assert all(latency(random.Random(0)) >= 0 for _ in range(10))
+    with pytest.raises(ValueError):
+        parse_latency('normal:0.1')
+
+
+def test_faults_default_to_no_faults():
+    faults = Faults()
+    assert faults.error_rate == 0.0
+    assert faults.max_payload_bytes == 0